@@ -1,63 +1,156 @@
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 from uuid import uuid4
+import contextvars
 import logging
+import atexit
+import random
+import queue
 import time
 import json
+import os
+
+# --- Logging settings ---
+LOG_FILE = os.getenv("LOG_FILE", "api_logs.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Request/response bodies are logged for this fraction of requests only...
+LOG_BODY_SAMPLE_RATE = float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.1"))
+# ...and cut to this many bytes
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", "2048"))
+# Larger (or multipart) request bodies are never read by the middleware
+LOG_REQUEST_BODY_READ_LIMIT = int(os.getenv("LOG_REQUEST_BODY_READ_LIMIT", str(64 * 1024)))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Responses with these media types are streamed to the client as produced
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+# Fields passed via `extra=` that end up in the JSON line
+_EXTRA_FIELDS = ("method", "route", "status", "duration_ms", "request_body", "response_body", "response_bytes")
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    """Id of the request being handled (also sent back as X-Request-ID)."""
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id while still on the caller's context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for field in _EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Setup logging: callers only enqueue records; a background thread formats and
+# writes them to a size-rotated file, so logging never blocks the event loop.
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+_file_handler.setFormatter(JsonFormatter())
+_listener = QueueListener(_log_queue, _file_handler, respect_handler_level=True)
+
+_queue_handler = QueueHandler(_log_queue)
+# QueueHandler pre-renders the message (and any traceback) before enqueueing
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+_queue_handler.addFilter(RequestIdFilter())
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+
+_listener.start()
+atexit.register(_listener.stop)
 
-# Setup logging
-logging.basicConfig(
-    filename="api_logs.log",
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
 logger = logging.getLogger("api_logger")
 
+
+def truncate_body(body: bytes, total_size: Optional[int] = None) -> str:
+    total_size = len(body) if total_size is None else total_size
+    text = body[:LOG_BODY_MAX_BYTES].decode("utf-8", errors="replace")
+    if total_size > LOG_BODY_MAX_BYTES:
+        text += f"...[truncated, {total_size} bytes]"
+    return text
+
+
 class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid4())
-        start_time = time.time()
+        request_id = request.headers.get(REQUEST_ID_HEADER) or str(uuid4())
+        _request_id.set(request_id)
+        start_time = time.perf_counter()
+        sample_body = random.random() < LOG_BODY_SAMPLE_RATE
 
-        try:
-            req_body = await request.body()
-            req_data = req_body.decode("utf-8")
-        except Exception:
-            req_data = "Could not parse body"
+        req_data = None
+        if sample_body and self.should_read_body(request):
+            try:
+                req_data = truncate_body(await request.body())
+            except Exception:
+                req_data = "Could not parse body"
 
         # --- Process the request and get response ---
         response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = request_id
 
-        # --- Capture response body (must clone it) ---
-        response_body = b""
-        async for chunk in response.body_iterator:
-            response_body += chunk
-
-        # Recreate the response so FastAPI can send it back
-        response = Response(
-            content=response_body,
-            status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.media_type
+        # Pass the body through untouched and log once it has been sent
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        capture = sample_body and content_type not in STREAMING_MEDIA_TYPES
+        response.body_iterator = self.log_when_sent(
+            response.body_iterator, request, request_id, req_data, response.status_code, start_time, capture
         )
+        return response
 
-        end_time = time.time()
-        duration_ms = round((end_time - start_time) * 1000, 2)
-
+    @staticmethod
+    def should_read_body(request: Request) -> bool:
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            return False
         try:
-            response_text = response_body.decode("utf-8")
-        except Exception:
-            response_text = "[Non-decodable response]"
-
-        log_message = (
-            f"Request ID: {request_id} | "
-            f"Method: {request.method} | "
-            f"URL: {request.url.path} | "
-            f"Request: {req_data} | "
-            f"Response: {response_text} | "
-            f"Status Code: {response.status_code} | "
-            f"Time: {duration_ms} ms"
-        )
+            return int(request.headers.get("content-length", "0")) <= LOG_REQUEST_BODY_READ_LIMIT
+        except ValueError:
+            return False
 
-        logger.info(log_message)
-        return response
+    async def log_when_sent(self, body_iterator, request: Request, request_id: str, req_data: Optional[str],
+                            status_code: int, start_time: float, capture: bool):
+        """Forward the body chunk by chunk, keeping at most LOG_BODY_MAX_BYTES of it when sampled."""
+        head = bytearray()
+        size = 0
+        try:
+            async for chunk in body_iterator:
+                size += len(chunk)
+                if capture and len(head) < LOG_BODY_MAX_BYTES:
+                    head += chunk[:LOG_BODY_MAX_BYTES - len(head)]
+                yield chunk
+        finally:
+            logger.info(
+                f"{request.method} {request.url.path} {status_code}",
+                extra={
+                    "request_id": request_id,
+                    "method": request.method,
+                    "route": request.url.path,
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                    "request_body": req_data,
+                    "response_body": truncate_body(bytes(head), size) if capture else None,
+                    "response_bytes": size,
+                },
+            )
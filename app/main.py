@@ -1,9 +1,13 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.routes.query_router import router as query_router
 from app.routes.upload_router import router as upload_router
 from app.routes.hackrx import router as hackrx_router
 
 from app.logger.logger import LoggingMiddleware  # 👈 import middleware
+from app.utils.executor import executor_stats
+from app.services.gemini_gateway import get_gateway
+from app.utils.metrics import render_prometheus
 
 app = FastAPI()
 
@@ -19,3 +23,15 @@ app.include_router(hackrx_router, prefix="/api/v1/hackrx")
 @app.get("/")
 def root():
     return {"message": "RAG API running"}
+
+
+@app.get("/stats/dependencies")
+def dependency_stats():
+    """Queue depth, in-flight calls and timeouts per blocking dependency."""
+    return {**executor_stats(), "gemini_gateway": get_gateway().stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latency quantiles and pipeline counters in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,18 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
-import aiohttp
+from typing import List, Optional, Dict, AsyncIterator
+import asyncio
+import hashlib
+import httpx
 import os
 import json
-from starlette.datastructures import UploadFile as StarletteUploadFile
+import time
 import tempfile
-from app.services.document_loader import load_document
-from app.services.chunker import chunk_text
-from app.services.embedder import embed_chunks
-from app.services.query_service import query_documents_batch
+from app.services.document_loader import load_document, fetch_document, parse_document
+from app.services.chunker import chunk_text_with_offsets
+from app.services.embedder import embed_chunks, reembed_changed_chunks
+from app.services.ingest_journal import IngestJournal, load_manifest, update_manifest
+from app.services.query_service import query_documents_batch, query_documents_stream
+from app.services.context_packer import start_token_report
+from app.utils.timing import start_stage_report
+from app.utils.deadline import (
+    start_request_context, parse_deadline_header, GENERATION_RESERVE_SECONDS, DEADLINE_PLACEHOLDER,
+)
 from app.auth.token_auth import verify_token
+from app.utils.profiling import profile_request
 from app.routes.indexmaker import generate_namespace_index
-import io
 
 router = APIRouter()
 
@@ -38,57 +47,290 @@ class HackRxRequest(BaseModel):
     documents: str  # PDF URL
     questions: List[str]
 
-@router.post("/run", dependencies=[Depends(verify_token)])
-async def process_and_query(request: HackRxRequest):
+# === Documents answered directly instead of being indexed ===
+async def special_document_answer(document_url: str) -> Optional[str]:
+    if "hackrx/rounds/FinalRound4SubmissionPDF" in document_url:
+        token = await load_document(document_url)
+        return "The Flight Number is: " + token
+
+    if "hackrx.in/utils/get-secret-token" in document_url:
+        token = await load_document(document_url)
+        return "The secret token is: " + token
+
+    return None
+
+
+# === Download, parse, chunk and embed a new document ===
+async def ingest_document(document_url: str, request_context) -> AsyncIterator[Dict]:
+    """
+    Yields one progress event per ingest stage; the last one is
+    {"stage": "indexed", "namespace": ...}. The namespace is recorded in the map
+    only once embedding finishes. Raises asyncio.TimeoutError past the deadline.
+
+    Progress is journaled per document content, so an ingest that timed out or
+    failed part-way resumes in the same namespace on the next request, and a
+    document already indexed under another URL is not embedded again.
+    """
+    # Ingest may use what is left of the budget except the time kept back for answering
+    yield {"stage": "downloading"}
+    try:
+        fetched = await asyncio.wait_for(
+            fetch_document(document_url), timeout=request_context.timeout(reserve=GENERATION_RESERVE_SECONDS)
+        )
+    except httpx.HTTPError:
+        raise HTTPException(status_code=400, detail="Failed to download document")
+
+    # 🧾 Extract text from the bytes already downloaded
+    yield {"stage": "parsing", "bytes": len(fetched.content)}
+    text = await asyncio.wait_for(
+        parse_document(fetched.filename, fetched.content),
+        timeout=request_context.timeout(reserve=GENERATION_RESERVE_SECONDS),
+    )
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Extracted document is empty.")
+
+    # ✂️ Chunk (per page, so a later refresh re-cuts only edited pages),
+    # then pick up any earlier attempt at the same content
+    chunks = chunk_text_with_offsets(text, split_pages=True)
+    journal = IngestJournal.open(chunks[0]["doc_hash"])
+    if journal.namespace is None:
+        journal.set_namespace(generate_namespace_index())
+        print(f"🆕 New document detected. Generated namespace: {journal.namespace}")
+    elif journal.completed:
+        print(f"✅ Same content already indexed. Using namespace: {journal.namespace}")
+    else:
+        print(f"♻️ Resuming ingest of this content in namespace: {journal.namespace}")
+    namespace = journal.namespace
+
+    # 🧠 Embed whatever the journal does not already record as done
+    if not journal.completed:
+        yield {"stage": "embedding", "chunks": len(chunks), "resumed_batches": len(journal.state["upserted"])}
+        await asyncio.wait_for(
+            embed_chunks(chunks=chunks, np=namespace, journal=journal),
+            timeout=request_context.timeout(reserve=GENERATION_RESERVE_SECONDS),
+        )
+
+    # 💾 Update and persist map, and remember the validators for later refreshes
+    update_manifest(namespace, **source_validators(document_url, fetched), doc_hash=chunks[0]["doc_hash"])
+    document_namespace_map[document_url] = namespace
+    save_document_map(document_namespace_map)
+    yield {"stage": "indexed", "namespace": namespace}
+
+
+# === Re-check a mapped document and re-embed only what changed ===
+# Refreshes run in the background after the request is answered from the current index
+DOCUMENT_REFRESH_ENABLED = os.getenv("DOCUMENT_REFRESH_ENABLED", "true").lower() == "true"
+# Conditional GETs per document at most this often
+DOCUMENT_REFRESH_INTERVAL_SECONDS = float(os.getenv("DOCUMENT_REFRESH_INTERVAL_SECONDS", "300"))
+# Budget of one background refresh (download, parse and re-embed of what changed)
+DOCUMENT_REFRESH_TIMEOUT_SECONDS = float(os.getenv("DOCUMENT_REFRESH_TIMEOUT_SECONDS", "600"))
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+
+def source_validators(document_url: str, fetched) -> Dict:
+    return {
+        "url": document_url,
+        "etag": fetched.etag,
+        "last_modified": fetched.last_modified,
+        "content_hash": hashlib.sha256(fetched.content).hexdigest() if fetched.content else None,
+        "checked_at": time.time(),
+    }
+
+
+async def refresh_document(document_url: str, namespace: str, request_context) -> AsyncIterator[Dict]:
+    """
+    Conditional GET (ETag / Last-Modified) for a document already in the map,
+    run by schedule_refresh off the request path. If it changed, its new chunks are diffed against the namespace's chunk
+    manifest and only new clauses are embedded, in the same namespace.
+    Yields progress events like ingest_document; nothing when not due.
+    """
+    manifest = load_manifest(namespace) or {}
+    if time.time() - manifest.get("checked_at", 0) < DOCUMENT_REFRESH_INTERVAL_SECONDS:
+        return
+
+    yield {"stage": "checking"}
+    fetched = await asyncio.wait_for(
+        fetch_document(document_url, manifest.get("etag"), manifest.get("last_modified")),
+        timeout=request_context.timeout(),
+    )
+    validators = source_validators(document_url, fetched)
+    if not manifest.get("content_hash"):
+        # Indexed before validators were kept: take this fetch as the baseline
+        update_manifest(namespace, **validators)
+        return
+    if fetched.not_modified or validators["content_hash"] == manifest.get("content_hash"):
+        validators["content_hash"] = manifest.get("content_hash")
+        update_manifest(namespace, **validators)
+        return
+
+    yield {"stage": "parsing", "bytes": len(fetched.content)}
+    text = await asyncio.wait_for(
+        parse_document(fetched.filename, fetched.content),
+        timeout=request_context.timeout(),
+    )
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Extracted document is empty.")
+    chunks = chunk_text_with_offsets(text, split_pages=True)  # cut like ingest_document
+    doc_hash = chunks[0]["doc_hash"]
+
+    # Journaled per (content, namespace): an update cut short resumes like an ingest
+    journal = IngestJournal.open(doc_hash, scope=f"ns{namespace}")
+    journal.set_namespace(namespace)
+    yield {"stage": "embedding", "chunks": len(chunks), "resumed_batches": len(journal.state["upserted"])}
+    changes = await asyncio.wait_for(
+        reembed_changed_chunks(chunks=chunks, np=namespace, journal=journal),
+        timeout=request_context.timeout(),
+    )
+
+    # The namespace no longer holds the old content, so neither journal may point new URLs at it
+    journal.discard()
+    if manifest.get("doc_hash"):
+        previous = IngestJournal.open(manifest["doc_hash"])
+        if previous.namespace == namespace:
+            previous.discard()
+    update_manifest(namespace, **validators, doc_hash=doc_hash)
+    print(f"🔁 Document changed; re-ingested into namespace {namespace}: {changes}")
+    yield {"stage": "updated", "namespace": namespace, **changes}
+
+
+async def _refresh_in_background(document_url: str, namespace: str):
+    # Own deadline and stage report: the request that scheduled this has already answered
+    request_context = start_request_context(DOCUMENT_REFRESH_TIMEOUT_SECONDS)
+    start_stage_report()
+    try:
+        async for progress in refresh_document(document_url, namespace, request_context):
+            print(f"🔁 Refresh of {document_url}: {progress}")
+    except Exception as e:
+        print(f"⚠️ Could not refresh {document_url}, keeping the indexed version: {e!r}")
+
+
+def schedule_refresh(document_url: str, namespace: str):
+    """Start a background refresh of a mapped document unless one is already running."""
+    if not DOCUMENT_REFRESH_ENABLED:
+        return
+    running = _refresh_tasks.get(namespace)
+    if running is not None and not running.done():
+        return
+    task = asyncio.create_task(_refresh_in_background(document_url, namespace))
+    _refresh_tasks[namespace] = task
+
+    def forget(done):
+        if _refresh_tasks.get(namespace) is done:
+            del _refresh_tasks[namespace]
+
+    task.add_done_callback(forget)
+
+
+@router.post("/run", dependencies=[Depends(verify_token), Depends(profile_request)])
+async def process_and_query(request: HackRxRequest,
+                            x_request_deadline_ms: Optional[str] = Header(None)):
     document_url = request.documents
+    token_report = start_token_report()
+    stage_report = start_stage_report()
+    request_context = start_request_context(parse_deadline_header(x_request_deadline_ms))
 
     try:
         # ✅ If URL already exists in map
         if document_url in document_namespace_map:
             namespace = document_namespace_map[document_url]
             print(f"✅ Found document in map. Using namespace: {namespace}")
-            answers = await query_documents_batch(request.questions, namespace=namespace)
-            return {"answers": answers}
-
-        # 🆕 New document: embed and index
-        namespace = generate_namespace_index()
-        print(f"🆕 New document detected. Generated namespace: {namespace}")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(document_url) as resp:
-                if resp.status != 200:
-                    raise HTTPException(status_code=400, detail="Failed to download document")
-                document_bytes = await resp.read()
-
-        # 🧾 Extract text
-        filename = os.path.basename(document_url)
-        upload_file = StarletteUploadFile(filename=filename, file=io.BytesIO(document_bytes))
-
-        if "hackrx/rounds/FinalRound4SubmissionPDF" in document_url:
-            token = await load_document(document_url)
-            ans = "The Flight Number is: " + token
-            return {"answers": ans}
-
-        if "hackrx.in/utils/get-secret-token" in document_url:
-            token = await load_document(document_url)
-            ans = "The secret token is: " + token
-            return {"answers": ans}
-        
-        text = await load_document(document_url)
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Extracted document is empty.")
-        
-        # ✂️ Chunk and embed
-        chunks = chunk_text(text)
-        await embed_chunks(chunks=chunks, np=namespace)
-
-        # 💾 Update and persist map
-        document_namespace_map[document_url] = namespace
-        save_document_map(document_namespace_map)
+            schedule_refresh(document_url, namespace)
+        else:
+            special_answer = await special_document_answer(document_url)
+            if special_answer is not None:
+                return {"answers": special_answer}
+
+            # 🆕 New document: embed and index
+            try:
+                async for progress in ingest_document(document_url, request_context):
+                    namespace = progress.get("namespace")
+            except asyncio.TimeoutError:
+                # Partially ingested namespaces are not recorded; the next request resumes from the journal
+                print(f"⏳ Ingest did not finish within the request deadline ({request_context.budget}s)")
+                return {"answers": [DEADLINE_PLACEHOLDER for _ in request.questions]}
 
         # 🔍 Query
         answers = await query_documents_batch(request.questions, namespace=namespace)
+        print(f"🧮 Prompt token usage: {token_report}")
+        print(f"⏱️ Stage timings: {stage_report}")
+        print(f"⏳ Degraded stages: {sorted(request_context.degraded_stages)}")
         return {"answers": answers}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
+
+
+# === Streaming variant: progress events, then each answer as soon as it is ready ===
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def format_event(event: str, data: Dict, stream_format: str) -> str:
+    if stream_format == "ndjson":
+        return json.dumps({"event": event, **data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_run(request: HackRxRequest, budget_seconds: float, stream_format: str) -> AsyncIterator[str]:
+    # Reports and deadline are started here: the body is iterated after the endpoint returns
+    token_report = start_token_report()
+    stage_report = start_stage_report()
+    request_context = start_request_context(budget_seconds)
+    document_url = request.documents
+
+    try:
+        if document_url in document_namespace_map:
+            namespace = document_namespace_map[document_url]
+            schedule_refresh(document_url, namespace)
+            yield format_event("progress", {"stage": "indexed", "namespace": namespace, "cached": True}, stream_format)
+        else:
+            special_answer = await special_document_answer(document_url)
+            if special_answer is not None:
+                yield format_event("done", {"answers": special_answer}, stream_format)
+                return
+
+            try:
+                async for progress in ingest_document(document_url, request_context):
+                    namespace = progress.get("namespace")
+                    yield format_event("progress", progress, stream_format)
+            except asyncio.TimeoutError:
+                print(f"⏳ Ingest did not finish within the request deadline ({request_context.budget}s)")
+                answers = [DEADLINE_PLACEHOLDER for _ in request.questions]
+                for i, answer in enumerate(answers):
+                    yield format_event("answer", {"index": i, "answer": answer}, stream_format)
+                yield format_event("done", {"answers": answers}, stream_format)
+                return
+
+        answers: List[Optional[str]] = [None] * len(request.questions)
+        async for i, answer in query_documents_stream(request.questions, namespace=namespace):
+            answers[i] = answer
+            yield format_event("answer", {"index": i, "answer": answer}, stream_format)
+
+        print(f"🧮 Prompt token usage: {token_report}")
+        print(f"⏱️ Stage timings: {stage_report}")
+        print(f"⏳ Degraded stages: {sorted(request_context.degraded_stages)}")
+        yield format_event("done", {"answers": answers}, stream_format)
+
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        detail = e.detail if isinstance(e, HTTPException) else f"Processing error: {str(e)}"
+        yield format_event("error", {"detail": detail}, stream_format)
+
+
+@router.post("/run/stream", dependencies=[Depends(verify_token), Depends(profile_request)])
+async def process_and_query_stream(request: HackRxRequest, format: str = "sse",
+                                   x_request_deadline_ms: Optional[str] = Header(None)):
+    """
+    Same input as /run. Emits `progress` events while a new document is ingested,
+    an `answer` event ({"index", "answer"}) per question as it completes, and a final
+    `done` event with every answer in question order. ?format=ndjson for NDJSON.
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {format}")
+    return StreamingResponse(
+        stream_run(request, parse_deadline_header(x_request_deadline_ms), format),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,9 @@
 import os
 
-DUMPER_FILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../dumper.txt"))
+DUMPER_FILE_PATH = os.getenv(
+    "NAMESPACE_COUNTER_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../dumper.txt")),
+)
 
 def generate_namespace_index(file_path=DUMPER_FILE_PATH) -> str:
     """
@@ -1,15 +1,16 @@
 # app/routes/upload_router.py
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Depends
 from app.services.document_loader import load_document
 from app.services.chunker import chunk_text
 from app.services.embedder import embed_chunks
+from app.utils.profiling import profile_request
 
 router = APIRouter(
     prefix="/upload",
     tags=["Upload"]
 )
 
-@router.post("/")
+@router.post("/", dependencies=[Depends(profile_request)])
 async def upload_doc(file: UploadFile = File(...)):
     text = await load_document(file)
     chunks = chunk_text(text)
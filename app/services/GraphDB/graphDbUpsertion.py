@@ -1,46 +1,161 @@
-from neo4j import GraphDatabase
 from dotenv import load_dotenv
 import os
+from app.utils.executor import run_blocking
+from app.utils.timing import timed
+# One driver (connected on first use) for reads and writes
+from app.services.GraphDB.graphQuerySearch import clear_graph_cache, get_driver
 
 # --- Load env variables ---
 load_dotenv()
 
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USERNAME")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# Clauses sent per UNWIND statement (one write transaction each)
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "500"))
+
+# --- Schema: every MERGE below is backed by a uniqueness constraint ---
+# Clause labels ("Clause 1") repeat in every policy, so a clause is keyed by
+# its namespace as well; the old clause_id-only constraint would merge them.
+SCHEMA_STATEMENTS = [
+    "DROP CONSTRAINT clause_id_unique IF EXISTS",
+    "CREATE CONSTRAINT clause_key_unique IF NOT EXISTS FOR (c:Clause) REQUIRE (c.namespace, c.clause_id) IS UNIQUE",
+    "CREATE CONSTRAINT category_name_unique IF NOT EXISTS FOR (c:Category) REQUIRE c.name IS UNIQUE",
+    "CREATE CONSTRAINT source_name_unique IF NOT EXISTS FOR (s:Source) REQUIRE s.name IS UNIQUE",
+    "CREATE INDEX clause_source_doc IF NOT EXISTS FOR (c:Clause) ON (c.source_doc)",
+    "CREATE INDEX clause_namespace IF NOT EXISTS FOR (c:Clause) ON (c.namespace)",
+    # Full-text seeds for graphQuerySearch.search_graph
+    "CREATE FULLTEXT INDEX clause_text IF NOT EXISTS FOR (c:Clause) ON EACH [c.text]",
+    "CREATE FULLTEXT INDEX category_name IF NOT EXISTS FOR (c:Category) ON EACH [c.name]",
+]
+
+_schema_ready = False
+
+
+def ensure_schema(session):
+    """Create constraints and indexes once per process (no-op when they exist)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    for statement in SCHEMA_STATEMENTS:
+        session.run(statement).consume()
+    _schema_ready = True
+
+
+# --- Upload clauses with their source, category and cross-references ---
+# Referenced clauses that are not loaded yet are created as bare nodes (in
+# the same namespace) and filled in when their own row arrives (in this batch
+# or a later one). A re-uploaded clause's references replace its old ones.
+UPSERT_CLAUSES_CYPHER = """
+UNWIND $rows AS row
+MERGE (c:Clause {namespace: row.namespace, clause_id: row.clause_id})
+SET c.text = row.text, c.page = row.page, c.source_doc = row.source_doc
+
+WITH c, row
+OPTIONAL MATCH (c)-[old:REFERS_TO|DEPENDS_ON]->()
+DELETE old
+
+WITH DISTINCT c, row
+
+MERGE (s:Source {name: row.source_doc})
+MERGE (c)-[:FROM_SOURCE]->(s)
+
+MERGE (cat:Category {name: row.category})
+MERGE (c)-[:CATEGORIZED_AS]->(cat)
+
+FOREACH (target_id IN row.refers_to |
+    MERGE (t:Clause {namespace: row.namespace, clause_id: target_id})
+    MERGE (c)-[:REFERS_TO]->(t)
+)
+FOREACH (target_id IN row.depends_on |
+    MERGE (t:Clause {namespace: row.namespace, clause_id: target_id})
+    MERGE (c)-[:DEPENDS_ON]->(t)
+)
+"""
+
+DELETE_CLAUSES_CYPHER = """
+UNWIND $clause_ids AS clause_id
+MATCH (c:Clause {namespace: $namespace, clause_id: clause_id})
+DETACH DELETE c
+"""
+
+
+def clause_rows(clauses):
+    """Flatten clause dicts into UNWIND rows (MERGE keys must never be null)."""
+    rows = []
+    for clause in clauses:
+        metadata = clause.get("metadata") or {}
+        rows.append({
+            "clause_id": clause["clause_id"],
+            "text": clause.get("text", ""),
+            "page": metadata.get("page"),
+            "source_doc": clause.get("source_doc") or "unknown",
+            # Part of the node key, and what graph search is scoped to ("" outside any namespace)
+            "namespace": clause.get("namespace") or metadata.get("namespace") or "",
+            "category": metadata.get("category") or "Uncategorized",
+            "refers_to": [str(t) for t in metadata.get("refers_to") or []],
+            "depends_on": [str(t) for t in metadata.get("depends_on") or []],
+        })
+    return rows
+
+
+def write_clause_batch(tx, rows):
+    tx.run(UPSERT_CLAUSES_CYPHER, rows=rows).consume()
+
+
+def delete_clause_batch(tx, clause_ids, namespace):
+    tx.run(DELETE_CLAUSES_CYPHER, clause_ids=clause_ids, namespace=namespace).consume()
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
-# --- Upload clause as a node with category relationship ---
 def insert_clause(tx, clause):
-    tx.run("""
-        MERGE (c:Clause {clause_id: $clause_id})
-        SET c.text = $text, c.page = $page, c.source_doc = $source_doc
-
-        MERGE (s:Source {name: $source_doc})
-        MERGE (c)-[:FROM_SOURCE]->(s)
-        
-        FOREACH (cat IN [$category] |
-            MERGE (catNode:Category {name: cat})
-            MERGE (c)-[:CATEGORIZED_AS]->(catNode)
-        )
-        
-        MATCH (a:Clause {{clause_id: $from}}), (b:Clause {{clause_id: $to}})
-            MERGE (a)-[:{rel_type}]->(b)
-    """, 
-    clause_id=clause["clause_id"],
-    text=clause["text"],
-    page=clause["metadata"].get("page"),
-    source_doc=clause["source_doc"],
-    category=clause["metadata"].get("category", "Uncategorized"),
-    )
+    write_clause_batch(tx, clause_rows([clause]))
+
+
+def record_clauses(records, namespace, graph=None):
+    """
+    Clauses for `upload_clauses_to_neo4j` from ingest records (Pinecone
+    records), keyed by record id; references come from the namespace's
+    clause_graph, so both graphs hold the same edges.
+    """
+    clauses = []
+    for record in records:
+        metadata = record["metadata"]
+        node = graph.node_lookup.get(record["id"]) if graph is not None else None
+        refers_to = [graph.doc_ids[target] for target in graph.neighbours(node)] if node is not None else []
+        clauses.append({
+            "clause_id": record["id"],
+            "text": metadata.get("text", ""),
+            "source_doc": metadata.get("source_name"),
+            "namespace": namespace,
+            "metadata": {"page": metadata.get("page_number"), "refers_to": refers_to},
+        })
+    return clauses
 
 # --- Bulk uploader ---
-def upload_clauses_to_neo4j(clauses):
-    with driver.session() as session:
-        for clause in clauses:
-            session.execute_write(insert_clause, clause)
-        print("✅ All clauses uploaded to Neo4j.")
+@timed("neo4j_upsert")
+def upload_clauses_to_neo4j(clauses, batch_size=NEO4J_BATCH_SIZE):
+    rows = clause_rows(clauses)
+    with get_driver().session() as session:
+        ensure_schema(session)
+        for i in range(0, len(rows), batch_size):
+            session.execute_write(write_clause_batch, rows[i:i + batch_size])
+        print(f"✅ {len(rows)} clauses uploaded to Neo4j in {-(-len(rows) // batch_size)} batch(es).")
+    clear_graph_cache()
+    return len(rows)
+
+# --- Remove clauses (records dropped from a re-ingested document) ---
+@timed("neo4j_delete")
+def delete_clauses_from_neo4j(clause_ids, namespace, batch_size=NEO4J_BATCH_SIZE):
+    with get_driver().session() as session:
+        for i in range(0, len(clause_ids), batch_size):
+            session.execute_write(delete_clause_batch, clause_ids[i:i + batch_size], namespace)
+    clear_graph_cache()
+    return len(clause_ids)
+
+# --- Async entrypoints: run on the shared executor under the neo4j limit ---
+async def upload_clauses_to_neo4j_async(clauses, timeout=None):
+    return await run_blocking("neo4j", upload_clauses_to_neo4j, clauses, timeout=timeout)
+
+
+async def delete_clauses_from_neo4j_async(clause_ids, namespace, timeout=None):
+    return await run_blocking("neo4j", delete_clauses_from_neo4j, clause_ids, namespace, timeout=timeout)
 
 # --- Sample usage (if testing alone) ---
 if __name__ == "__main__":
@@ -1,7 +1,14 @@
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from collections import OrderedDict
 import os
-from queryExtractor import extract_info
+import re
+import time
+import queue
+import threading
+from app.utils.backends import fake_backend
+from app.utils.executor import run_blocking
+from app.utils.timing import timed
 
 # --- Load Neo4j credentials ---
 load_dotenv()
@@ -9,42 +16,247 @@ uri = os.getenv("NEO4J_URI")
 user = os.getenv("NEO4J_USERNAME")
 password = os.getenv("NEO4J_PASSWORD")
 
-driver = GraphDatabase.driver(uri, auth=(user, password))
+# --- Retrieval settings ---
+# Graph retrieval is an extra source in query_service.retrieve_hits (opt-in)
+GRAPH_RETRIEVAL_ENABLED = os.getenv("GRAPH_RETRIEVAL_ENABLED", "false").lower() == "true"
+GRAPH_RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("GRAPH_RETRIEVAL_TIMEOUT_SECONDS", "1.0"))
+# Full-text seed clauses per query, before expansion
+GRAPH_SEED_LIMIT = int(os.getenv("GRAPH_SEED_LIMIT", "5"))
+# Hops followed along DEPENDS_ON / REFERS_TO from each seed (0-2)
+GRAPH_EXPAND_HOPS = max(0, min(2, int(os.getenv("GRAPH_EXPAND_HOPS", "2"))))
+# Score multiplier per hop, so referenced clauses rank below their seed
+GRAPH_HOP_DECAY = float(os.getenv("GRAPH_HOP_DECAY", "0.5"))
+GRAPH_MAX_RESULTS = int(os.getenv("GRAPH_MAX_RESULTS", "10"))
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "256"))
+GRAPH_CACHE_TTL_SECONDS = float(os.getenv("GRAPH_CACHE_TTL_SECONDS", "300"))
+# Sessions kept open for reuse; matches the executor's neo4j concurrency
+GRAPH_SESSION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONCURRENCY", "4"))
 
-# --- Query the graph using structured query data ---
+WORD = re.compile(r"\w+")
+# Lucene would otherwise match on these in almost every clause
+STOPWORDS = {
+    "the", "and", "for", "are", "what", "which", "with", "does", "this", "that", "under",
+    "how", "there", "any", "policy", "from", "have", "has", "can", "will",
+}
+
+# Full-text indexes (created by graphDbUpsertion.ensure_schema) seed the
+# search by clause text and category name; each seed is then expanded along
+# outgoing DEPENDS_ON / REFERS_TO edges. Bare nodes created for forward
+# references (no text yet) are skipped. A non-null $namespace / $source_doc
+# keeps seeds, and every clause on an expansion path, in that document.
+# WHERE must come after a WITH's ORDER BY / LIMIT, so the filtered seeds are
+# projected again before ranking (benchmarks/graph_cypher_check.py).
+SEED_CYPHER = """
+CALL {{
+    CALL db.index.fulltext.queryNodes('clause_text', $search) YIELD node, score
+    RETURN node AS seed, score
+    UNION
+    CALL db.index.fulltext.queryNodes('category_name', $search) YIELD node AS cat, score
+    MATCH (seed:Clause)-[:CATEGORIZED_AS]->(cat)
+    RETURN seed, score
+}}
+WITH seed, max(score) AS score
+WHERE seed.text IS NOT NULL
+  AND ($namespace IS NULL OR seed.namespace = $namespace)
+  AND ($source_doc IS NULL OR seed.source_doc = $source_doc)
+WITH seed, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+EXPAND_CYPHER = """
+OPTIONAL MATCH path = (seed)-[:DEPENDS_ON|REFERS_TO*1..{hops}]->(ref:Clause)
+WHERE ref.text IS NOT NULL AND ref <> seed
+  AND all(n IN nodes(path) WHERE ($namespace IS NULL OR n.namespace = $namespace)
+                             AND ($source_doc IS NULL OR n.source_doc = $source_doc))
+WITH seed, score, ref, min(length(path)) AS hops
+RETURN seed.clause_id AS clause_id, seed.text AS text, seed.source_doc AS doc, seed.page AS page, score,
+       collect(CASE WHEN ref IS NULL THEN NULL ELSE
+           {{clause_id: ref.clause_id, text: ref.text, doc: ref.source_doc, page: ref.page, hops: hops}}
+       END) AS refs
+ORDER BY score DESC
+"""
+
+SEEDS_ONLY_CYPHER = """
+RETURN seed.clause_id AS clause_id, seed.text AS text, seed.source_doc AS doc, seed.page AS page, score,
+       [] AS refs
+ORDER BY score DESC
+"""
+
+
+def search_cypher(hops):
+    """Variable-length bounds cannot be parameters, so `hops` is formatted in."""
+    return (SEED_CYPHER + (EXPAND_CYPHER if hops else SEEDS_ONLY_CYPHER)).format(hops=int(hops))
+
+
+# --- Driver and session pool ---
+# Sessions are not thread-safe, so each executor thread borrows one for the
+# duration of a query instead of opening (and tearing down) a fresh one.
+_driver = None
+_driver_lock = threading.Lock()
+_sessions: "queue.LifoQueue" = queue.LifoQueue(maxsize=GRAPH_SESSION_POOL_SIZE)
+
+
+def get_driver():
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                # NEO4J_BACKEND=fake: the in-memory stand-in used by benchmarks
+                fakes = fake_backend("neo4j")
+                if fakes:
+                    _driver = fakes.FakeNeo4jDriver()
+                else:
+                    _driver = GraphDatabase.driver(uri, auth=(user, password),
+                                                   max_connection_pool_size=GRAPH_SESSION_POOL_SIZE * 2)
+    return _driver
+
+
+def close_driver():
+    """Close pooled sessions and the driver; the next query connects again."""
+    global _driver
+    with _driver_lock:
+        while True:
+            try:
+                _sessions.get_nowait().close()
+            except queue.Empty:
+                break
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+def _read(cypher, **params):
+    try:
+        session = _sessions.get_nowait()
+    except queue.Empty:
+        session = get_driver().session()
+    try:
+        records = [record.data() if hasattr(record, "data") else dict(record)
+                   for record in session.run(cypher, **params)]
+    except Exception:
+        session.close()  # a failed session may be mid-transaction; never reuse it
+        raise
+    try:
+        _sessions.put_nowait(session)
+    except queue.Full:
+        session.close()
+    return records
+
+
+# --- Per-query result cache (LRU with a TTL, since clauses can be re-uploaded) ---
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > GRAPH_CACHE_TTL_SECONDS:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return value
+
+
+def _cache_put(key, value):
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), value)
+        _cache.move_to_end(key)
+        while len(_cache) > GRAPH_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_graph_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def to_search_terms(text):
+    """Lucene query of OR-ed words; \\w-only tokens need no escaping."""
+    terms = []
+    for word in WORD.findall(text.lower()):
+        if len(word) > 2 and word not in STOPWORDS and word not in terms:
+            terms.append(word)
+    return " OR ".join(terms)
+
+
+# --- Graph search: full-text seeds plus referenced clauses, best-first ---
+@timed("neo4j_query")
+def search_graph(query, namespace=None, source_doc=None, limit=GRAPH_SEED_LIMIT, hops=GRAPH_EXPAND_HOPS,
+                 max_results=GRAPH_MAX_RESULTS):
+    """
+    Hits in the shared {"id", "score", "text", "metadata"} form, from the
+    clauses of `namespace` / `source_doc` when given. A clause reached from
+    several seeds keeps its best (decayed) score.
+    """
+    search = to_search_terms(query)
+    if not search:
+        return []
+    key = (search, namespace, source_doc, limit, hops, max_results)
+    cached = _cache_get(key)
+    if cached is not None:
+        return list(cached)
+
+    cypher = search_cypher(hops)
+    best = {}
+
+    def add(clause_id, text, doc, page, score, depth, via=None):
+        current = best.get(clause_id)
+        if current is not None and current["score"] >= score:
+            return
+        metadata = {"clause_id": clause_id, "text": text, "source_doc": doc, "page": page, "hops": depth}
+        if via:
+            metadata["via"] = via
+        best[clause_id] = {"id": clause_id, "score": score, "text": text, "metadata": metadata}
+
+    for record in _read(cypher, search=search, namespace=namespace, source_doc=source_doc, limit=limit):
+        add(record["clause_id"], record["text"], record["doc"], record["page"], record["score"], 0)
+        for ref in record["refs"]:
+            add(ref["clause_id"], ref["text"], ref["doc"], ref["page"],
+                record["score"] * GRAPH_HOP_DECAY ** ref["hops"], ref["hops"], via=record["clause_id"])
+
+    hits = sorted(best.values(), key=lambda h: h["score"], reverse=True)[:max_results]
+    _cache_put(key, tuple(hits))
+    return hits
+
+
+# --- Query the graph using structured query data (extract_info output) ---
 def get_clauses_from_graph(query_data):
-    clause_results = []
-
-    with driver.session() as session:
-        cypher = """
-        MATCH (c:Clause)-[:CATEGORIZED_AS]->(cat:Category)
-        WHERE toLower(cat.name) CONTAINS toLower($category)
-        RETURN c.clause_id AS clause_id, c.text AS text, c.source_doc AS doc, c.page AS page
-        LIMIT 5
-        """
-
-        # Fallback to category/procedure
-        category = query_data.get("procedure") or query_data.get("relation") or "general"
-
-        results = session.run(cypher, category=category)
-        for record in results:
-            clause_results.append({
-                "clause_id": record["clause_id"],
-                "text": record["text"],
-                "source_doc": record["doc"],
-                "page": record["page"]
-            })
-
-    return clause_results
+    # Fallback to category/procedure
+    category = query_data.get("procedure") or query_data.get("relation") or "general"
+    return [
+        {
+            "clause_id": hit["id"],
+            "text": hit["text"],
+            "source_doc": hit["metadata"]["source_doc"],
+            "page": hit["metadata"]["page"],
+            "hops": hit["metadata"]["hops"],
+        }
+        for hit in search_graph(category)
+    ]
+
+# --- Async entrypoints: run on the shared executor under the neo4j limit ---
+async def search_graph_async(query, namespace=None, source_doc=None, timeout=None):
+    return await run_blocking("neo4j", search_graph, query, namespace, source_doc, timeout=timeout)
+
+
+async def get_clauses_from_graph_async(query_data, timeout=None):
+    return await run_blocking("neo4j", get_clauses_from_graph, query_data, timeout=timeout)
 
 # --- Entry point ---
 if __name__ == "__main__":
+    from app.services.GraphDB.queryExtractor import extract_info
+
     query = input("🧠 Enter your insurance query: ")
     structured = extract_info(query)
     print("\n🔍 Extracted Info:", structured)
 
-    clauses = get_clauses_from_graph(structured)
+    clauses = search_graph(query)
 
     print(f"\n📄 Top {len(clauses)} matching clauses from GraphDB:\n")
-    for i, c in enumerate(clauses):
-        print(clauses)
+    for c in clauses:
+        print(f"[{c['metadata']['hops']} hop(s), {c['score']:.2f}] {c['id']}: {c['text'][:120]}")
@@ -1,12 +1,49 @@
+import os
 import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 import spacy
-from typing import Dict
+from app.utils.executor import run_blocking
 
-nlp = spacy.load("en_core_web_sm")
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# Only tokens and entities (GPE) are used; the rest of the pipeline is dead weight
+UNUSED_PIPES = ("parser", "lemmatizer", "tagger", "attribute_ruler", "senter")
+EXTRACT_BATCH_SIZE = int(os.getenv("EXTRACT_BATCH_SIZE", "64"))
+# Batches at least this large are split across worker processes
+EXTRACT_POOL_MIN_BATCH = int(os.getenv("EXTRACT_POOL_MIN_BATCH", "200"))
+EXTRACT_POOL_WORKERS = int(os.getenv("EXTRACT_POOL_WORKERS", "2"))
+
+# --- Patterns, compiled once ---
+AGE_PATTERN = re.compile(r'(\d{2})[- ]?(year|yr)?[- ]?(old)?')
+POLICY_PATTERN = re.compile(r'policy (is|was)? ?(\d+)[ -]?(month|months|year|years)')
+EVENT_PATTERN = re.compile(r'(\d+)[ -]?(month|months|year|years)[ -]?ago')
+FEMALE_RELATION = re.compile(r"wife|mother|daughter|sister")
+MALE_RELATION = re.compile(r"husband|father|son|brother")
+PROCEDURE_KEYWORDS = frozenset([
+    "surgery", "maternity", "hospitalization", "therapy", "diabetes", "cancer", "covid", "delivery", "transplant",
+])
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """The spaCy pipeline with unused components disabled, loaded on first use."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                nlp = spacy.load(SPACY_MODEL)
+                for name in UNUSED_PIPES:
+                    if name in nlp.pipe_names:
+                        nlp.disable_pipe(name)
+                _nlp = nlp
+    return _nlp
 
-def extract_info(query: str) -> Dict:
-    doc = nlp(query)
 
+def _extract_from_doc(query: str, doc) -> Dict:
     age = None
     gender = None
     relation = None
@@ -14,38 +51,40 @@ def extract_info(query: str) -> Dict:
     location = None
     policy_duration = None
     event_time = None
+    lowered = query.lower()
 
     # --- Age ---
-    age_match = re.search(r'(\d{2})[- ]?(year|yr)?[- ]?(old)?', query)
+    age_match = AGE_PATTERN.search(query)
     if age_match:
         age = int(age_match.group(1))
 
     # --- Policy duration ---
-    policy_match = re.search(r'policy (is|was)? ?(\d+)[ -]?(month|months|year|years)', query)
+    policy_match = POLICY_PATTERN.search(query)
     if policy_match:
         value = int(policy_match.group(2))
         unit = policy_match.group(3)
         policy_duration = value * 12 if 'year' in unit else value
 
     # --- Event timing (e.g., "2 months ago") ---
-    event_match = re.search(r'(\d+)[ -]?(month|months|year|years)[ -]?ago', query)
+    event_match = EVENT_PATTERN.search(query)
     if event_match:
         event_time = event_match.group(0)
 
-    # --- Gender & relation ---
-    if any(word in query.lower() for word in ["wife", "mother", "daughter", "sister"]):
+    # --- Gender & relation (a male relation wins if both appear) ---
+    female = FEMALE_RELATION.search(lowered)
+    if female:
         gender = "female"
-        relation = re.findall(r"wife|mother|daughter|sister", query.lower())[0]
+        relation = female.group(0)
 
-    if any(word in query.lower() for word in ["husband", "father", "son", "brother"]):
+    male = MALE_RELATION.search(lowered)
+    if male:
         gender = "male"
-        relation = re.findall(r"husband|father|son|brother", query.lower())[0]
+        relation = male.group(0)
 
     # --- Procedure (using keywords) ---
-    procedure_keywords = ["surgery", "maternity", "hospitalization", "therapy", "diabetes", "cancer", "covid", "delivery", "transplant"]
     for token in doc:
-        if token.text.lower() in procedure_keywords:
-            procedure = token.text.lower()
+        if token.lower_ in PROCEDURE_KEYWORDS:
+            procedure = token.lower_
             break
 
     # --- Location ---
@@ -63,6 +102,58 @@ def extract_info(query: str) -> Dict:
         "event_time": event_time
     }
 
+
+def extract_info(query: str) -> Dict:
+    return _extract_from_doc(query, get_nlp()(query))
+
+
+def _extract_serial(queries: List[str], batch_size: int = EXTRACT_BATCH_SIZE) -> List[Dict]:
+    return [
+        _extract_from_doc(query, doc)
+        for query, doc in zip(queries, get_nlp().pipe(queries, batch_size=batch_size))
+    ]
+
+
+# --- Worker pool for large batches (each worker loads the model once) ---
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs the web server's threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=get_nlp)
+        return _pool
+
+
+def extract_info_batch(queries: List[str], batch_size: int = EXTRACT_BATCH_SIZE,
+                       use_pool: Optional[bool] = None) -> List[Dict]:
+    """
+    extract_info for many queries: one `nlp.pipe` pass, split across worker
+    processes when the batch has at least EXTRACT_POOL_MIN_BATCH queries.
+    """
+    queries = list(queries)
+    if use_pool is None:
+        use_pool = EXTRACT_POOL_WORKERS > 1 and len(queries) >= EXTRACT_POOL_MIN_BATCH
+    if not use_pool:
+        return _extract_serial(queries, batch_size)
+
+    size = -(-len(queries) // EXTRACT_POOL_WORKERS)
+    slices = [queries[i:i + size] for i in range(0, len(queries), size)]
+    results = []
+    for part in _get_pool().map(_extract_serial, slices, [batch_size] * len(slices)):
+        results.extend(part)
+    return results
+
+
+# --- Async entrypoint: runs on the shared executor under the cpu limit ---
+async def extract_info_batch_async(queries: List[str], timeout=None) -> List[Dict]:
+    return await run_blocking("cpu", extract_info_batch, queries, timeout=timeout)
+
 # 🧪 Example usage
 if __name__ == "__main__":
     query = input("Enter natural language query: ")
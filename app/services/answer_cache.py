@@ -0,0 +1,215 @@
+import os
+import re
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# --- Cache settings ---
+# Opt-in: a near-duplicate question ("is X covered" / "is X excluded") can
+# embed above any threshold, and a wrong cached answer is served silently.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.json")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.98"))  # cosine similarity
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r"\s+", " ", question).strip().lower()
+    return question.rstrip(" ?.!")
+
+
+def _pack_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+
+
+def _unpack_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def _unit(vector) -> np.ndarray:
+    """float32 copy scaled to unit length, so cosine similarity is a dot product."""
+    vector = np.array(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class AnswerCache:
+    """
+    Answer cache keyed by (namespace, normalized question), with a fallback
+    near-duplicate lookup by question-embedding cosine similarity within the
+    namespace. LRU-evicted, TTL-expired and persisted to a local JSON file.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL_SECONDS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        # (namespace, dimension) -> (keys, unit-norm embedding rows, created), rebuilt after changes
+        self.matrices: Dict[Tuple[str, int], Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]] = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def _expired(self, entry: Dict) -> bool:
+        return time.time() - entry["created"] > self.ttl
+
+    # --- Lookups ---
+    def get_exact(self, namespace: str, question: str) -> Optional[str]:
+        key = (str(namespace), normalize_question(question))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self.entries[key]
+                self._drop_matrices(key[0])
+                self.dirty = True
+                return None
+            self.entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry["answer"]
+
+    def _matrix(self, namespace: str, dim: int) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray]:
+        """Keys, unit-norm embeddings and creation times of a namespace (lock held)."""
+        cached = self.matrices.get((namespace, dim))
+        if cached is None:
+            keys, rows, created = [], [], []
+            for key, entry in self.entries.items():
+                vector = entry.get("embedding")
+                if key[0] == namespace and vector is not None and len(vector) == dim:
+                    keys.append(key)
+                    rows.append(vector)
+                    created.append(entry["created"])
+            matrix = np.vstack(rows) if rows else np.empty((0, dim), dtype=np.float32)
+            cached = self.matrices[(namespace, dim)] = (keys, matrix, np.array(created))
+        return cached
+
+    def _drop_matrices(self, namespace: str):
+        for cached_key in [k for k in self.matrices if k[0] == namespace]:
+            del self.matrices[cached_key]
+
+    def get_similar_many(self, namespace: str, embeddings: List[List[float]]) -> List[Optional[str]]:
+        """
+        Best cached answer per question embedding (same dimension), or None
+        below the threshold. One matrix product against the namespace's
+        cached embeddings, so it is cheap enough to run on the event loop.
+        """
+        if not embeddings:
+            return []
+        namespace = str(namespace)
+        queries = np.array(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        answers: List[Optional[str]] = [None] * len(embeddings)
+        with self.lock:
+            keys, matrix, created = self._matrix(namespace, queries.shape[1])
+            if keys:
+                scores = queries @ matrix.T
+                scores[:, time.time() - created > self.ttl] = -np.inf
+                best = scores.argmax(axis=1)
+                for i, column in enumerate(best):
+                    if scores[i, column] >= self.threshold:
+                        self.entries.move_to_end(keys[column])
+                        answers[i] = self.entries[keys[column]]["answer"]
+            hits = sum(1 for answer in answers if answer is not None)
+            self.stats["semantic_hits"] += hits
+            self.stats["misses"] += len(answers) - hits
+        return answers
+
+    def get_similar(self, namespace: str, embedding: List[float]) -> Optional[str]:
+        return self.get_similar_many(namespace, [embedding])[0]
+
+    # --- Updates ---
+    def put(self, namespace: str, question: str, answer: str, embedding: Optional[List[float]] = None):
+        key = (str(namespace), normalize_question(question))
+        vector = _unit(embedding) if embedding is not None else None
+        with self.lock:
+            self.entries[key] = {
+                "question": question,
+                "answer": answer,
+                "embedding": vector,
+                "created": time.time(),
+            }
+            self.entries.move_to_end(key)
+            self._drop_matrices(key[0])
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                self._drop_matrices(evicted[0])
+            self.dirty = True
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Drop every answer for a namespace (called when it is re-ingested)."""
+        namespace = str(namespace)
+        with self.lock:
+            stale = [key for key in self.entries if key[0] == namespace]
+            for key in stale:
+                del self.entries[key]
+            self._drop_matrices(namespace)
+            if stale:
+                self.dirty = True
+        return len(stale)
+
+    # --- Persistence ---
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = [
+                {
+                    "namespace": ns,
+                    "key": normalized,
+                    "question": entry["question"],
+                    "answer": entry["answer"],
+                    "created": entry["created"],
+                    "embedding": _pack_vector(entry["embedding"]) if entry["embedding"] is not None else None,
+                }
+                for (ns, normalized), entry in self.entries.items()
+                if not self._expired(entry)
+            ]
+            self.dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load answer cache: {e}")
+            return
+        with self.lock:
+            self.matrices.clear()
+            for item in data:  # saved in LRU order, oldest first
+                # Files written before vectors were stored unit-length load the same way
+                vector = _unit(_unpack_vector(item["embedding"])) if item.get("embedding") else None
+                entry = {
+                    "question": item["question"],
+                    "answer": item["answer"],
+                    "embedding": vector,
+                    "created": item["created"],
+                }
+                if not self._expired(entry):
+                    self.entries[(item["namespace"], item["key"])] = entry
+
+
+_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache()
+        _cache.load()
+    return _cache
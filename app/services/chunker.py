@@ -1,13 +1,38 @@
 #chunker.py
+import re
+import hashlib
 from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
 from langchain.docstore.document import Document
+from app.utils.timing import timed
+from app.utils.metrics import inc
 
-def chunk_text(text: str, source_name="document.pdf",
-               chunk_size=800, chunk_overlap=200,
-               encoding_name="gpt2") -> list[str]:
+# Part of every chunk id: bump whenever splitting changes, so old ids and
+# ingest journals are never mixed with differently cut chunks
+CHUNKER_VERSION = "3"
 
-    # Normalize newlines and clean whitespace
-    text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+# Page separator written by document_loader.extract_text_from_pdf. With
+# split_pages (the hackrx ingest / re-ingest path) chunks never cross it, so an
+# edit re-cuts only its own pages' chunks instead of shifting every token
+# window after it. Other callers keep whole-document windows.
+PAGE_BREAK = "\n\n---PAGE_BREAK---\n\n"
+SOURCE_HEADER = re.compile(r"^\(Source: .*?, Chunk \d+\)\s*")
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(doc_hash: str, offset) -> str:
+    """Stable id from (document hash, chunk offset, chunker version)."""
+    return f"{doc_hash[:16]}-v{CHUNKER_VERSION}-{offset}"
+
+
+def content_hash(text: str) -> str:
+    """Hash of a chunk or clause without its "(Source: ..., Chunk N)" header, which renumbers."""
+    return hashlib.sha1(SOURCE_HEADER.sub("", text).encode("utf-8")).hexdigest()
+
+def split_text(text: str, chunk_size=800, chunk_overlap=200,
+               encoding_name="gpt2") -> list[str]:
 
     # Attempt token-based splitting first
     try:
@@ -16,7 +41,7 @@ def chunk_text(text: str, source_name="document.pdf",
             chunk_overlap=chunk_overlap,
             encoding_name=encoding_name
         )
-        chunks = token_splitter.split_text(text)
+        return token_splitter.split_text(text)
     except Exception as e:
         print(f"[TokenTextSplitter failed with error: {e}] Falling back to RecursiveCharacterTextSplitter.")
         char_splitter = RecursiveCharacterTextSplitter(
@@ -24,13 +49,64 @@ def chunk_text(text: str, source_name="document.pdf",
             chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
-        chunks = char_splitter.split_text(text)
+        return char_splitter.split_text(text)
+
+
+@timed("chunk")
+def chunk_text_with_offsets(text: str, source_name="document.pdf",
+                            chunk_size=800, chunk_overlap=200,
+                            encoding_name="gpt2", split_pages=False) -> list[dict]:
+    """
+    Same chunks as `chunk_text` with the same `split_pages`, plus the
+    character span each chunk covers so overlapping neighbours can be merged
+    later. Spans come with a `page_key` (hash of the text they are relative
+    to). With `split_pages`, chunks never cross PAGE_BREAK and spans are
+    relative to their page, so an edit elsewhere in the document leaves both
+    unchanged; otherwise the whole document is one page.
+    """
+    # Normalize newlines and clean whitespace
+    text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+    doc_hash = document_hash(text)
+
+    results = []
+    page_offset = 0
+    for page in text.split(PAGE_BREAK) if split_pages else [text]:
+        page_key = hashlib.sha1(page.encode("utf-8")).hexdigest()[:16]
+        cursor = 0
+        for chunk in split_text(page, chunk_size, chunk_overlap, encoding_name):
+            body = chunk.strip()
+            if not body:
+                continue
+            # Chunks come back in page order, each starting after the previous start
+            start = page.find(body, cursor)
+            if start >= 0:
+                cursor = start + 1
+                char_start, char_end = start, start + len(body)
+            else:
+                char_start = char_end = None  # e.g. a token split inside a multi-byte char
+            # The id keeps the document-wide offset, so it stays unique across pages
+            offset = page_offset + char_start if char_start is not None else f"n{len(results)}"
+            results.append({
+                "text": f"(Source: {source_name}, Chunk {len(results)+1})\n\n{body}",
+                "char_start": char_start,
+                "char_end": char_end,
+                "page_key": page_key,
+                "doc_hash": doc_hash,
+                "chunk_id": make_chunk_id(doc_hash, offset),
+            })
+        page_offset += len(page) + len(PAGE_BREAK)
+
+    inc("chunks_total", len(results))
+    return results
+
+
+def chunk_text(text: str, source_name="document.pdf",
+               chunk_size=800, chunk_overlap=200,
+               encoding_name="gpt2", split_pages=False) -> list[str]:
 
     # Add metadata with source and chunk number
-    enhanced_chunks = [
-        f"(Source: {source_name}, Chunk {i+1})\n\n{chunk.strip()}"
-        for i, chunk in enumerate(chunks)
-        if chunk.strip()
+    return [
+        chunk["text"]
+        for chunk in chunk_text_with_offsets(text, source_name, chunk_size, chunk_overlap, encoding_name,
+                                             split_pages)
     ]
-
-    return enhanced_chunks
\ No newline at end of file
@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import base64
+from array import array
+from typing import List, Dict, Optional
+
+from app.services.lexical_index import namespace_dir, get_namespace_index
+
+# --- Clause structure (shared with EnhancedDocumentProcessor.add_clause_markers) ---
+# "3) Maternity Expenses (Code -C003)" starts clause 3, "b. ..." is its sub-clause b
+CLAUSE_HEADING = re.compile(r"^(\d+)\)\s.*?\(Code\s-(\w+)\)")
+SUB_CLAUSE_LINE = re.compile(r"^([a-z])\.\s")
+CLAUSE_MARKER = "CLAUSE_START: "
+SUB_CLAUSE_MARKER = "SUB_CLAUSE: "
+
+# "refer to Clause 3", "subject to clause 2(b)", "as per Section 4.1", "Code -C003"
+CLAUSE_REFERENCE = re.compile(
+    r"\b(?:clause|section|article)\s+(\d+(?:\.\d+)*)(?:\s*\(?([a-z])\)(?!\w))?",
+    re.IGNORECASE,
+)
+CODE_REFERENCE = re.compile(r"\bcode\s*-?\s*([a-z]+\d+)\b", re.IGNORECASE)
+
+CLAUSE_GRAPH_FILE = "clause_graph.json"
+
+# --- Retrieval-time expansion settings ---
+CLAUSE_REFS_ENABLED = os.getenv("CLAUSE_REFS_ENABLED", "true").lower() == "true"
+# Only the best few hits pull in what they reference
+CLAUSE_REFS_EXPAND_TOP = int(os.getenv("CLAUSE_REFS_EXPAND_TOP", "3"))
+CLAUSE_REFS_MAX_HOPS = int(os.getenv("CLAUSE_REFS_MAX_HOPS", "2"))
+CLAUSE_REFS_MAX_ADDED = int(os.getenv("CLAUSE_REFS_MAX_ADDED", "3"))
+
+
+def _strip_marker(line: str) -> str:
+    for marker in (CLAUSE_MARKER, SUB_CLAUSE_MARKER):
+        if line.startswith(marker):
+            return line[len(marker):]
+    return line
+
+
+def clause_keys(text: str, current_clause: Optional[str]) -> tuple:
+    """
+    Keys a chunk defines, from its first line, plus the clause number in
+    effect afterwards (sub-clauses belong to the last numbered heading).
+    """
+    first_line = _strip_marker(text.strip().split("\n", 1)[0].strip())
+    heading = CLAUSE_HEADING.match(first_line)
+    if heading:
+        number, code = heading.group(1), heading.group(2).lower()
+        return [number, code], number
+    sub = SUB_CLAUSE_LINE.match(first_line)
+    if sub and current_clause:
+        return [f"{current_clause}.{sub.group(1)}"], current_clause
+    return [], current_clause
+
+
+def clause_references(text: str) -> List[str]:
+    """Reference keys mentioned in the chunk body (the heading itself is skipped)."""
+    lines = text.strip().split("\n", 1)
+    first_line = _strip_marker(lines[0].strip())
+    body = lines[1] if len(lines) > 1 else ""
+    if not CLAUSE_HEADING.match(first_line):
+        body = first_line + "\n" + body
+
+    refs = []
+    for number, letter in CLAUSE_REFERENCE.findall(body):
+        refs.append(f"{number}.{letter.lower()}" if letter else number)
+    refs.extend(code.lower() for code in CODE_REFERENCE.findall(body))
+    return list(dict.fromkeys(refs))
+
+
+def _pack(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack(typecode: str, data: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+    return values
+
+
+class ClauseGraph:
+    """
+    Clause cross-references of one namespace as a CSR adjacency list.
+
+    Node `i` is the i-th record sent to Pinecone (and to the lexical index);
+    `targets[offsets[i]:offsets[i + 1]]` are the nodes it references.
+    """
+
+    def __init__(self):
+        self.doc_ids: List[str] = []
+        self.offsets = array("I", [0])
+        self.targets = array("I")
+        self.node_lookup: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, docs: List[Dict]) -> "ClauseGraph":
+        """Build from `[{"id", "metadata": {"text"}}]`, in document order."""
+        graph = cls()
+        texts = []
+        definitions: Dict[str, List[int]] = {}
+        current_clause = None
+        for node, doc in enumerate(docs):
+            text = doc.get("text") or doc.get("metadata", {}).get("text", "")
+            texts.append(text)
+            graph.doc_ids.append(str(doc["id"]))
+            keys, current_clause = clause_keys(text, current_clause)
+            for key in keys:
+                definitions.setdefault(key, []).append(node)
+
+        for node, text in enumerate(texts):
+            linked = []
+            for ref in clause_references(text):
+                # "Clause 2(b)" falls back to clause 2 when b has no chunk of its own
+                candidates = definitions.get(ref)
+                if not candidates and "." in ref:
+                    candidates = definitions.get(ref.split(".", 1)[0])
+                if not candidates:
+                    continue
+                # Numbering can restart per section; the nearest definition wins
+                target = min(candidates, key=lambda c: abs(c - node))
+                if target != node and target not in linked:
+                    linked.append(target)
+            graph.targets.extend(linked)
+            graph.offsets.append(len(graph.targets))
+
+        graph.node_lookup = {doc_id: i for i, doc_id in enumerate(graph.doc_ids)}
+        return graph
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def neighbours(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def expand(self, doc_id: str, max_hops: int = CLAUSE_REFS_MAX_HOPS) -> List[tuple]:
+        """`(node, hops)` reachable from `doc_id`, breadth-first, nearest first."""
+        start = self.node_lookup.get(doc_id)
+        if start is None:
+            return []
+        seen = {start}
+        frontier = [start]
+        reached = []
+        for hop in range(1, max_hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for target in self.neighbours(node):
+                    if target not in seen:
+                        seen.add(target)
+                        next_frontier.append(target)
+                        reached.append((target, hop))
+            frontier = next_frontier
+        return reached
+
+    # ============= PERSISTENCE =============
+
+    def to_dict(self) -> Dict:
+        return {
+            "doc_ids": self.doc_ids,
+            "offsets": _pack(self.offsets),
+            "targets": _pack(self.targets),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ClauseGraph":
+        graph = cls()
+        graph.doc_ids = data["doc_ids"]
+        graph.offsets = _unpack("I", data["offsets"])
+        graph.targets = _unpack("I", data["targets"])
+        graph.node_lookup = {doc_id: i for i, doc_id in enumerate(graph.doc_ids)}
+        return graph
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ClauseGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# -------------------------
+# Per-namespace registry
+# -------------------------
+_graphs: Dict[str, ClauseGraph] = {}
+
+
+def _graph_path(namespace: str) -> str:
+    return os.path.join(namespace_dir(namespace), CLAUSE_GRAPH_FILE)
+
+
+def build_namespace_graph(namespace: str, docs: List[Dict]) -> ClauseGraph:
+    """Build, persist and cache the clause graph for a namespace."""
+    graph = ClauseGraph.build(docs)
+    graph.save(_graph_path(namespace))
+    _graphs[namespace] = graph
+    return graph
+
+
+def get_namespace_graph(namespace: str) -> Optional[ClauseGraph]:
+    if namespace in _graphs:
+        return _graphs[namespace]
+    path = _graph_path(namespace)
+    if not os.path.exists(path):
+        return None
+    graph = ClauseGraph.load(path)
+    _graphs[namespace] = graph
+    return graph
+
+
+def expand_references(hits: List[Dict], namespace: str,
+                      top: int = CLAUSE_REFS_EXPAND_TOP, max_added: int = CLAUSE_REFS_MAX_ADDED) -> List[Dict]:
+    """
+    Insert the clauses referenced by the best `top` fused hits right after
+    the hit that references them, so they pack together. Texts come from the
+    namespace's lexical index, which holds the same records in the same order.
+    """
+    if not CLAUSE_REFS_ENABLED or not hits:
+        return hits
+    graph = get_namespace_graph(namespace)
+    lexical = get_namespace_index(namespace)
+    if graph is None or lexical is None or graph.edge_count == 0:
+        return hits
+
+    present = {hit.get("id") for hit in hits}
+    expanded = []
+    added = 0
+    for rank, hit in enumerate(hits):
+        expanded.append(hit)
+        if rank >= top or added >= max_added:
+            continue
+        for node, hops in graph.expand(hit.get("id")):
+            doc_id = graph.doc_ids[node]
+            if doc_id in present or node >= len(lexical.doc_ids) or lexical.doc_ids[node] != doc_id:
+                continue
+            present.add(doc_id)
+            expanded.append({
+                "id": doc_id,
+                "text": lexical.texts[node],
+                "metadata": {**lexical.metadata[node], "referenced_by": hit.get("id"), "hops": hops},
+                "fused_score": hit.get("fused_score", 0.0),
+                "sources": ["reference"],
+            })
+            added += 1
+            if added >= max_added:
+                break
+    return expanded
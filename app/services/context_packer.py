@@ -0,0 +1,224 @@
+import os
+import re
+import hashlib
+import logging
+import contextvars
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple
+from app.utils.metrics import inc
+
+# --- Packing settings ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "800"))
+TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+
+# Spans shorter than this many words are never dropped as duplicates
+MIN_DEDUP_WORDS = 5
+
+CHUNK_HEADER = re.compile(r"^\(Source: [^)]*, Chunk \d+\)\s*")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+")
+
+# --- Token counting ---
+# Gemini's tokenizer is not available offline; tiktoken is a local, much
+# closer proxy than character counts. Billed counts are taken from the
+# Gemini response's usage metadata when reporting.
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    chunks_in: int
+    segments_used: int
+    merged: int = 0
+    duplicate_spans_dropped: int = 0
+
+
+@dataclass
+class _Segment:
+    text: str
+    source: Tuple[Optional[str], Optional[str]]  # (source_name, page_key)
+    start: Optional[int]
+    end: Optional[int]
+    rank: int
+
+
+# --- Merge overlapping / adjacent chunks by their document offsets ---
+def _merge_texts(left: str, right: str) -> Optional[str]:
+    """Stitch `right` onto `left` where their texts overlap; None if they don't."""
+    if right in left:
+        return left
+    if left in right:
+        return right
+    probe = right[:50]
+    pos = left.find(probe)
+    while pos >= 0:
+        tail = left[pos:]
+        if right.startswith(tail):
+            return left[:pos] + right
+        pos = left.find(probe, pos + 1)
+    return None
+
+
+def _merge_segments(hits: List[Dict]) -> Tuple[List[_Segment], int]:
+    segments: List[_Segment] = []
+    merged = 0
+    for rank, hit in enumerate(hits):
+        meta = hit.get("metadata", {}) or {}
+        text = CHUNK_HEADER.sub("", hit["text"].strip())
+        # Offsets are relative to the page when the chunk names one
+        source = (meta.get("source_name"), meta.get("page_key"))
+        seg = _Segment(text, source, meta.get("char_start"), meta.get("char_end"), rank)
+
+        target = None
+        if seg.start is not None:
+            for existing in segments:
+                if (existing.source == seg.source and existing.start is not None
+                        and seg.start <= existing.end and seg.end >= existing.start):
+                    target = existing
+                    break
+
+        if target is None:
+            segments.append(seg)
+            continue
+
+        left, right = (target, seg) if target.start <= seg.start else (seg, target)
+        if seg.start == target.end or target.start == seg.end:
+            combined = left.text + "\n" + right.text  # adjacent, no overlap
+        else:
+            combined = _merge_texts(left.text, right.text)
+        if combined is None:
+            segments.append(seg)  # offsets overlap but text was reformatted
+            continue
+        target.text = combined
+        target.start = min(target.start, seg.start)
+        target.end = max(target.end, seg.end)
+        merged += 1
+    return segments, merged
+
+
+# --- Remove spans already emitted by a higher-ranked segment ---
+def _span_key(span: str) -> str:
+    normalized = re.sub(r"\W+", " ", span).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _dedup_spans(text: str, seen: set) -> Tuple[str, int]:
+    dropped = 0
+    kept_lines = []
+    for line in text.split("\n"):
+        kept = []
+        for span in SENTENCE_SPLIT.split(line):
+            if len(span.split()) >= MIN_DEDUP_WORDS:
+                key = _span_key(span)
+                if key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+            kept.append(span)
+        if kept:
+            kept_lines.append(" ".join(kept))
+    return "\n".join(kept_lines).strip(), dropped
+
+
+def pack_context(hits: List[Dict], token_budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """
+    Assemble prompt context from relevance-ordered hits (`{"text", "metadata"}`):
+    merge overlapping chunks by offsets, drop duplicated spans, then fill the
+    token budget in relevance order.
+    """
+    segments, merged = _merge_segments(hits)
+    segments.sort(key=lambda s: s.rank)
+
+    seen, parts, used, dropped = set(), [], 0, 0
+    for seg in segments:
+        text, n_dropped = _dedup_spans(seg.text, seen)
+        dropped += n_dropped
+        if not text:
+            continue
+        cost = count_tokens(text)
+        if used + cost > token_budget:
+            if parts:
+                continue  # a shorter, lower-ranked segment may still fit
+            # Always keep the best segment, trimmed to the budget
+            text, cost = _truncate_to_tokens(text, token_budget), token_budget
+        parts.append(text)
+        used += cost
+
+    context = "\n\n".join(parts)
+    return PackedContext(
+        text=context,
+        tokens=count_tokens(context),
+        chunks_in=len(hits),
+        segments_used=len(parts),
+        merged=merged,
+        duplicate_spans_dropped=dropped,
+    )
+
+
+def pack_texts(texts: List[str], token_budget: int = SUMMARY_TOKEN_BUDGET) -> PackedContext:
+    """Pack plain strings (e.g. partial answers) that carry no offsets."""
+    return pack_context([{"text": t} for t in texts if t], token_budget)
+
+
+# -------------------------
+# Per-request prompt token report
+# -------------------------
+_token_report: contextvars.ContextVar = contextvars.ContextVar("prompt_token_report", default=None)
+
+
+def start_token_report() -> Dict:
+    """Begin accumulating prompt token counts for the current request."""
+    report = {"prompts": 0, "context_tokens": 0, "prompt_tokens": 0, "billed_prompt_tokens": 0}
+    _token_report.set(report)
+    return report
+
+
+def record_prompt(prompt: str, packed: Optional[PackedContext] = None, response=None):
+    """Record one Gemini prompt; `response` supplies the billed count when available."""
+    prompt_tokens = count_tokens(prompt)
+    billed = None
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        billed = getattr(usage, "prompt_token_count", None)
+
+    logging.info(
+        f"🧮 Prompt tokens: prompt={prompt_tokens} "
+        f"context={packed.tokens if packed else 0} billed={billed}"
+    )
+    inc("tokens_total", prompt_tokens, kind="prompt_estimate")
+    if billed:
+        inc("tokens_total", billed, kind="billed_prompt")
+    output = getattr(usage, "candidates_token_count", None) if usage is not None else None
+    if output:
+        inc("tokens_total", output, kind="output")
+
+    report = _token_report.get()
+    if report is not None:
+        report["prompts"] += 1
+        report["prompt_tokens"] += prompt_tokens
+        report["context_tokens"] += packed.tokens if packed else 0
+        report["billed_prompt_tokens"] += billed or 0
+
+
+def token_report() -> Optional[Dict]:
+    return _token_report.get()
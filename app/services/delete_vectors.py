@@ -1,16 +1,5 @@
-import os
-from pinecone import Pinecone, ServerlessSpec
-from dotenv import load_dotenv
-
-# Load your environment variables from .env file
-load_dotenv()
-
-# Initialize Pinecone client
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
-# Replace with your actual index name
-index_name = os.getenv("PINECONE_INDEX_NAME")  # Or hardcode as: "your-index-name"
-index = pc.Index(index_name)
+# Shares the app's Pinecone connection (or its fake, see PINECONE_BACKEND)
+from app.utils.pinecone_client import index, index_name
 
 # --- Method 1: Delete ALL vectors ---
 def delete_all_vectors():
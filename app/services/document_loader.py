@@ -5,7 +5,8 @@ import tempfile
 import os
 import io
 import re
-from typing import List, Dict, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Optional
 from app.services.parser.excel import extract_text_from_excel_bytes, extract_text_from_image_bytes, extract_text_from_pptx_with_ocr, extract_text_from_csv_bytes, extract_text_from_nested_zip, extract_text_from_txt
 
 from typing import Tuple
@@ -14,6 +15,12 @@ import io
 
 import httpx
 from bs4 import BeautifulSoup
+from app.utils.executor import run_blocking
+from app.utils.deadline import clip_timeout, degrade, GENERATION_RESERVE_SECONDS
+from app.utils.timing import timed, stage_timer
+from app.services.chunker import PAGE_BREAK
+
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "20"))
 
 async def extract_landmark(url: str) -> str:
     async with httpx.AsyncClient() as client:
@@ -61,12 +68,49 @@ async def extract_token_from_webpage(url: str) -> str:
     
 
 
+@dataclass
+class FetchedDocument:
+    status: int
+    filename: str
+    content: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+@timed("download")
+async def fetch_document(url: str, etag: str = None, last_modified: str = None) -> FetchedDocument:
+    """
+    GET `url`, conditionally when validators from an earlier fetch are given:
+    an unchanged document comes back as a 304 with no body. Raises on any
+    other non-2xx status.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    # Leave time for answering when the download runs under a request deadline
+    timeout = clip_timeout(DOWNLOAD_TIMEOUT_SECONDS, reserve=GENERATION_RESERVE_SECONDS)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        response = await client.get(url, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+    return FetchedDocument(
+        status=response.status_code,
+        filename=url.split("?")[0].split("/")[-1],  # Extract file name
+        content=response.content,
+        etag=response.headers.get("ETag") or etag,
+        last_modified=response.headers.get("Last-Modified") or last_modified,
+    )
+
+
 async def download_file(url: str) -> tuple[str, bytes]:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        filename = url.split("?")[0].split("/")[-1]  # Extract file name
-        return filename, response.content
+    fetched = await fetch_document(url)
+    return fetched.filename, fetched.content
 
 
 
@@ -82,24 +126,35 @@ async def load_document(url: str) -> str:
         return token
     
     filename, contents = await download_file(url)
-    filename = filename.lower()
+    return await parse_document(filename, contents)
+
+
+async def parse_document(filename: str, contents: bytes) -> str:
+    """Text of already downloaded bytes, by the file extension."""
+    with stage_timer("parse"):
+        return await _parse_document(filename.lower(), contents)
+
+
+async def _parse_document(filename: str, contents: bytes) -> str:
 
+    # Parsers are CPU-bound; run them off the event loop under the "cpu" limit
     if filename.endswith(".pdf"):
-        return extract_text_from_pdf(contents)  # contents is bytes
+        return await run_blocking("cpu", extract_text_from_pdf, contents)  # contents is bytes
     elif filename.endswith(".docx"):
-        return extract_text_from_docx(contents)
+        return await run_blocking("cpu", extract_text_from_docx, contents)
     elif filename.endswith(".xls") or filename.endswith(".xlsx"):
-        return extract_text_from_excel_bytes(contents)
+        return await run_blocking("cpu", extract_text_from_excel_bytes, contents)
     elif filename.endswith(".pptx"):
-        return extract_text_from_pptx_with_ocr(contents)
+        # OCR of slide images is the slowest parser step; skip it when time is short
+        return await run_blocking("cpu", extract_text_from_pptx_with_ocr, contents, ocr=not degrade("ocr"))
     elif filename.endswith(".csv"):
-        return extract_text_from_csv_bytes(contents)
+        return await run_blocking("cpu", extract_text_from_csv_bytes, contents)
     elif filename.endswith(".zip"):
-        return extract_text_from_nested_zip(contents)
+        return await run_blocking("cpu", extract_text_from_nested_zip, contents)
     elif filename.endswith(".txt"):
-        return extract_text_from_txt(contents)
+        return await run_blocking("cpu", extract_text_from_txt, contents)
     elif filename.endswith(".png") or filename.endswith(".jpg") or filename.endswith(".jpeg"):
-        return extract_text_from_image_bytes(contents)
+        return await run_blocking("cpu", extract_text_from_image_bytes, contents)
     else:
         raise ValueError("Unsupported file format")
     
@@ -183,7 +238,7 @@ def extract_text_from_pdf(data: bytes) -> str:
         if formatted_page.strip():
             extracted.append(formatted_page)
 
-    return "\n\n---PAGE_BREAK---\n\n".join(extracted)
+    return PAGE_BREAK.join(extracted)
 
 
 def extract_text_from_docx(data: bytes) -> str:
@@ -1,62 +1,166 @@
 import os
-from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+import re
+import asyncio
+import threading
+from collections import OrderedDict
+import numpy as np
 from keybert import KeyBERT
+from sklearn.feature_extraction.text import CountVectorizer
+from app.utils.timing import timed, stage_timer
+from app.utils.executor import run_blocking, get_pool
+from app.utils.deadline import clip_timeout
+from app.utils.elastic_client import es, get_async_es
 
-# --- Load environment variables ---
-load_dotenv()
+# --- KeyBERT settings ---
+KEYBERT_MODEL = os.getenv("KEYBERT_MODEL", "all-MiniLM-L6-v2")
+# "torch", "onnx" (sentence-transformers ONNX backend; KEYBERT_ONNX_FILE picks
+# e.g. a quantized export) or "quantized" (torch dynamic int8 on CPU)
+KEYBERT_BACKEND = os.getenv("KEYBERT_BACKEND", "torch")
+KEYBERT_ONNX_FILE = os.getenv("KEYBERT_ONNX_FILE")
+KEYBERT_CACHE_SIZE = int(os.getenv("KEYBERT_CACHE_SIZE", "2000"))
+# Candidate n-gram embeddings kept across calls (384 floats each for MiniLM)
+KEYBERT_NGRAM_CACHE_SIZE = int(os.getenv("KEYBERT_NGRAM_CACHE_SIZE", "20000"))
+KEYPHRASE_NGRAM_RANGE = (1, 3)
 
-ELASTIC_CLOUD_URL = os.getenv("ELASTIC_CLOUD_URL")
-ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
+# --- KeyBERT model, loaded on first use ---
+kw_model = None
+# The model is not safe to call from several threads at once
+_model_lock = threading.Lock()
+_keyword_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_ngram_embeddings: "OrderedDict[str, object]" = OrderedDict()
 
-# --- Initialize KeyBERT model ---
-kw_model = KeyBERT(model='all-MiniLM-L6-v2')
 
-# --- Connect to Elasticsearch ---
-es = Elasticsearch(
-    ELASTIC_CLOUD_URL,
-    api_key=ELASTIC_API_KEY,
-    verify_certs=True
-)
+def _load_sentence_model():
+    from sentence_transformers import SentenceTransformer
+
+    if KEYBERT_BACKEND == "onnx":
+        model_kwargs = {"file_name": KEYBERT_ONNX_FILE} if KEYBERT_ONNX_FILE else None
+        return SentenceTransformer(KEYBERT_MODEL, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+    model = SentenceTransformer(KEYBERT_MODEL, device="cpu" if KEYBERT_BACKEND == "quantized" else None)
+    if KEYBERT_BACKEND == "quantized":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def get_kw_model():
+    global kw_model
+    if kw_model is None:
+        with _model_lock:
+            if kw_model is None:
+                kw_model = KeyBERT(model=_load_sentence_model())
+    return kw_model
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def _candidate_embeddings(model, docs: list):
+    """Embeddings for the batch's candidate n-grams, embedding only unseen ones."""
+    vocabulary = CountVectorizer(ngram_range=KEYPHRASE_NGRAM_RANGE, stop_words="english") \
+        .fit(docs).get_feature_names_out()
+    missing = [ngram for ngram in vocabulary if ngram not in _ngram_embeddings]
+    if missing:
+        for ngram, vector in zip(missing, model.model.embed(missing)):
+            _ngram_embeddings[ngram] = vector
+    for ngram in vocabulary:
+        _ngram_embeddings.move_to_end(ngram)
+    embeddings = np.array([_ngram_embeddings[ngram] for ngram in vocabulary])
+    while len(_ngram_embeddings) > KEYBERT_NGRAM_CACHE_SIZE:
+        _ngram_embeddings.popitem(last=False)
+    return embeddings
+
+
+def _run_keybert(docs: list, top_n: int) -> dict:
+    """{doc: [(phrase, score), ...]} for docs no concurrent call has extracted meanwhile."""
+    model = get_kw_model()
+    with _model_lock:
+        with _cache_lock:
+            docs = [doc for doc in docs if (doc, top_n) not in _keyword_cache]
+        if not docs:
+            return {}
+        doc_embeddings = model.model.embed(docs)
+        word_embeddings = _candidate_embeddings(model, docs)
+        keywords = model.extract_keywords(
+            docs, keyphrase_ngram_range=KEYPHRASE_NGRAM_RANGE, stop_words='english', top_n=top_n,
+            doc_embeddings=doc_embeddings, word_embeddings=word_embeddings,
+        )
+    # A single document comes back as a flat list
+    return dict(zip(docs, [keywords] if len(docs) == 1 else keywords))
+
+
+# --- Extract keywords from queries using KeyBERT ---
+@timed("keybert")
+def extract_keywords_batch(queries: list[str], top_n: int = 5) -> list[str]:
+    """
+    Comma-joined keyphrases per query, in one model pass for every query not
+    already cached (by normalized text); falls back to the query itself.
+    """
+    with _cache_lock:
+        results = [_keyword_cache.get((_normalize(q), top_n)) for q in queries]
+    pending = {}
+    for i, (query, result) in enumerate(zip(queries, results)):
+        if result is None:
+            pending.setdefault(_normalize(query), []).append(i)
+    if not pending:
+        return results
 
-# --- Extract keywords from query using KeyBERT ---
-def extract_keywords(query: str, top_n: int = 5) -> str:
     try:
-        keywords = kw_model.extract_keywords(query, keyphrase_ngram_range=(1, 3), stop_words='english', top_n=top_n)
-        keyword_phrases = [kw[0] for kw in keywords]
-        return ", ".join(keyword_phrases)
+        extracted = _run_keybert(list(pending), top_n)
     except Exception as e:
         print(f"❌ KeyBERT keyword extraction failed: {e}")
-        return query  # fallback
+        extracted = {}  # fallback, not cached so it is retried
+
+    with _cache_lock:
+        for doc, indices in pending.items():
+            keywords = extracted.get(doc)
+            if keywords:
+                _keyword_cache[(doc, top_n)] = ", ".join(kw[0] for kw in keywords)
+            phrases = _keyword_cache.get((doc, top_n))
+            for i in indices:
+                results[i] = phrases or queries[i]
+        while len(_keyword_cache) > KEYBERT_CACHE_SIZE:
+            _keyword_cache.popitem(last=False)
+    return results
+
+
+def extract_keywords(query: str, top_n: int = 5) -> str:
+    return extract_keywords_batch([query], top_n)[0]
 
 # --- Search top matching clause from Elasticsearch ---
-def search_best_clause(user_query: str, index_name: str) -> list[dict]:
-    keywords = extract_keywords(user_query)
-    # print(f"🔍 Extracted keywords: {keywords}")
+SEARCH_SIZE = 5
+# Only what retrieval and context packing read comes back over the wire
+SOURCE_FIELDS = [
+    "metadata.text", "metadata.clause_id", "metadata.source_doc", "metadata.source_name",
+    "metadata.chunk_index", "metadata.char_start", "metadata.char_end", "metadata.page_key",
+]
+# Keyword matches outrank matches on the raw question (the old second search)
+KEYWORD_BOOST = 3.0
 
-    def run_search(query_string):
-        return es.search(index=index_name, body={
-            "size": 5,
-            "query": {
-                "match": {
-                    "metadata.text": {
-                        "query": query_string,
-                        "operator": "OR",
-                        "fuzziness": "AUTO"
-                    }
-                }
-            }
-        })
 
-    # Try keyword-based query first
-    response = run_search(keywords)
+def _match(query_string: str, boost: float = 1.0) -> dict:
+    return {"match": {"metadata.text": {
+        "query": query_string,
+        "operator": "OR",
+        "fuzziness": "AUTO",
+        "boost": boost,
+    }}}
 
-    # Fallback to raw user query if nothing found
-    if not response["hits"]["hits"]:
-        print("⚠️ No results with keywords, trying raw query.")
-        response = run_search(user_query)
 
-    if not response["hits"]["hits"]:
+def _search_body(keywords: str, user_query: str = None) -> dict:
+    """One query; with `user_query`, the raw question is a lower-weighted fallback clause."""
+    if user_query is None or _normalize(user_query) == _normalize(keywords):
+        query = _match(keywords)
+    else:
+        query = {"bool": {"should": [_match(keywords, KEYWORD_BOOST), _match(user_query)],
+                          "minimum_should_match": 1}}
+    return {"size": SEARCH_SIZE, "_source": SOURCE_FIELDS, "query": query}
+
+
+def _format_hits(hits: list) -> list[dict]:
+    if not hits:
         return [{
             "score": 0.0,
             "text": "❌ No relevant clause found.",
@@ -65,18 +169,65 @@ def search_best_clause(user_query: str, index_name: str) -> list[dict]:
             "metadata": {}
         }]
 
-    # Return top 3 results
     results = []
-    for hit in response["hits"]["hits"]:
+    for hit in hits:
+        metadata = hit["_source"]["metadata"]
         results.append({
             "score": hit["_score"],
-            "text": hit["_source"]["metadata"]["text"],
-            "source_doc": hit["_source"]["metadata"].get("source_doc"),
-            "clause_id": hit["_source"]["metadata"].get("clause_id"),
-            "metadata": hit["_source"]["metadata"]
+            "text": metadata["text"],
+            "source_doc": metadata.get("source_doc"),
+            # The record id (see elasticSearchUpsert.document_id), shared with Pinecone and BM25 hits
+            "clause_id": hit["_id"],
+            "metadata": metadata
         })
     return results
 
+
+def search_best_clause(user_query: str, index_name: str) -> list[dict]:
+    keywords = extract_keywords(user_query)
+    # print(f"🔍 Extracted keywords: {keywords}")
+
+    def run_search(query_string):
+        with stage_timer("elastic_search"):
+            return es.search(index=index_name, body=_search_body(query_string))
+
+    # Try keyword-based query first
+    response = run_search(keywords)
+
+    # Fallback to raw user query if nothing found
+    if not response["hits"]["hits"]:
+        print("⚠️ No results with keywords, trying raw query.")
+        response = run_search(user_query)
+
+    return _format_hits(response["hits"]["hits"])
+
+
+# --- Batch search: every question in one _msearch round trip ---
+async def search_best_clauses(user_queries: list[str], index_name: str, timeout: float = None) -> list[list[dict]]:
+    """
+    search_best_clause for a batch of questions: one KeyBERT pass, then one
+    _msearch carrying each question's keyword query with its raw-question
+    fallback clause. A question whose search failed gets an empty list.
+    """
+    keywords = await run_blocking("keybert", extract_keywords_batch, user_queries)
+    searches = []
+    for user_query, keyword_query in zip(user_queries, keywords):
+        searches.append({"index": index_name})
+        searches.append(_search_body(keyword_query, user_query))
+
+    with stage_timer("elastic_msearch"):
+        timeout = clip_timeout(timeout if timeout is not None else get_pool("elastic").timeout)
+        response = await asyncio.wait_for(get_async_es().msearch(searches=searches), timeout=timeout)
+
+    results = []
+    for item in response["responses"]:
+        if "error" in item:
+            print(f"❌ Elastic msearch item failed: {item['error']}")
+            results.append([])
+        else:
+            results.append(_format_hits(item["hits"]["hits"]))
+    return results
+
 # --- Final callable function ---
 def elasticSearchByQuery(user_query: str, index_name: str) -> list[dict]:
     return search_best_clause(user_query, index_name)
@@ -1,65 +1,126 @@
 import os
-import uuid
-from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
-
-# --- Load environment variables ---
-load_dotenv()
-ELASTIC_CLOUD_URL = os.getenv("ELASTIC_CLOUD_URL")
-ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
-
-# --- Connect to Elasticsearch ---
-es = Elasticsearch(
-    ELASTIC_CLOUD_URL,
-    api_key=ELASTIC_API_KEY,
-    verify_certs=True
-)
+import hashlib
+from app.utils.elastic_client import es, streaming_bulk, parallel_bulk
+
+# --- Bulk indexing settings ---
+ELASTIC_BULK_CHUNK_SIZE = int(os.getenv("ELASTIC_BULK_CHUNK_SIZE", "500"))
+# >1 sends chunks from that many threads (parallel_bulk) instead of streaming_bulk
+ELASTIC_BULK_THREADS = int(os.getenv("ELASTIC_BULK_THREADS", "1"))
+# Only these metadata keys are stored; they are what keyword retrieval returns
+STORED_METADATA_FIELDS = ("text", "source_name", "source_doc", "clause_id", "chunk_index",
+                          "page_number", "char_start", "char_end", "page_key")
+
+# Lean explicit mapping: only the searched text (and keyword ids) are indexed.
+# "dynamic": false keeps the other stored keys in _source without mapping them.
+INDEX_BODY = {
+    "settings": {"number_of_shards": 1, "number_of_replicas": 0},
+    "mappings": {
+        "dynamic": False,
+        "properties": {
+            "clause_id": {"type": "keyword"},
+            "source_doc": {"type": "keyword"},
+            "metadata": {
+                "properties": {
+                    "text": {"type": "text"},
+                    "source_name": {"type": "keyword"},
+                }
+            }
+        }
+    }
+}
+
+# Indexes known to exist, so repeat ingests skip the exists/create round trips
+_known_indexes = set()
+
 
 # --- Create index if it doesn't exist ---
 def create_index_if_not_exists(index_name):
+    if index_name in _known_indexes:
+        return
     if not es.indices.exists(index=index_name):
-        es.indices.create(
-            index=index_name,
-            body={
-                "settings": {"number_of_shards": 1, "number_of_replicas": 0},
-                "mappings": {
-                    "properties": {
-                        "clause_id": {"type": "keyword"},
-                        "text": {"type": "text"},
-                        "source_doc": {"type": "keyword"},
-                        "metadata": {"type": "object"}
-                    }
-                }
-            }
-        )
+        es.indices.create(index=index_name, body=INDEX_BODY)
         print(f"✅ Created index: {index_name}")
+    _known_indexes.add(index_name)
 
 # --- Delete all documents from the index ---
 def delete_all_documents(index_name):
     es.delete_by_query(index=index_name, body={"query": {"match_all": {}}})
     print(f"🗑️ Deleted all documents from index: {index_name}")
 
-# --- Index new chunks ---
-def index_chunks(chunks, index_name):
-    actions = []
+
+def document_id(index_name, chunk, position):
+    """Stable id: re-ingesting the same chunks overwrites instead of duplicating."""
+    if chunk.get("id"):
+        return str(chunk["id"])  # the record's Pinecone id, so both stores agree
+    metadata = chunk.get("metadata", {})
+    key = f"{index_name}\0{metadata.get('source_name', '')}\0{position}\0{metadata.get('text', chunk.get('text', ''))}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def chunk_actions(chunks, index_name):
+    """Bulk index actions, generated lazily so the whole batch is never held twice."""
     for i, chunk in enumerate(chunks):
-        action = {
+        metadata = chunk.get("metadata", {})
+        stored = {k: metadata[k] for k in STORED_METADATA_FIELDS if k in metadata}
+        stored.setdefault("text", chunk.get("text", ""))
+        doc_id = document_id(index_name, chunk, i)
+        yield {
             "_index": index_name,
-            "_id": str(uuid.uuid4()),
+            "_id": doc_id,
             "_source": {
-                "text": chunk.get("text", ""),
-                "metadata": chunk["metadata"],
-                "source_doc": chunk.get("source_doc", "unknown"),
-                "clause_id": f"clause_{i + 1}"
+                "metadata": stored,
+                "source_doc": chunk.get("source_doc") or metadata.get("source_name", "unknown"),
+                # The record id, not the position: an insert must not renumber every later chunk
+                "clause_id": doc_id
             }
         }
-        actions.append(action)
 
-    success, _ = bulk(es, actions)
-    print(f"✅ Indexed {success} documents into {index_name}")
+
+def _set_refresh_interval(index_name, interval):
+    try:
+        es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": interval}})
+    except Exception as e:
+        # e.g. serverless projects manage refresh themselves
+        print(f"⚠️ Could not set refresh_interval={interval} on {index_name}: {e!r}")
+
+# --- Index new chunks ---
+def index_chunks(chunks, index_name):
+    actions = chunk_actions(chunks, index_name)
+    # No refreshes while loading; one refresh makes everything searchable at the end
+    _set_refresh_interval(index_name, "-1")
+    success = failed = 0
+    try:
+        if ELASTIC_BULK_THREADS > 1:
+            results = parallel_bulk(es, actions, thread_count=ELASTIC_BULK_THREADS,
+                                    chunk_size=ELASTIC_BULK_CHUNK_SIZE, raise_on_error=False)
+        else:
+            results = streaming_bulk(es, actions, chunk_size=ELASTIC_BULK_CHUNK_SIZE,
+                                     raise_on_error=False, max_retries=2)
+        for ok, item in results:
+            if ok:
+                success += 1
+            else:
+                failed += 1
+                if failed <= 3:
+                    print(f"❌ Bulk item failed: {item}")
+    finally:
+        _set_refresh_interval(index_name, None)  # back to the index default
+        es.indices.refresh(index=index_name)
+    print(f"✅ Indexed {success} documents into {index_name}" + (f" ({failed} failed)" if failed else ""))
     return success
 
+# --- Delete chunks by id (records removed from a re-ingested document) ---
+def delete_chunks(ids, index_name):
+    actions = ({"_op_type": "delete", "_index": index_name, "_id": str(i)} for i in ids)
+    deleted = 0
+    for ok, item in streaming_bulk(es, actions, chunk_size=ELASTIC_BULK_CHUNK_SIZE, raise_on_error=False):
+        # Already gone (404) counts as deleted
+        if ok or item.get("delete", {}).get("status") == 404:
+            deleted += 1
+    es.indices.refresh(index=index_name)
+    print(f"🗑️ Deleted {deleted} documents from {index_name}")
+    return deleted
+
 # --- Upsert Function ---
 def Upsert(text_chunks, index_name):
     create_index_if_not_exists(index_name)
@@ -1,19 +1,38 @@
 import os
 import re
-import uuid
+import json
 import asyncio
-import concurrent.futures
+import hashlib
 from typing import List
 from dotenv import load_dotenv
 from app.utils.pinecone_client import index
-import google.generativeai as genai
-from app.services.elasticSearch.elasticSearchUpsert import Upsert as ElasticUpsert
+from app.services.elasticSearch.elasticSearchUpsert import Upsert as ElasticUpsert, delete_chunks as delete_elastic_chunks
 from app.services.delete_vectors import delete_all_vectors
+from app.services.lexical_index import build_namespace_index
+from app.services.clause_graph import build_namespace_graph, get_namespace_graph
+from app.services.GraphDB.graphQuerySearch import GRAPH_RETRIEVAL_ENABLED
+from app.services.GraphDB.graphDbUpsertion import (
+    record_clauses, upload_clauses_to_neo4j_async, delete_clauses_from_neo4j_async,
+)
+from app.services.chunker import CHUNKER_VERSION, document_hash, make_chunk_id, content_hash
+from app.services.ingest_journal import batch_key, load_manifest, update_manifest
+from app.utils.executor import run_blocking
+from app.services.gemini_gateway import get_gateway
+from app.services.answer_cache import get_answer_cache
+from app.utils.timing import timed, stage_timer
+from app.utils.metrics import inc
 
 # Load environment variables
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Elastic is only a fallback for keyword search now that every namespace gets
+# a local lexical index; set to "false" to skip the extra cluster write.
+ELASTIC_UPSERT_ENABLED = os.getenv("ELASTIC_UPSERT_ENABLED", "true").lower() == "true"
+# Retries per Pinecone upsert batch before the ingest is reported incomplete
+UPSERT_RETRIES = int(os.getenv("PINECONE_UPSERT_RETRIES", "3"))
+UPSERT_BACKOFF_SECONDS = float(os.getenv("PINECONE_UPSERT_BACKOFF_SECONDS", "0.5"))
+# Pinecone accepts at most 1000 ids per delete
+DELETE_BATCH_SIZE = 1000
 
 # ------------------------
 # Clause grouping function
@@ -31,46 +50,82 @@ def group_clauses(text: str) -> List[str]:
         grouped_clauses.append(f"{heading}\n{content}")
     return [clause for clause in grouped_clauses if clause]
 
+
+def group_chunk_clauses(chunk) -> List[dict]:
+    """
+    Clause-group one chunk (a plain string, or a `chunk_text_with_offsets` dict)
+    and carry an approximate document span over to each clause.
+    """
+    if isinstance(chunk, str):
+        chunk = {"text": chunk, "char_start": None, "char_end": None}
+    raw = chunk["text"]
+    parent_start, parent_end = chunk.get("char_start"), chunk.get("char_end")
+    page_key = chunk.get("page_key")
+
+    clauses = []
+    for clause in group_clauses(raw):
+        clause = clause.strip()
+        if not clause:
+            continue
+        char_start = char_end = None
+        if parent_start is not None and parent_end is not None:
+            # Chunk text = "(Source: ...)" header + the exact document span
+            header_len = len(raw) - (parent_end - parent_start)
+            pos = raw.find(clause.split("\n", 1)[0])
+            char_start = parent_start + max(0, pos - header_len) if pos >= 0 else parent_start
+            char_end = min(parent_end, char_start + len(clause))
+        clauses.append({"text": clause, "char_start": char_start, "char_end": char_end, "page_key": page_key})
+    return clauses
+
 # -----------------------
 # Generate Gemini embeddings
 # -----------------------
-def get_embedding(text: str) -> List[float]:
-    response = genai.embed_content(
-        model="models/embedding-001",
-        content=text,
-        task_type="retrieval_document"
-    )
-    return response["embedding"]
+async def get_embedding(text: str) -> List[float]:
+    return await get_gateway().embed(text, task_type="retrieval_document")
+
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed several texts in one Gemini request."""
+    return await get_gateway().embed(list(texts), task_type="retrieval_document")
 
 # ------------------------
 # Run embedding async
 # ------------------------
-async def embed_chunk_async(executor, chunk):
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, get_embedding, chunk)
+async def embed_chunk_async(chunk):
+    return await get_embedding(chunk)
 
 # -------------------------
-# Main async function
+# Record ids
 # -------------------------
-async def embed_chunks_async(text_chunks, source_name, metadata_info, batch_size=10, np='default'):
-    # STEP 0: Group clauses
-    # delete_all_vectors()
-    grouped_chunks = []
-    for raw_text in text_chunks:
-        grouped_chunks.extend(group_clauses(raw_text))
+def assign_record_ids(text_chunks) -> List[dict]:
+    """
+    Clause-group every chunk and give each clause a deterministic id,
+    `<chunk_id>-<clause>`. Chunks from `chunk_text_with_offsets` carry their
+    chunk id; plain strings get one from the hash of all chunk texts and their
+    position, so re-sending the same chunks always yields the same ids.
+    """
+    doc_hash = None
+    grouped = []
+    for ordinal, raw_chunk in enumerate(text_chunks):
+        chunk_id = raw_chunk.get("chunk_id") if isinstance(raw_chunk, dict) else None
+        if chunk_id is None:
+            if doc_hash is None:
+                doc_hash = document_hash("\n".join(
+                    chunk["text"] if isinstance(chunk, dict) else chunk for chunk in text_chunks
+                ))
+            chunk_id = make_chunk_id(doc_hash, f"n{ordinal}")
+        for j, clause in enumerate(group_chunk_clauses(raw_chunk)):
+            clause["id"] = f"{chunk_id}-{j}"
+            grouped.append(clause)
+    return grouped
 
-    grouped_chunks = [chunk.strip() for chunk in grouped_chunks if chunk.strip()]
-    executor = concurrent.futures.ThreadPoolExecutor()
 
-    # STEP 1: Embeddings
-    tasks = [embed_chunk_async(executor, chunk) for chunk in grouped_chunks]
-    embeddings = await asyncio.gather(*tasks)
-
-    # STEP 2: Build metadata
-    pinecone_data = []
-    for i, (chunk, embedding) in enumerate(zip(grouped_chunks, embeddings)):
+def build_records(text_chunks, source_name, metadata_info, np) -> List[dict]:
+    """Pinecone records (`{"id", "metadata"}`, no values yet) in document order."""
+    records = []
+    for i, clause in enumerate(assign_record_ids(text_chunks)):
         metadata = {
-            "text": chunk,
+            "text": clause["text"],
             "file_name": os.path.basename(source_name),
             "loc.lines.from": i * 10 + 1,
             "loc.lines.to": i * 10 + 10,
@@ -87,37 +142,272 @@ async def embed_chunks_async(text_chunks, source_name, metadata_info, batch_size
             "namespace": np,
             "source_name": source_name
         }
+        # Document span, used to merge overlapping neighbours when packing context
+        # (Pinecone rejects null metadata, so only set when known)
+        if clause["char_start"] is not None:
+            metadata["char_start"] = clause["char_start"]
+            metadata["char_end"] = clause["char_end"]
+        if clause["page_key"] is not None:
+            metadata["page_key"] = clause["page_key"]  # offsets are relative to this page
+
+        records.append({"id": clause["id"], "metadata": metadata})
+    return records
+
+
+# Derived from the record's position in the document, so every record after an
+# edit gets new values. They are informational only (offsets used for merging
+# are page-relative) and are not rewritten for clauses whose content is unchanged.
+POSITIONAL_FIELDS = ("chunk_index", "loc.lines.from", "loc.lines.to", "page_number")
+
+
+def metadata_hash(metadata: dict) -> str:
+    """Hash of the metadata that matters for retrieval; ignores position and the "Chunk N" header."""
+    stable = {k: v for k, v in metadata.items() if k not in POSITIONAL_FIELDS}
+    stable["text"] = content_hash(metadata["text"])
+    return hashlib.sha1(json.dumps(stable, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def manifest_records(records: List[dict]) -> List[dict]:
+    return [
+        {"id": record["id"], "hash": content_hash(record["metadata"]["text"]),
+         "meta_hash": metadata_hash(record["metadata"])}
+        for record in records
+    ]
+
+
+class IngestIncomplete(Exception):
+    """Some upsert batches failed; the journal keeps what did succeed."""
+
+
+async def upsert_with_retries(batch, np):
+    for attempt in range(UPSERT_RETRIES + 1):
+        try:
+            return await run_blocking("pinecone", index.upsert, batch, namespace=np)
+        except Exception:
+            if attempt == UPSERT_RETRIES:
+                raise
+            await asyncio.sleep(UPSERT_BACKOFF_SECONDS * 2 ** attempt)
+
+# -------------------------
+# Ingest steps
+# -------------------------
+def _stage_pending(journal, stage):
+    return journal is None or not journal.stage_done(stage)
+
+
+def _stage_finished(journal, stage):
+    if journal is not None:
+        journal.mark_stage(stage)
+
 
-        pinecone_data.append({
-            "id": str(uuid.uuid4()),
-            "values": embedding,
-            "metadata": metadata
-        })
+async def embed_and_upsert(records, np, batch_size=10, journal=None):
+    """
+    Embed and upsert in batches of `batch_size`; a batch is journaled once it
+    is in Pinecone and skipped on a later run. Raises IngestIncomplete if any
+    batch still fails after its retries.
+    """
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
 
-    # STEP 3: Upsert to Pinecone
-    with concurrent.futures.ThreadPoolExecutor() as thread_pool:
-        futures = []
-        for i in range(0, len(pinecone_data), batch_size):
-            batch = pinecone_data[i:i + batch_size]
-            futures.append(thread_pool.submit(index.upsert, batch, namespace=np))
+    async def embed_and_upsert_batch(batch):
+        key = batch_key([record["id"] for record in batch])
+        if journal is not None and journal.is_upserted(key):
+            return 0
+        vectors = journal.load_vectors(key) if journal is not None else None
+        if vectors is None:
+            with stage_timer("embed_chunks"):
+                vectors = await get_embeddings([record["metadata"]["text"] for record in batch])
+            inc("clauses_embedded_total", len(batch))
+        with_values = [{**record, "values": vector} for record, vector in zip(batch, vectors)]
+        try:
+            with stage_timer("pinecone_upsert"):
+                await upsert_with_retries(with_values, np)
+        except Exception:
+            if journal is not None:
+                journal.save_vectors(key, vectors)
+            raise
+        if journal is not None:
+            journal.mark_upserted(key)
+        return len(batch)
 
+    results = await asyncio.gather(*[embed_and_upsert_batch(batch) for batch in batches], return_exceptions=True)
+    failed = 0
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"❌ Batch {i + 1} failed: {result!r}")
+    if failed:
+        raise IngestIncomplete(f"{failed} of {len(batches)} upsert batches failed")
 
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-            try:
-                future.result()
-                # print(f"✅ Batch {i + 1}/{len(futures)} inserted")
-            except Exception as e:
-                print(f"❌ Batch {i + 1} failed: {e}")
 
-    # STEP 4: Also upsert to Elastic
+async def build_local_indexes(records, np, journal=None):
+    # Build the local lexical (BM25) index from the same chunks
+    if _stage_pending(journal, "lexical"):
+        try:
+            with stage_timer("lexical_index_build"):
+                await run_blocking("cpu", build_namespace_index, np, records)
+            _stage_finished(journal, "lexical")
+        except Exception as e:
+            print(f"❌ Local lexical index build failed: {e!r}")
+
+    # Clause cross-references ("refer to Clause 3") as a CSR graph
+    if _stage_pending(journal, "clause_graph"):
+        try:
+            with stage_timer("clause_graph_build"):
+                await run_blocking("cpu", build_namespace_graph, np, records)
+            _stage_finished(journal, "clause_graph")
+        except Exception as e:
+            print(f"❌ Clause reference graph build failed: {e!r}")
+
+
+async def sync_elastic(records, np, removed_ids=(), journal=None):
+    """Index `records` (same ids as Pinecone, so a re-run overwrites) and drop `removed_ids`."""
+    if not ELASTIC_UPSERT_ENABLED or not _stage_pending(journal, "elastic"):
+        return
     try:
-        ElasticUpsert(pinecone_data, index_name=np)
+        with stage_timer("elastic_upsert"):
+            if records:
+                await run_blocking("elastic", ElasticUpsert, records, index_name=np, timeout=120)
+            if removed_ids:
+                await run_blocking("elastic", delete_elastic_chunks, list(removed_ids), index_name=np, timeout=120)
+        _stage_finished(journal, "elastic")
         # print("✅ Data upserted to ElasticSearch")
     except Exception as e:
-        print(f"❌ ElasticSearch upsert failed: {e}")
+        print(f"❌ ElasticSearch upsert failed: {e!r}")
+
+
+async def sync_graph_db(records, np, changed_ids=None, removed_ids=(), journal=None):
+    """
+    Write clauses and their references (from the clause graph) to Neo4j for
+    graph retrieval; skipped unless GRAPH_RETRIEVAL_ENABLED. With `changed_ids`,
+    only those clauses and the ones that now reference them are written.
+    """
+    if not GRAPH_RETRIEVAL_ENABLED or not _stage_pending(journal, "neo4j"):
+        return
+    try:
+        with stage_timer("neo4j_sync"):
+            clauses = record_clauses(records, np, get_namespace_graph(np))
+            if changed_ids is not None:
+                changed_ids = set(changed_ids)
+                clauses = [clause for clause in clauses if clause["clause_id"] in changed_ids
+                           or changed_ids.intersection(clause["metadata"]["refers_to"])]
+            if clauses:
+                await upload_clauses_to_neo4j_async(clauses, timeout=120)
+            if removed_ids:
+                await delete_clauses_from_neo4j_async(list(removed_ids), np, timeout=120)
+        _stage_finished(journal, "neo4j")
+    except Exception as e:
+        print(f"❌ Neo4j upsert failed: {e!r}")
+
+
+def finish_ingest(records, np, journal=None):
+    # Answers cached for this namespace may no longer match its content
+    get_answer_cache().invalidate_namespace(np)
+    update_manifest(np, chunker_version=CHUNKER_VERSION, records=manifest_records(records))
+    if journal is not None:
+        journal.mark_completed()
+
+# -------------------------
+# Main async function
+# -------------------------
+async def embed_chunks_async(text_chunks, source_name, metadata_info, batch_size=10, np='default', journal=None):
+    """
+    Embed and upsert every chunk, then build the namespace's lexical index and
+    clause graph and index into Elastic (and Neo4j, for graph retrieval). With an IngestJournal, batches and
+    stages it records as done are skipped, so a retried ingest resumes
+    instead of redoing (or duplicating) work.
+    """
+    # delete_all_vectors()
+    records = build_records(text_chunks, source_name, metadata_info, np)
+    await embed_and_upsert(records, np, batch_size, journal)
+    await build_local_indexes(records, np, journal)
+    await sync_elastic(records, np, journal=journal)
+    await sync_graph_db(records, np, journal=journal)
+    finish_ingest(records, np, journal)
+
+
+def diff_records(records: List[dict], manifest) -> tuple:
+    """
+    Match new records to the namespace's current ones by text hash. A match
+    keeps its old id (and vector); it is `moved` only when metadata outside
+    POSITIONAL_FIELDS changed (e.g. its page was edited, so the page-relative
+    offsets moved). Returns (added, moved, removed_ids).
+    """
+    previous = {}
+    if manifest and manifest.get("chunker_version") == CHUNKER_VERSION:
+        for entry in manifest.get("records", []):
+            previous.setdefault(entry["hash"], []).append(entry)
+    added, moved = [], []
+    for record in records:
+        matches = previous.get(content_hash(record["metadata"]["text"]))
+        if not matches:
+            added.append(record)
+            continue
+        # Repeated text (boilerplate on many pages) pairs with the copy on the same page first
+        meta_hash = metadata_hash(record["metadata"])
+        same = next((i for i, entry in enumerate(matches) if entry["meta_hash"] == meta_hash), None)
+        entry = matches.pop(same if same is not None else 0)
+        record["id"] = entry["id"]
+        if entry["meta_hash"] != meta_hash:
+            moved.append(record)
+    kept = {record["id"] for record in records}
+    removed = [entry["id"] for entry in (manifest or {}).get("records", []) if entry["id"] not in kept]
+    return added, moved, removed
+
+
+async def reembed_changed_chunks_async(text_chunks, source_name, metadata_info, batch_size=10, np='default',
+                                       journal=None):
+    """
+    Bring a namespace in line with a changed document: embed only clauses
+    whose text is new, update metadata of clauses that merely moved, and
+    delete clauses that are gone, from Pinecone, Elastic and Neo4j. Without a
+    manifest to diff against, the namespace is cleared and fully re-ingested.
+    """
+    manifest = load_manifest(np)
+    if manifest is None or "records" not in manifest:
+        if _stage_pending(journal, "pinecone_clear"):
+            await run_blocking("pinecone", index.delete, delete_all=True, namespace=np)
+            _stage_finished(journal, "pinecone_clear")
+        records = build_records(text_chunks, source_name, metadata_info, np)
+        added, moved, removed = records, [], []
+    else:
+        records = build_records(text_chunks, source_name, metadata_info, np)
+        added, moved, removed = diff_records(records, manifest)
+    print(f"🔁 Re-ingest of {np}: {len(added)} new, {len(moved)} moved, {len(removed)} removed, "
+          f"{len(records) - len(added) - len(moved)} unchanged clauses")
+
+    # New content first and deletions last, so the namespace is never missing clauses mid-update
+    await embed_and_upsert(added, np, batch_size, journal)
+
+    if moved and _stage_pending(journal, "pinecone_metadata"):
+        with stage_timer("pinecone_update"):
+            await asyncio.gather(*[
+                run_blocking("pinecone", index.update, id=record["id"], set_metadata=record["metadata"], namespace=np)
+                for record in moved
+            ])
+        _stage_finished(journal, "pinecone_metadata")
+
+    if removed and _stage_pending(journal, "pinecone_delete"):
+        with stage_timer("pinecone_delete"):
+            for i in range(0, len(removed), DELETE_BATCH_SIZE):
+                await run_blocking("pinecone", index.delete, ids=removed[i:i + DELETE_BATCH_SIZE], namespace=np)
+        _stage_finished(journal, "pinecone_delete")
+
+    await build_local_indexes(records, np, journal)
+    await sync_elastic(added + moved, np, removed, journal)
+    await sync_graph_db(records, np, [record["id"] for record in added + moved], removed, journal)
+    finish_ingest(records, np, journal)
+    inc("clauses_reused_total", len(records) - len(added))
+    return {"added": len(added), "moved": len(moved), "removed": len(removed),
+            "unchanged": len(records) - len(added) - len(moved)}
 
 # -------------------------------
 # Entrypoint function
 # -------------------------------
-async def embed_chunks(chunks,np='default'):
-    await embed_chunks_async(chunks, source_name ="/Users/shubhamrade/Desktop/Bajaj/BAJHLIP23020V012223.pdf" , metadata_info = {},np=np)
+@timed("ingest_embed")
+async def embed_chunks(chunks,np='default',journal=None):
+    await embed_chunks_async(chunks, source_name ="/Users/shubhamrade/Desktop/Bajaj/BAJHLIP23020V012223.pdf" , metadata_info = {},np=np,journal=journal)
+
+
+@timed("ingest_reembed")
+async def reembed_changed_chunks(chunks,np='default',journal=None):
+    return await reembed_changed_chunks_async(chunks, source_name ="/Users/shubhamrade/Desktop/Bajaj/BAJHLIP23020V012223.pdf" , metadata_info = {},np=np,journal=journal)
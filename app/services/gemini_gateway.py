@@ -0,0 +1,343 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import weakref
+from collections import deque
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from app.utils.backends import fake_backend
+from app.utils.executor import run_blocking
+from app.utils.deadline import current_context, DeadlineExceeded
+from app.utils.metrics import inc
+
+load_dotenv()
+
+# --- Gateway settings ---
+GENERATE_MODEL = os.getenv("GEMINI_GENERATE_MODEL", "gemini-2.0-flash")
+EMBED_MODEL = os.getenv("GEMINI_EMBED_MODEL", "models/embedding-001")
+
+# Requests per second (and burst) allowed per model
+RATE_LIMITS = {
+    GENERATE_MODEL: (float(os.getenv("GEMINI_GENERATE_RPS", "20")), int(os.getenv("GEMINI_GENERATE_BURST", "20"))),
+    EMBED_MODEL: (float(os.getenv("GEMINI_EMBED_RPS", "50")), int(os.getenv("GEMINI_EMBED_BURST", "50"))),
+}
+DEFAULT_RATE_LIMIT = (10.0, 10)
+
+# AIMD concurrency window
+AIMD_INITIAL = float(os.getenv("GEMINI_AIMD_INITIAL", "8"))
+AIMD_MIN = float(os.getenv("GEMINI_AIMD_MIN", "1"))
+AIMD_MAX = float(os.getenv("GEMINI_AIMD_MAX", "32"))
+AIMD_LATENCY_TARGET = float(os.getenv("GEMINI_AIMD_LATENCY_TARGET_S", "8"))
+
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE_S", "0.5"))
+BACKOFF_CAP = float(os.getenv("GEMINI_BACKOFF_CAP_S", "8"))
+
+HEDGING_ENABLED = os.getenv("GEMINI_HEDGING", "true").lower() == "true"
+HEDGE_MIN_SAMPLES = 20
+
+
+# -------------------------
+# Error classification
+# -------------------------
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    code = code() if callable(code) else code
+    if isinstance(code, int):
+        return code
+    # google.api_core exceptions: ResourceExhausted (429), ServiceUnavailable (503), ...
+    name = type(exc).__name__
+    return {
+        "ResourceExhausted": 429, "TooManyRequests": 429,
+        "InternalServerError": 500, "ServiceUnavailable": 503,
+        "DeadlineExceeded": 504, "GatewayTimeout": 504,
+    }.get(name)
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return _status_code(exc) == 429
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, asyncio.TimeoutError) or _status_code(exc) in RETRYABLE_STATUS
+
+
+# -------------------------
+# Per-loop asyncio primitives
+# -------------------------
+class PerLoop:
+    """
+    One asyncio primitive per event loop, created on first use in that loop:
+    the gateway outlives any single loop (it is created at import), and a
+    Lock or Condition may only be awaited from the loop it first ran in.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.instances = weakref.WeakKeyDictionary()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        instance = self.instances.get(loop)
+        if instance is None:
+            instance = self.instances[loop] = self.factory()
+        return instance
+
+
+# -------------------------
+# Token bucket (per model)
+# -------------------------
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = PerLoop(asyncio.Lock)
+
+    async def acquire(self):
+        async with self.lock.get():
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# -------------------------
+# AIMD concurrency limiter
+# -------------------------
+class AIMDLimiter:
+    """Additive increase on fast successes, multiplicative decrease on 429s / slow calls."""
+
+    def __init__(self, initial: float, minimum: float, maximum: float, latency_target: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = PerLoop(asyncio.Condition)
+
+    async def acquire(self):
+        condition = self.condition.get()
+        async with condition:
+            self.waiting += 1
+            try:
+                await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float], overloaded: bool):
+        condition = self.condition.get()
+        async with condition:
+            self.in_flight -= 1
+            if overloaded or (latency is not None and latency > self.latency_target):
+                self.limit = max(self.minimum, self.limit * 0.5)
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            condition.notify_all()
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# -------------------------
+# Backends
+# -------------------------
+class GenaiBackend:
+    """The real google.generativeai SDK; calls are blocking."""
+
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.genai = genai
+        self.models: Dict[str, object] = {}
+
+    def generate(self, model: str, prompt: str, generation_config: Optional[Dict] = None):
+        if model not in self.models:
+            self.models[model] = self.genai.GenerativeModel(model)
+        return self.models[model].generate_content(prompt, generation_config=generation_config)
+
+    def embed(self, model: str, content, task_type: str):
+        """`content` may be a string or a list of strings (batch embed)."""
+        return self.genai.embed_content(model=model, content=content, task_type=task_type)["embedding"]
+
+
+# -------------------------
+# Gateway
+# -------------------------
+class GeminiGateway:
+    """
+    Single entry point for every Gemini call: per-model token-bucket rate
+    limits, an AIMD concurrency window fed by 429/latency signals, retries
+    with full-jitter backoff, and optional hedging for idempotent calls.
+    """
+
+    def __init__(self, backend=None):
+        if backend is None:
+            fakes = fake_backend("gemini")
+            backend = fakes.FakeGeminiBackend() if fakes else GenaiBackend()
+        self.backend = backend
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.limiter = AIMDLimiter(AIMD_INITIAL, AIMD_MIN, AIMD_MAX, AIMD_LATENCY_TARGET)
+        self.latency: Dict[str, LatencyWindow] = {}
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _count(self, event: str):
+        self.counters[event] += 1
+        inc("gemini_events_total", event=event)
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self.buckets:
+            self.buckets[model] = TokenBucket(*RATE_LIMITS.get(model, DEFAULT_RATE_LIMIT))
+        return self.buckets[model]
+
+    def _window(self, op: str) -> LatencyWindow:
+        return self.latency.setdefault(op, LatencyWindow())
+
+    async def _attempt(self, op: str, model: str, fn, *args):
+        await self._bucket(model).acquire()
+        await self.limiter.acquire()
+        start = time.perf_counter()
+        latency, overloaded = None, False
+        try:
+            result = await run_blocking("gemini", fn, *args)
+            latency = time.perf_counter() - start
+            self._window(op).add(latency)
+            return result
+        except Exception as e:
+            # Running out of request budget says nothing about Gemini's load
+            overloaded = is_rate_limited(e) or (
+                isinstance(e, asyncio.TimeoutError) and not isinstance(e, DeadlineExceeded)
+            )
+            if is_rate_limited(e):
+                self._count("rate_limited")
+            raise
+        finally:
+            await self.limiter.release(latency, overloaded)
+
+    async def _hedged(self, op: str, model: str, fn, *args):
+        """Fire a duplicate request if the first one outlives the observed p95."""
+        window = self._window(op)
+        p95 = window.percentile(0.95)
+        if p95 is None or len(window.samples) < HEDGE_MIN_SAMPLES:
+            return await self._attempt(op, model, fn, *args)
+
+        primary = asyncio.ensure_future(self._attempt(op, model, fn, *args))
+        done, _ = await asyncio.wait({primary}, timeout=p95)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = asyncio.ensure_future(self._attempt(op, model, fn, *args))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        self._count("hedge_wins")
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def _call(self, op: str, model: str, fn, *args, hedge: bool = False):
+        self._count("calls")
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if hedge and HEDGING_ENABLED:
+                    return await self._hedged(op, model, fn, *args)
+                return await self._attempt(op, model, fn, *args)
+            except Exception as e:
+                if attempt >= MAX_RETRIES or not is_retryable(e) or isinstance(e, DeadlineExceeded):
+                    self._count("failures")
+                    raise
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                ctx = current_context()
+                if ctx is not None and ctx.remaining() <= delay:
+                    # No point backing off past the request deadline
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                logging.warning(f"⚠️ Gemini {op} failed ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    # --- Public API ---
+    async def generate(self, prompt: str, generation_config: Optional[Dict] = None,
+                       model: str = GENERATE_MODEL, hedge: bool = False):
+        """Returns the SDK response (`.text`, `.usage_metadata`)."""
+        return await self._call("generate", model, self.backend.generate, model, prompt, generation_config, hedge=hedge)
+
+    async def embed(self, content, task_type: str = "retrieval_document",
+                    model: str = EMBED_MODEL, hedge: Optional[bool] = None):
+        """
+        Embeddings are idempotent, so single ones are hedged by default. A batch
+        is not (a duplicate costs the whole batch again) and its latency goes
+        to a window per batch size, apart from single embeds.
+        """
+        op = "embed" if isinstance(content, str) else f"embed_batch_{len(content)}"
+        hedge = isinstance(content, str) if hedge is None else hedge
+        return await self._call(op, model, self.backend.embed, model, content, task_type, hedge=hedge)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queue_depth": self.limiter.waiting,
+            "p95_s": {op: window.percentile(0.95) for op, window in self.latency.items()},
+        }
+
+
+_gateway: Optional[GeminiGateway] = None
+
+
+def get_gateway() -> GeminiGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = GeminiGateway()
+    return _gateway
+
+
+# --- Offline load test against the fake backend ---
+if __name__ == "__main__":
+    from benchmarks.fakes import FakeGeminiBackend
+
+    async def main(n_requests: int = 200):
+        gateway = GeminiGateway(FakeGeminiBackend(generate_latency_ms=200, embed_latency_ms=20, error_rate=0.05))
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[gateway.generate(f"question {i}") for i in range(n_requests // 2)],
+            *[gateway.embed(f"chunk {i}") for i in range(n_requests // 2)],
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {n_requests} calls in {elapsed:.2f}s ({n_requests / elapsed:.1f} req/s)")
+        print(gateway.stats())
+
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import os
+import re
+import hashlib
+from typing import List, Dict, Optional
+
+# --- Fusion / packing settings ---
+RRF_K = int(os.getenv("RRF_K", "60"))
+VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+KEYWORD_WEIGHT = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "1.0"))
+GRAPH_WEIGHT = float(os.getenv("HYBRID_GRAPH_WEIGHT", "0.5"))
+
+
+def text_hash(text: str) -> str:
+    """Hash of whitespace/case-normalized text, used to dedup across sources."""
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+# --- Normalize each source into {"id", "score", "text", "metadata"} ---
+def vector_hits(matches: List[Dict], similarity_threshold: float = 0.0) -> List[Dict]:
+    hits = []
+    for match in matches:
+        text = match.get("metadata", {}).get("text", "").strip()
+        if not text or match.get("score", 0) < similarity_threshold:
+            continue
+        hits.append({
+            "id": match.get("id"),
+            "score": match.get("score", 0),
+            "text": text,
+            "metadata": match.get("metadata", {}),
+        })
+    return hits
+
+
+def keyword_hits(results: List[Dict]) -> List[Dict]:
+    hits = []
+    for result in results:
+        text = (result.get("text") or "").strip()
+        # search_best_clause returns a placeholder row when nothing matched
+        if not text or not result.get("metadata"):
+            continue
+        hits.append({
+            "id": result.get("clause_id"),
+            "score": result.get("score", 0),
+            "text": text,
+            "metadata": result.get("metadata", {}),
+        })
+    return hits
+
+
+# --- Reciprocal rank fusion ---
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict]],
+                           weights: Optional[Dict[str, float]] = None,
+                           k: int = RRF_K) -> List[Dict]:
+    """
+    Fuse several best-first hit lists with weighted RRF: score = sum(w / (k + rank)).
+    Hits are deduplicated by record id (shared by Pinecone, BM25 and Elastic),
+    or by text hash when a hit has no id or another id for the same text.
+    """
+    weights = weights or {}
+    fused: Dict[str, Dict] = {}
+    id_to_key: Dict[str, str] = {}
+
+    for source, hits in ranked_lists.items():
+        weight = weights.get(source, 1.0)
+        for rank, hit in enumerate(hits, 1):
+            key = id_to_key.get(hit.get("id")) or text_hash(hit["text"])
+            if hit.get("id"):
+                id_to_key[hit["id"]] = key
+
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {
+                    "id": hit.get("id"),
+                    "text": hit["text"],
+                    "metadata": hit.get("metadata", {}),
+                    "fused_score": 0.0,
+                    "sources": [],
+                }
+            if source not in entry["sources"]:
+                entry["fused_score"] += weight / (k + rank)
+                entry["sources"].append(source)
+
+    return sorted(fused.values(), key=lambda e: e["fused_score"], reverse=True)
+
+
+def fuse_hits(vector: List[Dict], keyword: List[Dict], graph: Optional[List[Dict]] = None) -> List[Dict]:
+    ranked = {"vector": vector, "keyword": keyword}
+    if graph:
+        ranked["graph"] = graph
+    return reciprocal_rank_fusion(
+        ranked,
+        weights={"vector": VECTOR_WEIGHT, "keyword": KEYWORD_WEIGHT, "graph": GRAPH_WEIGHT},
+    )
+
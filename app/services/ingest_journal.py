@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from typing import Dict, List, Optional
+
+from app.services.chunker import CHUNKER_VERSION
+from app.services.lexical_index import namespace_dir
+
+# --- Journal settings ---
+INGEST_JOURNAL_DIR = os.getenv("INGEST_JOURNAL_DIR", "ingest_journal")
+CHUNK_MANIFEST_FILE = "chunk_manifest.json"
+
+
+def batch_key(record_ids: List[str]) -> str:
+    """A batch is identified by the records in it, not by its position."""
+    return hashlib.sha1("\n".join(record_ids).encode("utf-8")).hexdigest()[:16]
+
+
+def _write_json(path: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class IngestJournal:
+    """
+    On-disk progress of one document's ingest, keyed by its content hash and
+    the chunker version. Records the namespace, which upsert batches reached
+    Pinecone, the vectors of batches that were embedded but failed to upsert
+    (so a retry does not pay for them twice) and the finished index builds.
+    """
+
+    def __init__(self, doc_hash: str, journal_dir: str = INGEST_JOURNAL_DIR, scope: Optional[str] = None):
+        self.doc_hash = doc_hash
+        # A scope (e.g. the namespace being updated) keeps unrelated runs over the same content apart
+        name = f"{doc_hash}-{scope}" if scope else doc_hash
+        self.path = os.path.join(journal_dir, f"{name}-v{CHUNKER_VERSION}.json")
+        self.vectors_dir = self.path[:-len(".json")] + ".vectors"
+        self.state: Dict = {
+            "doc_hash": doc_hash,
+            "chunker_version": CHUNKER_VERSION,
+            "namespace": None,
+            "upserted": [],
+            "embedded": [],
+            "stages": [],
+            "completed": None,
+        }
+
+    @classmethod
+    def open(cls, doc_hash: str, journal_dir: str = INGEST_JOURNAL_DIR, scope: Optional[str] = None) -> "IngestJournal":
+        journal = cls(doc_hash, journal_dir, scope)
+        if os.path.exists(journal.path):
+            try:
+                with open(journal.path, "r", encoding="utf-8") as f:
+                    journal.state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load ingest journal, starting over: {e}")
+        return journal
+
+    def save(self):
+        _write_json(self.path, self.state)
+
+    # --- Namespace ---
+    @property
+    def namespace(self) -> Optional[str]:
+        return self.state["namespace"]
+
+    def set_namespace(self, namespace: str):
+        self.state["namespace"] = namespace
+        self.save()
+
+    # --- Upsert batches ---
+    def is_upserted(self, key: str) -> bool:
+        return key in self.state["upserted"]
+
+    def mark_upserted(self, key: str):
+        if key not in self.state["upserted"]:
+            self.state["upserted"].append(key)
+        if key in self.state["embedded"]:
+            self.state["embedded"].remove(key)
+            try:
+                os.remove(self._vectors_path(key))
+            except OSError:
+                pass
+        self.save()
+
+    def _vectors_path(self, key: str) -> str:
+        return os.path.join(self.vectors_dir, f"{key}.json")
+
+    def save_vectors(self, key: str, vectors: List[List[float]]):
+        """Keep a batch's embeddings until it is upserted."""
+        _write_json(self._vectors_path(key), vectors)
+        if key not in self.state["embedded"]:
+            self.state["embedded"].append(key)
+        self.save()
+
+    def load_vectors(self, key: str) -> Optional[List[List[float]]]:
+        if key not in self.state["embedded"]:
+            return None
+        try:
+            with open(self._vectors_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # --- Index builds after the upsert (lexical, clause_graph, elastic) ---
+    def stage_done(self, stage: str) -> bool:
+        return stage in self.state["stages"]
+
+    def mark_stage(self, stage: str):
+        if stage not in self.state["stages"]:
+            self.state["stages"].append(stage)
+        self.save()
+
+    # --- Whole ingest ---
+    @property
+    def completed(self) -> bool:
+        return self.state["completed"] is not None
+
+    def mark_completed(self):
+        self.state["completed"] = time.time()
+        self.save()
+
+    def discard(self):
+        """Forget this run, e.g. once its namespace no longer holds this content."""
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        shutil.rmtree(self.vectors_dir, ignore_errors=True)
+
+
+# -------------------------
+# Per-namespace chunk manifest
+# -------------------------
+# What a namespace currently holds: one entry per record ({"id", "hash" of
+# its text without the chunk header, "meta_hash" of its metadata}) plus the
+# source's validators (url, etag, last_modified, content_hash, checked_at).
+# Re-ingesting a changed document diffs against it.
+
+def manifest_path(namespace: str) -> str:
+    return os.path.join(namespace_dir(namespace), CHUNK_MANIFEST_FILE)
+
+
+def load_manifest(namespace: str) -> Optional[Dict]:
+    path = manifest_path(namespace)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not load chunk manifest for {namespace}: {e}")
+        return None
+
+
+def update_manifest(namespace: str, **fields):
+    manifest = load_manifest(namespace) or {}
+    manifest.update(fields)
+    _write_json(manifest_path(namespace), manifest)
@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import math
+import base64
+import bisect
+import heapq
+from array import array
+from typing import List, Dict, Optional
+
+# --- Where per-namespace lexical indexes are persisted ---
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+LEXICAL_INDEX_FILE = "lexical.json"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or
+such that the their then there these they this to was were will with what which
+who whom when where why how does do did can could should would may might shall
+""".split())
+
+# Max dictionary terms a single query term may expand to (fuzzy/prefix)
+MAX_EXPANSIONS = 10
+EXPANSION_WEIGHT = 0.7
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics and drop stop words."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def _max_edits(term: str) -> int:
+    """Same thresholds as Elasticsearch `fuzziness: AUTO`."""
+    if len(term) <= 2:
+        return 0
+    if len(term) <= 5:
+        return 1
+    return 2
+
+
+def _within_edit_distance(a: str, b: str, limit: int) -> bool:
+    """Banded Levenshtein check, bails out as soon as `limit` is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j, cb in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            )
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _pack(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack(typecode: str, data: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+    return values
+
+
+class LexicalIndex:
+    """
+    In-process BM25 index over the chunks of one namespace.
+
+    Postings are stored as flat `array` buffers: `offsets[t]:offsets[t + 1]`
+    slices `postings_docs`/`postings_tf` for term `t` of the sorted term
+    dictionary. IDF is computed once at build time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadata: List[Dict] = []
+        self.doc_lengths = array("I")
+        self.terms: List[str] = []
+        self.term_lookup: Dict[str, int] = {}
+        self.idf = array("f")
+        self.offsets = array("I", [0])
+        self.postings_docs = array("I")
+        self.postings_tf = array("H")
+        self.avg_doc_length = 0.0
+
+    # ============= BUILD =============
+
+    @classmethod
+    def build(cls, docs: List[Dict], k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        """Build from `[{"id", "text", "metadata"}]`, the same records sent to Pinecone."""
+        idx = cls(k1=k1, b=b)
+        term_postings: Dict[str, Dict[int, int]] = {}
+
+        for doc_no, doc in enumerate(docs):
+            metadata = doc.get("metadata", {})
+            text = doc.get("text") or metadata.get("text", "")
+            tokens = tokenize(text)
+            idx.doc_ids.append(str(doc["id"]))
+            idx.texts.append(text)
+            # Text is already kept in `texts`; don't store it twice
+            idx.metadata.append({k: v for k, v in metadata.items() if k != "text"})
+            idx.doc_lengths.append(len(tokens))
+            for token in tokens:
+                postings = term_postings.setdefault(token, {})
+                postings[doc_no] = postings.get(doc_no, 0) + 1
+
+        n_docs = len(idx.doc_ids)
+        idx.avg_doc_length = (sum(idx.doc_lengths) / n_docs) if n_docs else 0.0
+        idx.terms = sorted(term_postings)
+        idx.term_lookup = {term: i for i, term in enumerate(idx.terms)}
+
+        for term in idx.terms:
+            postings = term_postings[term]
+            df = len(postings)
+            idx.idf.append(math.log(1 + (n_docs - df + 0.5) / (df + 0.5)))
+            for doc_no in sorted(postings):
+                idx.postings_docs.append(doc_no)
+                idx.postings_tf.append(min(postings[doc_no], 0xFFFF))
+            idx.offsets.append(len(idx.postings_docs))
+
+        return idx
+
+    # ============= TERM DICTIONARY EXPANSION =============
+
+    def _prefix_terms(self, term: str) -> List[int]:
+        start = bisect.bisect_left(self.terms, term)
+        matches = []
+        for i in range(start, len(self.terms)):
+            if not self.terms[i].startswith(term) or len(matches) >= MAX_EXPANSIONS:
+                break
+            matches.append(i)
+        return matches
+
+    def _fuzzy_terms(self, term: str) -> List[int]:
+        limit = _max_edits(term)
+        if limit == 0:
+            return []
+        # Like Elasticsearch, require the first character to match: this keeps
+        # the scan to one contiguous slice of the sorted dictionary.
+        start = bisect.bisect_left(self.terms, term[0])
+        end = bisect.bisect_left(self.terms, chr(ord(term[0]) + 1))
+        matches = []
+        for i in range(start, end):
+            if _within_edit_distance(term, self.terms[i], limit):
+                matches.append(i)
+                if len(matches) >= MAX_EXPANSIONS:
+                    break
+        return matches
+
+    def expand(self, term: str, fuzzy: bool = False, prefix: bool = False) -> Dict[int, float]:
+        """Map a query term to `{term_id: weight}` using the term dictionary."""
+        expanded: Dict[int, float] = {}
+        exact = self.term_lookup.get(term)
+        if exact is not None:
+            expanded[exact] = 1.0
+        if prefix:
+            for i in self._prefix_terms(term):
+                expanded.setdefault(i, EXPANSION_WEIGHT)
+        if fuzzy:
+            for i in self._fuzzy_terms(term):
+                expanded.setdefault(i, EXPANSION_WEIGHT)
+        return expanded
+
+    # ============= SEARCH =============
+
+    def search(self, query: str, top_k: int = 5, fuzzy: bool = True, prefix: bool = False) -> List[Dict]:
+        """BM25 search; returns `[{"id", "score", "text", "metadata"}]` best first."""
+        if not self.doc_ids:
+            return []
+
+        term_weights: Dict[int, float] = {}
+        for token in tokenize(query):
+            for term_id, weight in self.expand(token, fuzzy=fuzzy, prefix=prefix).items():
+                term_weights[term_id] = max(term_weights.get(term_id, 0.0), weight)
+
+        scores: Dict[int, float] = {}
+        k1, b, avgdl = self.k1, self.b, self.avg_doc_length or 1.0
+        for term_id, weight in term_weights.items():
+            idf = self.idf[term_id] * weight
+            for p in range(self.offsets[term_id], self.offsets[term_id + 1]):
+                doc_no = self.postings_docs[p]
+                tf = self.postings_tf[p]
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_no] / avgdl)
+                scores[doc_no] = scores.get(doc_no, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                "id": self.doc_ids[doc_no],
+                "score": score,
+                "text": self.texts[doc_no],
+                "metadata": self.metadata[doc_no],
+            }
+            for doc_no, score in best
+        ]
+
+    # ============= PERSISTENCE =============
+
+    def to_dict(self) -> Dict:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "texts": self.texts,
+            "metadata": self.metadata,
+            "terms": self.terms,
+            "avg_doc_length": self.avg_doc_length,
+            "doc_lengths": _pack(self.doc_lengths),
+            "idf": _pack(self.idf),
+            "offsets": _pack(self.offsets),
+            "postings_docs": _pack(self.postings_docs),
+            "postings_tf": _pack(self.postings_tf),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LexicalIndex":
+        idx = cls(k1=data["k1"], b=data["b"])
+        idx.doc_ids = data["doc_ids"]
+        idx.texts = data["texts"]
+        idx.metadata = data["metadata"]
+        idx.terms = data["terms"]
+        idx.term_lookup = {term: i for i, term in enumerate(idx.terms)}
+        idx.avg_doc_length = data["avg_doc_length"]
+        idx.doc_lengths = _unpack("I", data["doc_lengths"])
+        idx.idf = _unpack("f", data["idf"])
+        idx.offsets = _unpack("I", data["offsets"])
+        idx.postings_docs = _unpack("I", data["postings_docs"])
+        idx.postings_tf = _unpack("H", data["postings_tf"])
+        return idx
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# -------------------------
+# Per-namespace registry
+# -------------------------
+_indexes: Dict[str, LexicalIndex] = {}
+
+
+def namespace_dir(namespace: str) -> str:
+    return os.path.join(LOCAL_INDEX_DIR, str(namespace))
+
+
+def _index_path(namespace: str) -> str:
+    return os.path.join(namespace_dir(namespace), LEXICAL_INDEX_FILE)
+
+
+def build_namespace_index(namespace: str, docs: List[Dict]) -> LexicalIndex:
+    """Build, persist and cache the lexical index for a namespace."""
+    idx = LexicalIndex.build(docs)
+    idx.save(_index_path(namespace))
+    _indexes[namespace] = idx
+    return idx
+
+
+def get_namespace_index(namespace: str) -> Optional[LexicalIndex]:
+    """Return the cached index, loading it from disk on first use."""
+    if namespace in _indexes:
+        return _indexes[namespace]
+    path = _index_path(namespace)
+    if not os.path.exists(path):
+        return None
+    idx = LexicalIndex.load(path)
+    _indexes[namespace] = idx
+    return idx
+
+
+def search_namespace(query: str, namespace: str, top_k: int = 5) -> Optional[List[Dict]]:
+    """
+    Keyword search shaped like `elasticSearchByQuery` results.
+    Returns None when the namespace has no local index so callers can fall back.
+    """
+    idx = get_namespace_index(namespace)
+    if idx is None:
+        return None
+    return [
+        {
+            "score": hit["score"],
+            "text": hit["text"],
+            "source_doc": hit["metadata"].get("source_name"),
+            "clause_id": hit["id"],
+            "metadata": hit["metadata"],
+        }
+        for hit in idx.search(query, top_k=top_k)
+    ]
@@ -1,43 +1,52 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
 import os
+import re
+from collections import OrderedDict
+from app.services.gemini_gateway import get_gateway
+from app.utils.timing import stage_timer
+
+# Enhancement costs a full Gemini round trip, so it is opt-in
+QUERY_ENHANCEMENT_ENABLED = os.getenv("QUERY_ENHANCEMENT_ENABLED", "false").lower() == "true"
+# How long retrieval waits for the enhanced query's results after the original's are in
+ENHANCEMENT_DEADLINE_SECONDS = float(os.getenv("ENHANCEMENT_DEADLINE_SECONDS", "1.5"))
+ENHANCEMENT_CACHE_SIZE = int(os.getenv("ENHANCEMENT_CACHE_SIZE", "1000"))
+
+_enhancement_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def normalize_query(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower()
 
-load_dotenv()
-# Set this up once at app startup, not every time
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 async def enhance_query(question: str) -> str:
     """
     Uses Gemini 2.0 Flash to rephrase a user query into a more specific one
-    to improve semantic search relevance.
+    to improve semantic search relevance. Results are cached per normalized question.
     """
-    try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
+    key = normalize_query(question)
+    with stage_timer("enhance"):
+        if key in _enhancement_cache:
+            _enhancement_cache.move_to_end(key)
+            return _enhancement_cache[key]
 
-        # Gemini's API is synchronous, so run it in a thread
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-
-        def generate_response():
+        try:
             full_prompt = (
     "You are a query enhancement assistant for a legal and insurance document system.\n"
     "Your task is to rewrite the given short or vague user question into a clear, detailed, and formal question.\n"
     "Preserve the original intent while expanding abbreviations, inferring implied meaning, and adding context for better understanding.\n"
     "Do not answer the question — only rewrite it.\n\n"
-    "Original question: {question}\n"
+    f"Original question: {question}\n"
     "Descriptive version:"
 )
 
+            response = await get_gateway().generate(full_prompt)
 
-            return model.generate_content(full_prompt)
-
-        with ThreadPoolExecutor() as executor:
-            response = await asyncio.get_event_loop().run_in_executor(executor, generate_response)
+            enhanced_q = response.text.strip()
+            print(f"Original Query: {question} -> Enhanced Query: {enhanced_q}")
+        except Exception as e:
+            print(f"Error enhancing query: {e}")
+            return question  # Fallback to the original question (not cached, so it is retried)
 
-        enhanced_q = response.text.strip()
-        print(f"Original Query: {question} -> Enhanced Query: {enhanced_q}")
+        _enhancement_cache[key] = enhanced_q
+        while len(_enhancement_cache) > ENHANCEMENT_CACHE_SIZE:
+            _enhancement_cache.popitem(last=False)
         return enhanced_q
-
-    except Exception as e:
-        print(f"Error enhancing query: {e}")
-        return question  # Fallback to the original question
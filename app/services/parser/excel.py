@@ -8,6 +8,7 @@ import os
 import csv
 import io
 import time
+from app.utils.timing import timed, stage_timer
 
 def extract_text_from_txt(file_bytes: bytes) -> str:
     try:
@@ -26,13 +27,14 @@ def extract_text_from_excel_bytes(data: bytes) -> str:
     return df.to_string(index=False)
 
 
+@timed("ocr")
 def extract_text_from_image_bytes(data: bytes) -> str:
     image = Image.open(BytesIO(data))
     return pytesseract.image_to_string(image)
 
 
 
-def extract_text_from_pptx_with_ocr(data: bytes) -> str:
+def extract_text_from_pptx_with_ocr(data: bytes, ocr: bool = True) -> str:
     text = []
 
     # Load presentation
@@ -44,19 +46,23 @@ def extract_text_from_pptx_with_ocr(data: bytes) -> str:
             if hasattr(shape, "text"):
                 text.append(shape.text)
 
+    if not ocr:
+        return "\n".join(text)
+
     # Extract images from pptx as a zip file
     zip_data = zipfile.ZipFile(BytesIO(data))
     image_files = [f for f in zip_data.namelist() if f.startswith("ppt/media/")]
 
-    for image_name in image_files:
-        with zip_data.open(image_name) as image_file:
-            try:
-                image = Image.open(image_file)
-                ocr_text = pytesseract.image_to_string(image)
-                if ocr_text.strip():
-                    text.append(ocr_text)
-            except Exception as e:
-                print(f"OCR error on {image_name}: {e}")
+    with stage_timer("ocr"):
+        for image_name in image_files:
+            with zip_data.open(image_name) as image_file:
+                try:
+                    image = Image.open(image_file)
+                    ocr_text = pytesseract.image_to_string(image)
+                    if ocr_text.strip():
+                        text.append(ocr_text)
+                except Exception as e:
+                    print(f"OCR error on {image_name}: {e}")
 
     return "\n".join(text)
 
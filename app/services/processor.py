@@ -11,6 +11,7 @@ from fastapi import UploadFile
 
 # Text processing
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.services.clause_graph import CLAUSE_HEADING, SUB_CLAUSE_LINE, CLAUSE_MARKER, SUB_CLAUSE_MARKER
 
 
 class EnhancedDocumentProcessor:
@@ -319,10 +320,10 @@ class EnhancedDocumentProcessor:
         for line in lines:
             line = line.strip()
             if not line: continue
-            if re.match(r'^\d+\)\s.*?\(Code\s-\w+\)', line):
-                marked_lines.append(f'CLAUSE_START: {line}')
-            elif re.match(r'^[a-z]\.\s', line):
-                marked_lines.append(f'SUB_CLAUSE: {line}')
+            if CLAUSE_HEADING.match(line):
+                marked_lines.append(f'{CLAUSE_MARKER}{line}')
+            elif SUB_CLAUSE_LINE.match(line):
+                marked_lines.append(f'{SUB_CLAUSE_MARKER}{line}')
             else:
                 marked_lines.append(line)
         return '\n'.join(marked_lines)
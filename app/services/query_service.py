@@ -1,18 +1,51 @@
-from app.services.embedder import get_embedding
+from app.services.embedder import get_embedding, get_embeddings
 from app.utils.pinecone_client import index
-from app.services.logic import enhance_query
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
-from app.services.elasticSearch.elasticQuerySearch import elasticSearchByQuery
-from typing import List, Dict, Any
+from app.services.logic import enhance_query, normalize_query, QUERY_ENHANCEMENT_ENABLED, ENHANCEMENT_DEADLINE_SECONDS
+from app.services.elasticSearch.elasticQuerySearch import elasticSearchByQuery, search_best_clauses
+from app.services.lexical_index import search_namespace, get_namespace_index
+from app.services.clause_graph import expand_references
+from app.services.GraphDB.graphQuerySearch import search_graph_async, GRAPH_RETRIEVAL_ENABLED, GRAPH_RETRIEVAL_TIMEOUT_SECONDS
+from app.services.hybrid_retrieval import vector_hits, keyword_hits, fuse_hits, reciprocal_rank_fusion
+from app.services.context_packer import pack_context, pack_texts, record_prompt
+from app.utils.executor import run_blocking
+from app.services.gemini_gateway import get_gateway
+from app.services.answer_cache import get_answer_cache, ANSWER_CACHE_ENABLED
+from app.utils.timing import stage_timer
+from app.utils.metrics import inc
+from app.utils.deadline import current_context, degrade, DEADLINE_PLACEHOLDER
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import logging
-from functools import lru_cache
 import asyncio
+import contextlib
+import contextvars
+import json
+import os
 import re
+import time
 import logging
 
-# Initialize Gemini model
-MODEL = genai.GenerativeModel("gemini-2.0-flash")
+# Every Gemini call goes through the shared gateway (rate limits, AIMD, retries)
+gateway = get_gateway()
+
+ANSWER_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "max_output_tokens": 150,
+    "top_p": 0.8,
+    "top_k": 40,
+}
+# Used instead of max_output_tokens when the request deadline is close
+SHORT_MAX_OUTPUT_TOKENS = 80
+
+# "per_question" (one Gemini call per question) or "batched" (one call per /run)
+ANSWER_MODE = os.getenv("ANSWER_MODE", "per_question")
+BATCH_CONTEXT_TOKEN_BUDGET = int(os.getenv("BATCH_CONTEXT_TOKEN_BUDGET", "4000"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+
+# Long questions are split into sub-queries. "single_hop" retrieves for all of
+# them and answers the original question in one call; "two_hop" answers each
+# sub-query and then summarizes the partial answers (the original flow).
+DECOMPOSE_MODE = os.getenv("DECOMPOSE_MODE", "single_hop")
+DECOMPOSE_MIN_LENGTH = 90
 
 # 🔹 Sub-question decomposition
 def decompose_query_heuristic(question: str) -> list[str]:
@@ -30,12 +63,13 @@ def decompose_query_heuristic(question: str) -> list[str]:
 
 
 # 🔹 Summarizer for multiple answers
-def multiple_query_summarizer(answers: List[str]) -> str:
+async def multiple_query_summarizer(answers: List[str]) -> str:
+    packed = pack_texts(answers)
     prompt = f"""
 You’re an expert assistant synthesizing the final answer for the user.  
 You have these partial answers to sub-questions (or retrieved contexts):
 
-{answers}
+{packed.text}
 
 ❓ User wants a single, coherent response that includes **all relevant points** found above.
 
@@ -51,54 +85,148 @@ You have these partial answers to sub-questions (or retrieved contexts):
 📝 Final Answer:
 """
     try:
-        response = MODEL.generate_content(prompt)
+        response = await gateway.generate(prompt)
+        record_prompt(prompt, packed, response)
         return response.text.strip()
     except Exception as e:
         logging.warning(f"❌ Summarization failed: {e}")
         return " ".join(answers)
 
 
-# 🔹 Query runner (shared)
-async def _run_query(query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default") -> str:
-    query_vector = get_embedding(query)
-    response = index.query(
-        vector=query_vector,
-        top_k=top_k,
-        include_metadata=True,
-        include_values=False,
-        namespace=namespace
-    )
+# 🔹 Keyword retrieval: local BM25 first, Elastic only if the namespace has no local index
+async def keyword_search(query: str, namespace: str, top_k: int = 5) -> list[dict]:
+    hits = search_namespace(query, namespace, top_k=top_k)
+    if hits is not None:
+        return hits
+    if degrade("elastic"):
+        return []  # no local index and little time left: skip the Elastic round trip
+
+    batched = (_batch_keyword_results.get() or {}).get((namespace, query))
+    if batched is not None:
+        task, position = batched
+        try:
+            return (await asyncio.shield(task))[position]
+        except Exception as e:
+            logging.warning(f"⚠️ Batched Elastic search failed, searching per question: {e!r}")
+    try:
+        return await run_blocking("elastic", elasticSearchByQuery, query, index_name=namespace)
+    except Exception as e:
+        logging.warning(f"⚠️ Elastic keyword search failed: {e!r}")
+        return []
 
-    high_quality_matches = [
-        match.get('metadata', {}).get('text', '').strip()
-        for match in response.get('matches', [])
-        if match.get('score', 0) >= similarity_threshold
-    ]
-    high_quality_matches = [text for text in high_quality_matches if text]
 
-    max_context_length = 3000
-    context_parts, current_length = [], 0
-    for text in high_quality_matches:
-        if current_length + len(text) > max_context_length:
-            break
-        context_parts.append(text)
-        current_length += len(text)
+# Elastic hits for a whole question batch, from one _msearch: {(namespace, question): (task, position)}
+_batch_keyword_results: contextvars.ContextVar = contextvars.ContextVar("batch_keyword_results", default=None)
 
-    context = "\n\n".join(context_parts)
-    elastic_data = elasticSearchByQuery(query, index_name=namespace)
 
-    prompt = f"""Based on the following context, provide a concise and accurate answer.
+# 🔹 One KeyBERT pass and one _msearch for every question, when keyword search will fall back to Elastic
+@contextlib.contextmanager
+def batch_keyword_search(queries: List[str], namespace: str):
+    """Answer tasks created inside the block read their Elastic hits from the shared search."""
+    if not queries or get_namespace_index(namespace) is not None or degrade("elastic"):
+        yield None
+        return
+    task = asyncio.ensure_future(search_best_clauses(queries, namespace))
+    # Questions that never reach keyword search leave the result unread
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    token = _batch_keyword_results.set({(namespace, q): (task, i) for i, q in enumerate(queries)})
+    try:
+        yield task
+    finally:
+        _batch_keyword_results.reset(token)
 
-Context:
-{context}
 
-ElasticSearch Context:
-{elastic_data}
+# 🔹 Graph retrieval: full-text seed clauses plus the clauses they reference (opt-in)
+async def graph_search(query: str, namespace: str) -> list[dict]:
+    if not GRAPH_RETRIEVAL_ENABLED or degrade("graph"):
+        return []
+    try:
+        with stage_timer("graph_search"):
+            return await search_graph_async(query, namespace=namespace, timeout=GRAPH_RETRIEVAL_TIMEOUT_SECONDS)
+    except Exception as e:
+        logging.warning(f"⚠️ Graph search failed: {e!r}")
+        return []
+
+
+# 🔹 Hybrid retrieval for one question: fused, deduplicated hits best-first
+async def retrieve_hits(query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default",
+                        query_vector: Optional[List[float]] = None) -> List[Dict]:
+    if degrade("top_k"):
+        top_k = max(2, top_k // 2)
+
+    async def vector_search():
+        vector = query_vector
+        if vector is None:
+            with stage_timer("embed_query"):
+                vector = await get_embedding(query)
+        with stage_timer("pinecone_query"):
+            return await run_blocking(
+                "pinecone",
+                index.query,
+                vector=vector,
+                top_k=top_k,
+                include_metadata=True,
+                include_values=False,
+                namespace=namespace
+            )
+
+    async def timed_keyword_search():
+        with stage_timer("keyword_search"):
+            return await keyword_search(query, namespace)
+
+    with stage_timer("retrieve"):
+        # Vector, keyword and graph retrieval are independent, run them together
+        response, keyword_results, graph_results = await asyncio.gather(
+            vector_search(), timed_keyword_search(), graph_search(query, namespace))
+
+        fused = fuse_hits(
+            vector_hits(response.get('matches', []), similarity_threshold),
+            keyword_hits(keyword_results),
+            graph_results,
+        )
+        # Clauses the best hits refer to ("subject to Clause 2"), from the in-process graph
+        return expand_references(fused, namespace)
+
+
+# 🔹 Retrieval with optional query enhancement
+async def retrieve_with_enhancement(query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default",
+                                    query_vector: Optional[List[float]] = None) -> List[Dict]:
+    """
+    Retrieval for the original question runs immediately; the enhanced query's
+    retrieval runs speculatively alongside it and is only fused in if it
+    finishes within ENHANCEMENT_DEADLINE_SECONDS of the original's results.
+    """
+    if not QUERY_ENHANCEMENT_ENABLED or degrade("enhancement"):
+        return await retrieve_hits(query, top_k, similarity_threshold, namespace, query_vector=query_vector)
+
+    start = time.perf_counter()
+    # Not cancelled on timeout: a late enhancement still lands in the cache for next time
+    enhancement = asyncio.ensure_future(enhance_query(query))
+
+    async def enhanced_retrieval():
+        enhanced = await asyncio.shield(enhancement)
+        if normalize_query(enhanced) == normalize_query(query):
+            return None
+        return await retrieve_hits(enhanced, top_k, similarity_threshold, namespace)
+
+    enhanced_task = asyncio.ensure_future(enhanced_retrieval())
+    original = await retrieve_hits(query, top_k, similarity_threshold, namespace, query_vector=query_vector)
 
-Question: {query}
+    try:
+        enhanced = await asyncio.wait_for(enhanced_task, timeout=ENHANCEMENT_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        logging.info(f"⏳ Enhanced retrieval missed its deadline after {time.perf_counter() - start:.2f}s; using original query")
+        return original
+    except Exception as e:
+        logging.warning(f"⚠️ Enhanced retrieval failed: {e!r}")
+        return original
 
-Instructions:
-- Answer strictly in 2 sentences maximum with all information from the context.
+    if not enhanced:
+        return original
+    return reciprocal_rank_fusion({"original": original, "enhanced": enhanced})
+
+
+ANSWER_INSTRUCTIONS = """- Answer strictly in 2 sentences maximum with all information from the context.
 - If the answer is Yes/No, start with that.
 - If the question is vague or has no context, say "Not relevant to the context".
 - If no direct answer, offer relevant insight.
@@ -106,42 +234,183 @@ Instructions:
 - give only precise information without any additional commentary.
 - don't add words like "chunk"
 - don't add source file name or document or any other metadata strictly
--don't add any extra information that is not present in the context strictly
+-don't add any extra information that is not present in the context strictly"""
+
+
+# 🔹 Answer one question from its retrieved hits
+async def generate_answer(query: str, hits: List[Dict]) -> str:
+    # Pack only the best fused chunks into the budget
+    with stage_timer("pack_context"):
+        packed = pack_context(hits)
+    context = packed.text
+
+    prompt = f"""Based on the following context, provide a concise and accurate answer.
+
+Context:
+{context}
+
+Question: {query}
+
+Instructions:
+{ANSWER_INSTRUCTIONS}
 Answer:"""
 
-    response = MODEL.generate_content(
-        prompt,
-        generation_config=GenerationConfig(
-            temperature=0.3,
-            max_output_tokens=150,
-            top_p=0.8,
-            top_k=40
-        )
-    )
+    generation_config = ANSWER_GENERATION_CONFIG
+    if degrade("generation"):
+        generation_config = {**generation_config, "max_output_tokens": SHORT_MAX_OUTPUT_TOKENS}
+
+    with stage_timer("generate"):
+        response = await gateway.generate(prompt, generation_config=generation_config)
+    record_prompt(prompt, packed, response)
     return response.text.strip()
 
 
+# 🔹 Query runner (shared)
+async def _run_query(query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default",
+                     query_vector: Optional[List[float]] = None) -> str:
+    fused = await retrieve_with_enhancement(query, top_k, similarity_threshold, namespace, query_vector=query_vector)
+    return await generate_answer(query, fused)
+
+
+# 🔹 Decomposed question, single hop: one batched embed, one generation call
+async def _run_decomposed_query(user_query: str, subquestions: List[str], top_k: int = 5,
+                                similarity_threshold: float = 0.4, namespace: str = "default") -> str:
+    vectors = await get_embeddings(subquestions)
+    hit_lists = await asyncio.gather(*[
+        retrieve_hits(q, top_k, similarity_threshold, namespace, query_vector=v)
+        for q, v in zip(subquestions, vectors)
+    ])
+    # Union of every sub-query's chunks, deduplicated and ranked by RRF
+    fused = reciprocal_rank_fusion({f"sub_{i}": hits for i, hits in enumerate(hit_lists)})
+    return await generate_answer(user_query, fused)
+
+
+# 🔹 Batched answering: one Gemini call for every question of a /run
+def _interleave(hit_lists: List[List[Dict]]) -> List[Dict]:
+    """Round-robin the per-question rankings so every question's best chunks pack first."""
+    merged = []
+    for rank in range(max((len(h) for h in hit_lists), default=0)):
+        for hits in hit_lists:
+            if rank < len(hits):
+                merged.append(hits[rank])
+    return merged
+
+
+def parse_batch_answers(raw: str, n_questions: int) -> Dict[int, str]:
+    """
+    Validate `[{"index": int, "answer": str}, ...]`; returns only the valid
+    entries so the caller can fall back for the rest.
+    """
+    raw = raw.strip()
+    # Tolerate a ```json fenced reply
+    raw = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw)
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(items, dict):
+        items = items.get("answers", [])
+    if not isinstance(items, list):
+        return {}
+
+    answers = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        idx, answer = item.get("index"), item.get("answer")
+        if (isinstance(idx, int) and not isinstance(idx, bool) and 0 <= idx < n_questions
+                and isinstance(answer, str) and answer.strip() and idx not in answers):
+            answers[idx] = answer.strip()
+    return answers
+
+
+async def answer_questions_batched(queries: List[str], top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default",
+                                   query_vectors: Optional[List[Optional[List[float]]]] = None) -> List[str]:
+    start = time.perf_counter()
+    query_vectors = query_vectors or [None] * len(queries)
+    hit_lists = await asyncio.gather(*[
+        retrieve_with_enhancement(q, top_k, similarity_threshold, namespace, query_vector=v)
+        for q, v in zip(queries, query_vectors)
+    ])
+    packed = pack_context(_interleave(hit_lists), BATCH_CONTEXT_TOKEN_BUDGET)
+
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(queries))
+    prompt = f"""Based on the following context, answer every question below.
+
+Context:
+{packed.text}
+
+Questions:
+{numbered}
+
+Instructions for each answer:
+{ANSWER_INSTRUCTIONS}
+
+Return ONLY a JSON array with one object per question, in the form
+[{{"index": <question number>, "answer": "<answer>"}}]"""
+
+    answers: Dict[int, str] = {}
+    try:
+        with stage_timer("generate_batch"):
+            response = await gateway.generate(prompt, generation_config={
+                **ANSWER_GENERATION_CONFIG,
+                "max_output_tokens": ANSWER_GENERATION_CONFIG["max_output_tokens"] * len(queries),
+                "response_mime_type": "application/json",
+            })
+        record_prompt(prompt, packed, response)
+        answers = parse_batch_answers(response.text, len(queries))
+    except Exception as e:
+        logging.warning(f"⚠️ Batched answering failed, falling back per question: {e!r}")
+
+    # Questions missing from / invalid in the batched reply get their own call
+    missing = [i for i in range(len(queries)) if i not in answers]
+    if missing:
+        logging.info(f"↩️ Batched answering: {len(missing)}/{len(queries)} questions fell back")
+        fallback = await asyncio.gather(*[
+            query_documents(queries[i], top_k, similarity_threshold, namespace, query_vector=query_vectors[i])
+            for i in missing
+        ])
+        answers.update(zip(missing, fallback))
+
+    logging.info(
+        f"⏱️ Batched answering: {len(queries)} questions in {time.perf_counter() - start:.2f}s, "
+        f"context tokens={packed.tokens}, fallbacks={len(missing)}"
+    )
+    return [answers[i] for i in range(len(queries))]
+
+
 # 🔹 Main query handler
 
-async def query_documents(user_query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default") -> str:
+async def query_documents(user_query: str, top_k: int = 5, similarity_threshold: float = 0.4, namespace: str = "default",
+                          decompose_mode: Optional[str] = None, query_vector: Optional[List[float]] = None) -> str:
+    decompose_mode = decompose_mode or DECOMPOSE_MODE
     try:
         
 
         # 🔍 Step 2: Proceed with Gemini-based logic
-        if len(user_query) > 90:
+        if len(user_query) > DECOMPOSE_MIN_LENGTH:
             subquestions = decompose_query_heuristic(user_query)
             # print(f"🔎 Decomposed subquestions: {subquestions}")
 
+            if decompose_mode == "single_hop":
+                return await _run_decomposed_query(user_query, subquestions, top_k, similarity_threshold, namespace)
+
             # Run all _run_query calls concurrently using asyncio.gather
             all_answers = await asyncio.gather(*[
                 _run_query(q, top_k, similarity_threshold, namespace)
                 for q in subquestions
             ])
 
-            return multiple_query_summarizer(all_answers)
+            return await multiple_query_summarizer(all_answers)
 
-        return await _run_query(user_query, top_k, similarity_threshold, namespace)
+        return await _run_query(user_query, top_k, similarity_threshold, namespace, query_vector=query_vector)
 
+    except asyncio.TimeoutError:
+        ctx = current_context()
+        if ctx is not None and ctx.expired():
+            return DEADLINE_PLACEHOLDER
+        logging.error("Timed out in query_documents")
+        return "❌ I encountered an error while processing your question. Please try again."
     except Exception as e:
         logging.error(f"Error in query_documents: {str(e)}")
         return "❌ I encountered an error while processing your question. Please try again."
@@ -149,20 +418,184 @@ async def query_documents(user_query: str, top_k: int = 5, similarity_threshold:
 
 
 
+ERROR_ANSWER_PREFIX = "❌"
+
+
+# 🧠 Answer cache lookup: exact normalized question first, then embedding similarity
+async def _lookup_cached(queries: List[str], namespace: str) -> Tuple[List[Optional[str]], List[Optional[List[float]]]]:
+    cache = get_answer_cache()
+    answers = [cache.get_exact(namespace, q) for q in queries]
+    vectors: List[Optional[List[float]]] = [None] * len(queries)
+
+    pending = [i for i, a in enumerate(answers) if a is None]
+    if pending:
+        try:
+            # One batched embed; the vectors are reused for retrieval on a miss
+            with stage_timer("embed_questions"):
+                embedded = await get_embeddings([queries[i] for i in pending])
+        except Exception as e:
+            logging.warning(f"⚠️ Question embedding for cache lookup failed: {e!r}")
+            embedded = [None] * len(pending)
+        for i, vector in zip(pending, embedded):
+            vectors[i] = vector
+        # One matrix product for the whole batch; cheap enough to stay on the loop
+        found = [i for i in pending if vectors[i] is not None]
+        for i, answer in zip(found, cache.get_similar_many(namespace, [vectors[i] for i in found])):
+            answers[i] = answer
+
+    similar = sum(1 for i in pending if answers[i] is not None)
+    inc("answer_cache_lookups_total", len(queries) - len(pending), result="exact")
+    inc("answer_cache_lookups_total", similar, result="similar")
+    inc("answer_cache_lookups_total", len(pending) - similar, result="miss")
+    return answers, vectors
+
+
+# ⏳ Gather answers until the request deadline; unfinished ones become placeholders
+async def _collect_before_deadline(tasks: List[asyncio.Future], n_answers: int) -> List[str]:
+    if not tasks:
+        return []
+    ctx = current_context()
+    timeout = max(0.0, ctx.remaining()) if ctx is not None and ctx.deadline is not None else None
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logging.warning(f"⏳ Request deadline reached with {len(pending)} unfinished answer task(s)")
+
+    if len(tasks) == 1 and n_answers > 1:
+        # A single batched task answers every question at once
+        task = tasks[0]
+        if task in done and task.exception() is None:
+            return task.result()
+        return [DEADLINE_PLACEHOLDER] * n_answers
+
+    answers = []
+    for task in tasks:
+        if task in done and task.exception() is None:
+            answers.append(task.result())
+        else:
+            answers.append(DEADLINE_PLACEHOLDER)
+    return answers
+
+
 # 🔁 Batch processing
-async def query_documents_batch(queries: List[str], top_k: int = 5, namespace: str = "default") -> List[str]:
-    results = []
+async def query_documents_batch(queries: List[str], top_k: int = 5, namespace: str = "default",
+                                mode: Optional[str] = None, use_cache: bool = ANSWER_CACHE_ENABLED) -> List[str]:
+    mode = mode or ANSWER_MODE
+    start = time.perf_counter()
     try:
-        for query in queries:
-            result = await query_documents(query, top_k=top_k, namespace=namespace)
-            results.append(result)
+        if use_cache:
+            results, vectors = await _lookup_cached(queries, namespace)
+        else:
+            results, vectors = [None] * len(queries), [None] * len(queries)
+
+        misses = [i for i, r in enumerate(results) if r is None]
+        miss_queries = [queries[i] for i in misses]
+        miss_vectors = [vectors[i] for i in misses]
+        with batch_keyword_search(miss_queries, namespace) as keyword_batch:
+            if mode == "batched" and 1 < len(misses) <= BATCH_MAX_QUESTIONS:
+                tasks = [asyncio.ensure_future(answer_questions_batched(
+                    miss_queries, top_k=top_k, namespace=namespace, query_vectors=miss_vectors))]
+            else:
+                # Blocking calls run on the shared executor, so questions can overlap;
+                # per-dependency limits in app.utils.executor bound the fan-out.
+                tasks = [
+                    asyncio.ensure_future(query_documents(q, top_k=top_k, namespace=namespace, query_vector=v))
+                    for q, v in zip(miss_queries, miss_vectors)
+                ]
+        answers = await _collect_before_deadline(tasks, len(misses))
+        if keyword_batch is not None:
+            keyword_batch.cancel()
+
+        for i, answer in zip(misses, answers):
+            results[i] = answer
+
+        if use_cache and misses:
+            cache = get_answer_cache()
+            for i, answer in zip(misses, answers):
+                if not answer.startswith(ERROR_ANSWER_PREFIX) and answer != DEADLINE_PLACEHOLDER:
+                    cache.put(namespace, queries[i], answer, vectors[i])
+            await run_blocking("cpu", cache.save)
     except Exception as e:
         logging.error(f"Batch processing error: {str(e)}")
-        results = ["Error processing query" for _ in queries]
+        return ["Error processing query" for _ in queries]
+
+    logging.info(
+        f"⏱️ Answered {len(queries)} questions in {time.perf_counter() - start:.2f}s "
+        f"(mode={mode}, cache hits={len(queries) - len(misses)})"
+    )
     return results
 
 
-# 🧠 Sync cache wrapper
-@lru_cache(maxsize=100)
-def query_documents_cached(user_query: str, top_k: int = 5, namespace: str = "default") -> str:
-    return asyncio.run(query_documents(user_query, top_k=top_k, namespace=namespace))
\ No newline at end of file
+# 🧠 Cached single-question entrypoint (safe to call from the running event loop)
+async def query_documents_cached(user_query: str, top_k: int = 5, namespace: str = "default") -> str:
+    return (await query_documents_batch([user_query], top_k=top_k, namespace=namespace, use_cache=True))[0]
+
+
+# 📡 Streaming entrypoint: yields (question index, answer) as each answer completes
+async def query_documents_stream(queries: List[str], top_k: int = 5, namespace: str = "default",
+                                 use_cache: bool = ANSWER_CACHE_ENABLED) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Per-question counterpart of query_documents_batch for streaming responses.
+    Cache hits are yielded first, then each miss as soon as it is answered;
+    questions still running at the request deadline yield DEADLINE_PLACEHOLDER.
+    Batched mode is not used here since it would hold every answer until the end.
+    """
+    start = time.perf_counter()
+    if use_cache:
+        results, vectors = await _lookup_cached(queries, namespace)
+    else:
+        results, vectors = [None] * len(queries), [None] * len(queries)
+
+    for i, answer in enumerate(results):
+        if answer is not None:
+            yield i, answer
+
+    misses = [i for i, r in enumerate(results) if r is None]
+    with batch_keyword_search([queries[i] for i in misses], namespace) as keyword_batch:
+        tasks = {
+            asyncio.ensure_future(query_documents(queries[i], top_k=top_k, namespace=namespace, query_vector=vectors[i])): i
+            for i in misses
+        }
+    pending = set(tasks)
+    answered = []
+    ctx = current_context()
+    try:
+        while pending:
+            timeout = max(0.0, ctx.remaining()) if ctx is not None and ctx.deadline is not None else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                i = tasks[task]
+                if task.exception() is None:
+                    answer = task.result()
+                else:
+                    answer = "❌ I encountered an error while processing your question. Please try again."
+                answered.append((i, answer))
+                yield i, answer
+
+        if pending:
+            logging.warning(f"⏳ Request deadline reached with {len(pending)} unfinished answer task(s)")
+        for task in pending:
+            task.cancel()
+            yield tasks[task], DEADLINE_PLACEHOLDER
+        pending = set()
+    finally:
+        # The client may disconnect mid-stream; do not leave questions running
+        for task in pending:
+            task.cancel()
+        if keyword_batch is not None:
+            keyword_batch.cancel()
+
+    if use_cache and answered:
+        cache = get_answer_cache()
+        for i, answer in answered:
+            if not answer.startswith(ERROR_ANSWER_PREFIX) and answer != DEADLINE_PLACEHOLDER:
+                cache.put(namespace, queries[i], answer, vectors[i])
+        await run_blocking("cpu", cache.save)
+
+    logging.info(
+        f"⏱️ Streamed {len(queries)} answers in {time.perf_counter() - start:.2f}s "
+        f"(cache hits={len(queries) - len(misses)})"
+    )
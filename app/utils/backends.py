@@ -0,0 +1,16 @@
+import os
+
+# Every client (gemini_gateway, pinecone_client, elastic_client,
+# graphQuerySearch) talks to its real service unless <NAME>_BACKEND=fake
+# (GEMINI, PINECONE, ELASTIC, NEO4J) swaps in the in-memory stand-in from
+# benchmarks/fakes.py, which the load tests and benchmarks run against.
+
+
+def fake_backend(name: str):
+    """The stand-ins module when `name`'s backend is "fake", else None."""
+    if os.getenv(f"{name.upper()}_BACKEND", "").lower() != "fake":
+        return None
+    from benchmarks import fakes
+
+    print(f"Using in-memory fake {name} backend")
+    return fakes
@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import contextvars
+from typing import Optional
+
+# --- Deadline settings ---
+# Opt-in: without REQUEST_DEADLINE_SECONDS (or the header) a request, including
+# the first ingest of a large document, runs until it is done
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS")) if os.getenv("REQUEST_DEADLINE_SECONDS") else None
+MAX_REQUEST_DEADLINE_SECONDS = float(os.getenv("MAX_REQUEST_DEADLINE_SECONDS", "120"))
+# Clients may ask for a tighter (or, up to the max, looser) budget per request
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+# Below this many seconds left, stages switch to their cheaper variants
+DEGRADE_BELOW_SECONDS = float(os.getenv("DEGRADE_BELOW_SECONDS", "8"))
+# Time kept back for answer generation when bounding earlier stages
+GENERATION_RESERVE_SECONDS = float(os.getenv("GENERATION_RESERVE_SECONDS", "4"))
+
+DEADLINE_PLACEHOLDER = "⏳ This question could not be answered within the request time limit."
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a stage starts after, or would outlive, the request deadline."""
+
+
+class RequestContext:
+    """Request-scoped deadline shared by every stage of a /run request (none if budget is None)."""
+
+    def __init__(self, budget_seconds: Optional[float] = REQUEST_DEADLINE_SECONDS):
+        self.started = time.monotonic()
+        self.budget = budget_seconds
+        self.deadline = None if budget_seconds is None else self.started + budget_seconds
+        self.degraded_stages = set()
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def low(self) -> bool:
+        """True once the request should take the cheaper path in each stage."""
+        return self.remaining() < DEGRADE_BELOW_SECONDS
+
+    def timeout(self, stage_timeout: Optional[float] = None, reserve: float = 0.0) -> Optional[float]:
+        """Stage timeout clipped to what is left of the request (minus `reserve`)."""
+        if self.deadline is None:
+            return stage_timeout
+        left = self.remaining() - reserve
+        if left <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+        return left if stage_timeout is None else min(stage_timeout, left)
+
+    def note_degraded(self, stage: str):
+        self.degraded_stages.add(stage)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_context", default=None)
+
+
+def parse_deadline_header(value: Optional[str]) -> Optional[float]:
+    """Budget in seconds from the header (milliseconds), falling back to config (None: no deadline)."""
+    try:
+        seconds = float(value) / 1000 if value else REQUEST_DEADLINE_SECONDS
+    except ValueError:
+        seconds = REQUEST_DEADLINE_SECONDS
+    if seconds is None:
+        return None
+    return max(0.1, min(seconds, MAX_REQUEST_DEADLINE_SECONDS))
+
+
+def start_request_context(budget_seconds: Optional[float] = REQUEST_DEADLINE_SECONDS) -> RequestContext:
+    ctx = RequestContext(budget_seconds)
+    _current.set(ctx)
+    return ctx
+
+
+def current_context() -> Optional[RequestContext]:
+    return _current.get()
+
+
+def clip_timeout(stage_timeout: Optional[float], reserve: float = 0.0) -> Optional[float]:
+    """Clip a stage timeout to the current request's deadline, if there is one."""
+    ctx = _current.get()
+    if ctx is None:
+        return stage_timeout
+    return ctx.timeout(stage_timeout, reserve)
+
+
+def is_low_on_time() -> bool:
+    ctx = _current.get()
+    return ctx is not None and ctx.low()
+
+
+def degrade(stage: str) -> bool:
+    """True if `stage` should take its cheaper variant now; recorded on the context."""
+    ctx = _current.get()
+    if ctx is None or not ctx.low():
+        return False
+    ctx.note_degraded(stage)
+    return True
@@ -0,0 +1,47 @@
+import os
+from dotenv import load_dotenv
+from app.utils.backends import fake_backend
+
+# Load environment variables from .env file
+load_dotenv()
+
+ELASTIC_CLOUD_URL = os.getenv("ELASTIC_CLOUD_URL")
+ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
+
+# What the search and upsert modules import, whichever backend it is
+__all__ = ["es", "get_async_es", "streaming_bulk", "parallel_bulk"]
+
+# ELASTIC_BACKEND=fake: the in-memory stand-in used by load tests
+fakes = fake_backend("elastic")
+
+# The client, its async twin and the bulk helpers are chosen together
+if fakes:
+    es = fakes.FakeElasticsearch()
+    streaming_bulk = fakes.fake_streaming_bulk
+    parallel_bulk = fakes.fake_parallel_bulk
+
+    def _connect_async():
+        return fakes.FakeAsyncElasticsearch(es)  # same in-memory data as `es`
+else:
+    from elasticsearch import Elasticsearch, AsyncElasticsearch
+    from elasticsearch.helpers import streaming_bulk, parallel_bulk
+
+    es = Elasticsearch(
+        ELASTIC_CLOUD_URL,
+        api_key=ELASTIC_API_KEY,
+        verify_certs=True
+    )
+
+    def _connect_async():
+        return AsyncElasticsearch(ELASTIC_CLOUD_URL, api_key=ELASTIC_API_KEY, verify_certs=True)
+
+
+# --- Async client for batch search, created on first use ---
+async_es = None
+
+
+def get_async_es():
+    global async_es
+    if async_es is None:
+        async_es = _connect_async()
+    return async_es
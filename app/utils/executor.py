@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import functools
+import contextvars
+import concurrent.futures
+from typing import Dict, Optional
+
+from app.utils.deadline import clip_timeout
+from app.utils.metrics import inc
+
+# One application-wide pool for every blocking SDK call (Gemini, Pinecone,
+# Elasticsearch, Neo4j, ...). Each dependency additionally gets its own
+# concurrency limit and timeout so one slow backend cannot take every thread.
+MAX_WORKERS = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+
+# name -> (max concurrent calls, timeout in seconds; None: only the request deadline applies)
+DEFAULT_LIMITS = {
+    "gemini": (16, 30.0),
+    "pinecone": (8, 10.0),
+    "elastic": (8, 5.0),
+    "neo4j": (4, 5.0),
+    # Parsing a large document can take minutes; it is bounded by the request, if any
+    "cpu": (4, None),
+    # One KeyBERT pass at a time; the model itself is locked anyway
+    "keybert": (1, 10.0),
+}
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="blocking")
+
+
+class DependencyPool:
+    """Concurrency limit, timeout and queue-depth counters for one dependency."""
+
+    def __init__(self, name: str, max_concurrency: int, timeout: Optional[float]):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_s": self.timeout,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,  # successful calls; avg_ms is over these
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+_pools: Dict[str, DependencyPool] = {}
+
+
+def get_pool(name: str) -> DependencyPool:
+    pool = _pools.get(name)
+    if pool is None:
+        limit, timeout = DEFAULT_LIMITS.get(name, (8, 30.0))
+        # e.g. GEMINI_MAX_CONCURRENCY=4, ELASTIC_TIMEOUT_SECONDS=2
+        limit = int(os.getenv(f"{name.upper()}_MAX_CONCURRENCY", limit))
+        if os.getenv(f"{name.upper()}_TIMEOUT_SECONDS"):
+            timeout = float(os.getenv(f"{name.upper()}_TIMEOUT_SECONDS"))
+        pool = _pools[name] = DependencyPool(name, limit, timeout)
+    return pool
+
+
+async def run_blocking(dependency: str, fn, *args, timeout: Optional[float] = None, **kwargs):
+    """
+    Run a blocking call on the shared executor under `dependency`'s limit.
+    Raises asyncio.TimeoutError when the call (queueing excluded) exceeds its timeout;
+    the worker thread finishes in the background and holds its permit until then.
+    Inside a request, the timeout is also clipped to the request deadline
+    (DeadlineExceeded once it has passed).
+    """
+    pool = get_pool(dependency)
+    timeout = pool.timeout if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+
+    pool.waiting += 1
+    try:
+        queue_timeout = clip_timeout(None)
+        if queue_timeout is None:
+            await pool.semaphore.acquire()
+        else:
+            await asyncio.wait_for(pool.semaphore.acquire(), timeout=queue_timeout)
+    except asyncio.TimeoutError:
+        pool.timeouts += 1
+        inc("dependency_timeouts_total", dependency=dependency)
+        raise
+    finally:
+        pool.waiting -= 1
+    try:
+        timeout = clip_timeout(timeout)
+    except asyncio.TimeoutError:
+        pool.timeouts += 1
+        inc("dependency_timeouts_total", dependency=dependency)
+        pool.semaphore.release()
+        raise
+
+    pool.in_flight += 1
+    start = time.perf_counter()
+    # Carry the request's contextvars (stage report, deadline) into the worker thread
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(_executor, context.run, functools.partial(fn, *args, **kwargs))
+    future.add_done_callback(functools.partial(_release, pool))
+    try:
+        # Shielded: a timeout (or a cancelled caller) stops the wait, not the future,
+        # so the permit stays taken until the worker thread is actually done
+        result = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        pool.timeouts += 1
+        inc("dependency_timeouts_total", dependency=dependency)
+        raise
+    except Exception:
+        pool.errors += 1
+        raise
+    pool.completed += 1
+    pool.total_seconds += time.perf_counter() - start
+    return result
+
+
+def _release(pool: DependencyPool, future: asyncio.Future):
+    """Done-callback of a call's executor future: free its permit."""
+    pool.in_flight -= 1
+    pool.semaphore.release()
+    if not future.cancelled():
+        future.exception()  # retrieved here when the caller stopped waiting
+
+
+def executor_stats() -> Dict:
+    """Per-dependency queue depth and counters, plus shared pool backlog."""
+    return {
+        "max_workers": MAX_WORKERS,
+        "pool_backlog": _executor._work_queue.qsize(),
+        "dependencies": {name: pool.stats() for name, pool in _pools.items()},
+    }
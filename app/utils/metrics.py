@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Tuple, Optional
+
+# In-process metrics, exported at /metrics in Prometheus text format.
+# Latencies are kept as a sliding window per label set, so quantiles reflect
+# recent traffic; sums and counts are cumulative like Prometheus expects.
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "hackrx_")
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()  # stages also run on executor threads
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Exact sample value: `:g` would round large counters to 6 significant digits."""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _quantile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> str:
+        name = METRICS_PREFIX + self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} counter"]
+        with _lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+    def snapshot(self) -> Dict:
+        return {",".join(f"{k}={v}" for k, v in labels) or "total": value for labels, value in self.values.items()}
+
+
+class Histogram:
+    """Latency distribution per label set; exported as a summary with p50/p95/p99."""
+
+    def __init__(self, name: str, help_text: str = "", window: int = METRICS_WINDOW):
+        self.name = name
+        self.help = help_text
+        self.window = window
+        self.samples: Dict[Labels, deque] = {}
+        self.counts: Dict[Labels, int] = {}
+        self.sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with _lock:
+            if key not in self.samples:
+                self.samples[key] = deque(maxlen=self.window)
+                self.counts[key] = 0
+                self.sums[key] = 0.0
+            self.samples[key].append(value)
+            self.counts[key] += 1
+            self.sums[key] += value
+
+    def render(self) -> str:
+        name = METRICS_PREFIX + self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} summary"]
+        with _lock:
+            series = [(labels, list(samples)) for labels, samples in sorted(self.samples.items())]
+        for labels, samples in series:
+            for q in QUANTILES:
+                lines.append(f"{name}{_format_labels(labels, ('quantile', str(q)))} {_quantile(samples, q):.6f}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {self.sums[labels]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {self.counts[labels]}")
+        return "\n".join(lines)
+
+    def snapshot(self) -> Dict:
+        """{label set: {count, p50_ms, p95_ms, p99_ms}} for the current window."""
+        with _lock:
+            series = [(labels, list(samples)) for labels, samples in self.samples.items()]
+        return {
+            ",".join(v for _, v in labels) or "total": {
+                "count": self.counts[labels],
+                **{f"p{int(q * 100)}_ms": round(_quantile(samples, q) * 1000, 2) for q in QUANTILES},
+            }
+            for labels, samples in series
+        }
+
+
+_registry: Dict[str, object] = {}
+
+
+def counter(name: str, help_text: str = "") -> Counter:
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Counter(name, help_text)
+    return metric
+
+
+def histogram(name: str, help_text: str = "") -> Histogram:
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, help_text)
+    return metric
+
+
+# --- Metrics used across the app ---
+STAGE_SECONDS = histogram("stage_seconds", "Latency of each pipeline stage in seconds.")
+counter("chunks_total", "Chunks produced by the chunker.")
+counter("clauses_embedded_total", "Clauses embedded and upserted at ingest.")
+counter("tokens_total", "Gemini tokens by kind (local prompt estimate, billed prompt, output).")
+counter("answer_cache_lookups_total", "Answer cache lookups by result (exact, similar, miss).")
+counter("gemini_events_total", "Gemini gateway calls, retries, rate limits, hedges and failures.")
+counter("dependency_timeouts_total", "Blocking calls that timed out, by dependency.")
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Add to the counter `name` (created on first use)."""
+    counter(name).inc(amount, **labels)
+
+
+def observe(name: str, seconds: float, **labels):
+    histogram(name).observe(seconds, **labels)
+
+
+@contextmanager
+def timer(name: str = "stage_seconds", **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def render_prometheus() -> str:
+    with _lock:
+        metrics = list(_registry.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def metrics_snapshot() -> Dict:
+    """JSON-friendly view of every metric (used by benchmarks)."""
+    with _lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in metrics.items()}
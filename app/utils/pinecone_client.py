@@ -1,27 +1,35 @@
 import os
 from dotenv import load_dotenv
 from pinecone import Pinecone
+from app.utils.backends import fake_backend
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the API key and index name from environment
-api_key = os.getenv("PINECONE_API_KEY")
-index_name = os.getenv("PINECONE_INDEX_NAME")
+# PINECONE_BACKEND=fake: the in-memory stand-in used by load tests
+fakes = fake_backend("pinecone")
 
-# Check if both are set
-if not api_key or not index_name:
-    raise ValueError("Missing Pinecone API key or index name in .env file.")
+if fakes:
+    index_name = "fake"
+    index = fakes.FakePineconeIndex()
+else:
+    # Get the API key and index name from environment
+    api_key = os.getenv("PINECONE_API_KEY")
+    index_name = os.getenv("PINECONE_INDEX_NAME")
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=api_key)
+    # Check if both are set
+    if not api_key or not index_name:
+        raise ValueError("Missing Pinecone API key or index name in .env file.")
 
-# Check if the index exists
-if index_name not in pc.list_indexes().names():
-    raise ValueError(f"Index '{index_name}' does not exist.")
+    # Initialize Pinecone client
+    pc = Pinecone(api_key=api_key)
 
-# Connect to the index
-index = pc.Index(index_name)
+    # Check if the index exists
+    if index_name not in pc.list_indexes().names():
+        raise ValueError(f"Index '{index_name}' does not exist.")
 
-# Optional: Print confirmation
-print(f"Connected to index '{index_name}'")
+    # Connect to the index
+    index = pc.Index(index_name)
+
+    # Optional: Print confirmation
+    print(f"Connected to index '{index_name}'")
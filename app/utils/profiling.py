@@ -0,0 +1,222 @@
+import os
+import sys
+import hmac
+import json
+import time
+import shutil
+import cProfile
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from app.logger.logger import current_request_id
+
+# --- Profiling settings ---
+# Profiling is off unless an admin token is configured; requests opt in with
+# `X-Profile: <token>` or `?profile=<token>`.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Keep only the newest captures
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "20"))
+# At most one capture per interval (and never two at once)
+PROFILE_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILE_MIN_INTERVAL_SECONDS", "60"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+MAX_STACK_DEPTH = 128
+
+_lock = threading.Lock()
+_active = False
+_last_capture = 0.0
+# Requests through profile_request: cProfile sees all of them, not just the profiled one
+_in_flight = 0
+_started = 0
+
+
+def _request_started():
+    global _in_flight, _started
+    with _lock:
+        _in_flight += 1
+        _started += 1
+
+
+def _request_finished():
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _request_counts() -> tuple:
+    with _lock:
+        return _in_flight, _started
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler(threading.Thread):
+    """Samples every thread's stack at a fixed interval (event loop and executor workers)."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, ready for flamegraph.pl / speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileCapture:
+    """
+    cProfile of the event-loop thread plus a sampled collapsed-stack file.
+    Both cover every coroutine the loop runs meanwhile, so meta.json records
+    how many other requests overlapped the capture.
+    """
+
+    def __init__(self, request_id: str, route: str):
+        self.request_id = request_id
+        self.route = route
+        self.started = time.time()
+        self.name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))}-{request_id}"
+        self.profiler: Optional[cProfile.Profile] = cProfile.Profile()
+        self.sampler: Optional[StackSampler] = None
+        if hasattr(sys, "_current_frames"):
+            self.sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        in_flight, self._started_before = _request_counts()
+        self._in_flight_before = in_flight - 1  # not counting this request
+
+    def overlapping_requests(self) -> int:
+        """Other requests in flight at the start, or started before the end, of the capture."""
+        _, started = _request_counts()
+        return self._in_flight_before + started - self._started_before
+
+    def start(self):
+        try:
+            self.profiler.enable()
+        except ValueError:
+            self.profiler = None  # another profiler (e.g. coverage) already owns this thread
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def stop(self) -> str:
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+        overlapping = self.overlapping_requests()
+        if overlapping:
+            logging.warning(f"🔬 Profile {self.name} also includes {overlapping} overlapping request(s)")
+
+        path = os.path.join(PROFILE_DIR, self.name)
+        os.makedirs(path, exist_ok=True)
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(path, "profile.prof"))
+        if self.sampler is not None:
+            with open(os.path.join(path, "stacks.collapsed"), "w") as f:
+                f.write(self.sampler.collapsed())
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "request_id": self.request_id,
+                "route": self.route,
+                "duration_s": round(time.time() - self.started, 3),
+                "samples": self.sampler.samples if self.sampler else 0,
+                "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+                "cprofile": self.profiler is not None,
+                # > 0: the profile is not this request's alone
+                "overlapping_requests": overlapping,
+            }, f, indent=2)
+        _enforce_retention()
+        return path
+
+
+def _enforce_retention():
+    try:
+        captures = sorted(
+            entry for entry in os.listdir(PROFILE_DIR) if os.path.isdir(os.path.join(PROFILE_DIR, entry))
+        )
+    except FileNotFoundError:
+        return
+    for old in captures[:-PROFILE_MAX_CAPTURES] if PROFILE_MAX_CAPTURES > 0 else captures:
+        shutil.rmtree(os.path.join(PROFILE_DIR, old), ignore_errors=True)
+
+
+def _try_acquire() -> bool:
+    global _active, _last_capture
+    with _lock:
+        now = time.monotonic()
+        if _active or now - _last_capture < PROFILE_MIN_INTERVAL_SECONDS:
+            return False
+        _active = True
+        _last_capture = now
+        return True
+
+
+def _release():
+    global _active
+    with _lock:
+        _active = False
+
+
+async def profile_request(request: Request, response: Response):
+    """
+    Route dependency: profiles the request when an admin opts in. Rate-limited
+    requests run unprofiled; X-Profile-Capture says which happened.
+    Streaming responses are profiled up to the point the stream starts.
+    Every request is counted, so a capture can report the requests it overlapped.
+    """
+    _request_started()
+    try:
+        token = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+        if not token:
+            yield
+            return
+        # Bytes: compare_digest rejects str with non-ASCII characters
+        if not PROFILE_ADMIN_TOKEN or not hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Profiling not allowed")
+        if not _try_acquire():
+            response.headers["X-Profile-Capture"] = "rate-limited"
+            yield
+            return
+
+        capture = ProfileCapture(current_request_id() or "no-request-id", request.url.path)
+        response.headers["X-Profile-Capture"] = capture.name
+        capture.start()
+        try:
+            yield
+        finally:
+            try:
+                path = capture.stop()
+                logging.info(f"🔬 Profile for {capture.route} written to {path}")
+            except Exception as e:
+                logging.error(f"❌ Writing profile failed: {e!r}")
+            finally:
+                _release()
+    finally:
+        _request_finished()
@@ -0,0 +1,69 @@
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.utils.metrics import STAGE_SECONDS
+
+# Per-request stage timings: {stage: {"count": n, "total_ms": ms, "max_ms": ms}}
+_stage_report: contextvars.ContextVar = contextvars.ContextVar("stage_report", default=None)
+# run_blocking carries the report into executor threads, so updates can race
+_report_lock = threading.Lock()
+
+
+def start_stage_report() -> Dict:
+    """Begin accumulating stage timings for the current request."""
+    report: Dict[str, Dict] = {}
+    _stage_report.set(report)
+    return report
+
+
+def stage_report() -> Optional[Dict]:
+    return _stage_report.get()
+
+
+def record_stage(stage: str, seconds: float):
+    # Process-wide histogram (exported at /metrics), then the per-request report
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    report = _stage_report.get()
+    if report is None:
+        return
+    ms = seconds * 1000
+    with _report_lock:
+        entry = report.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + ms, 2)
+        entry["max_ms"] = round(max(entry["max_ms"], ms), 2)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a block (sync or inside a coroutine) and add it to the request's stage report."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        record_stage(stage, elapsed)
+        logging.debug(f"⏱️ {stage}: {elapsed * 1000:.1f} ms")
+
+
+def timed(stage: str):
+    """Decorator form of stage_timer for sync and async functions."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
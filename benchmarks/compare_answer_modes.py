@@ -0,0 +1,61 @@
+"""
+Compare per-question and batched answering on the same namespace.
+
+    python -m benchmarks.compare_answer_modes --namespace 3 --questions questions.json
+
+`questions.json` is either a list of questions or a /run payload
+(`{"documents": ..., "questions": [...]}`). Prints wall time and prompt
+token usage for each mode, plus a JSON summary line.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.query_service import query_documents_batch
+from app.services.context_packer import start_token_report
+
+
+def load_questions(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["questions"] if isinstance(data, dict) else data
+
+
+async def run_mode(mode: str, questions: list[str], namespace: str) -> dict:
+    report = start_token_report()
+    start = time.perf_counter()
+    answers = await query_documents_batch(questions, namespace=namespace, mode=mode)
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "questions": len(questions),
+        "seconds": round(elapsed, 3),
+        "gemini_calls": report["prompts"],
+        "prompt_tokens": report["prompt_tokens"],
+        "billed_prompt_tokens": report["billed_prompt_tokens"],
+        "answers": answers,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--namespace", required=True)
+    parser.add_argument("--questions", required=True, help="JSON list of questions or a /run payload")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    results = []
+    for _ in range(args.repeat):
+        for mode in ("per_question", "batched"):
+            results.append(await run_mode(mode, questions, args.namespace))
+
+    for r in results:
+        print(f"{r['mode']:>13}: {r['seconds']:.2f}s, {r['gemini_calls']} Gemini calls, "
+              f"{r['prompt_tokens']} prompt tokens ({r['billed_prompt_tokens']} billed)")
+    print(json.dumps([{k: v for k, v in r.items() if k != "answers"} for r in results]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Compare the two-hop (answer sub-queries, then summarize) and single-hop
+(union sub-query retrieval, answer once) flows for long questions.
+
+    python -m benchmarks.compare_decomposition_modes --namespace 3 --questions questions.json
+
+Only questions longer than DECOMPOSE_MIN_LENGTH are decomposed, so pass the
+long ones. Prints per-question latency and prompt token usage for each mode,
+plus a JSON summary line.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.services.query_service import query_documents, DECOMPOSE_MIN_LENGTH
+from app.services.context_packer import start_token_report
+from benchmarks.compare_answer_modes import load_questions
+
+
+async def run_mode(mode: str, questions: list[str], namespace: str) -> dict:
+    latencies, calls, tokens = [], 0, 0
+    for question in questions:
+        report = start_token_report()
+        start = time.perf_counter()
+        await query_documents(question, namespace=namespace, decompose_mode=mode)
+        latencies.append(time.perf_counter() - start)
+        calls += report["prompts"]
+        tokens += report["prompt_tokens"]
+    return {
+        "mode": mode,
+        "questions": len(questions),
+        "p50_s": round(statistics.median(latencies), 3),
+        "max_s": round(max(latencies), 3),
+        "total_s": round(sum(latencies), 3),
+        "gemini_generate_calls": calls,
+        "prompt_tokens": tokens,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--namespace", required=True)
+    parser.add_argument("--questions", required=True, help="JSON list of questions or a /run payload")
+    args = parser.parse_args()
+
+    questions = [q for q in load_questions(args.questions) if len(q) > DECOMPOSE_MIN_LENGTH]
+    if not questions:
+        raise SystemExit(f"No question is longer than {DECOMPOSE_MIN_LENGTH} characters.")
+
+    results = [await run_mode(mode, questions, args.namespace) for mode in ("two_hop", "single_hop")]
+    for r in results:
+        print(f"{r['mode']:>10}: p50 {r['p50_s']:.2f}s, max {r['max_s']:.2f}s, "
+              f"{r['gemini_generate_calls']} generate calls, {r['prompt_tokens']} prompt tokens")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,439 @@
+import os
+import re
+import time
+import asyncio
+import random
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Offline stand-ins for Gemini, Pinecone, Elasticsearch and Neo4j, used by the
+# load tests and benchmarks. <NAME>_BACKEND=fake selects one; the clients get
+# them through app.utils.backends.fake_backend.
+# They keep data in memory and sleep for a lognormal latency around a
+# configurable median so load tests see realistic overlap between calls.
+FAKE_PINECONE_MS = float(os.getenv("FAKE_PINECONE_MS", "40"))
+FAKE_ELASTIC_MS = float(os.getenv("FAKE_ELASTIC_MS", "30"))
+FAKE_LATENCY_SIGMA = float(os.getenv("FAKE_LATENCY_SIGMA", "0.5"))
+
+WORD = re.compile(r"\w+")
+
+
+def fake_latency(median_ms: float, sigma: float = FAKE_LATENCY_SIGMA):
+    if median_ms > 0:
+        time.sleep(random.lognormvariate(0, sigma) * median_ms / 1000)
+
+
+class FakePineconeIndex:
+    """The subset of pinecone.Index used by the app: upsert, update, query, fetch, delete."""
+
+    def __init__(self, latency_ms: float = FAKE_PINECONE_MS):
+        self.latency_ms = latency_ms
+        self.namespaces: Dict[str, Dict[str, Dict]] = {}
+        self._matrices: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict], namespace: str = ""):
+        fake_latency(self.latency_ms)
+        with self._lock:
+            records = self.namespaces.setdefault(namespace, {})
+            for v in vectors:
+                records[v["id"]] = {"values": list(v["values"]), "metadata": dict(v.get("metadata", {}))}
+            self._matrices.pop(namespace, None)
+        return {"upserted_count": len(vectors)}
+
+    def update(self, id: str, set_metadata: Optional[Dict] = None, namespace: str = "", **_):
+        fake_latency(self.latency_ms)
+        with self._lock:
+            record = self.namespaces.get(namespace, {}).get(id)
+            if record is not None and set_metadata:
+                record["metadata"].update(set_metadata)
+        return {}
+
+    def _matrix(self, namespace: str):
+        with self._lock:
+            cached = self._matrices.get(namespace)
+            if cached is None:
+                records = self.namespaces.get(namespace, {})
+                ids = list(records)
+                matrix = np.array([records[i]["values"] for i in ids], dtype=np.float32).reshape(len(ids), -1)
+                norms = np.linalg.norm(matrix, axis=1) if len(ids) else np.zeros(0)
+                cached = self._matrices[namespace] = (ids, matrix / np.maximum(norms, 1e-9)[:, None])
+            return cached
+
+    def query(self, vector: List[float], top_k: int = 5, namespace: str = "",
+              include_metadata: bool = False, include_values: bool = False, **_):
+        fake_latency(self.latency_ms)
+        ids, matrix = self._matrix(namespace)
+        if not ids:
+            return {"matches": [], "namespace": namespace}
+        q = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (q / max(np.linalg.norm(q), 1e-9))
+        best = np.argsort(-scores)[:top_k]
+        records = self.namespaces[namespace]
+        matches = []
+        for i in best:
+            match = {"id": ids[i], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = records[ids[i]]["metadata"]
+            if include_values:
+                match["values"] = records[ids[i]]["values"]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def fetch(self, ids: List[str], namespace: str = ""):
+        fake_latency(self.latency_ms)
+        records = self.namespaces.get(namespace, {})
+        return {"vectors": {i: {"id": i, **records[i]} for i in ids if i in records}, "namespace": namespace}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False,
+               namespace: str = "", filter: Optional[Dict] = None, **_):
+        fake_latency(self.latency_ms)
+        with self._lock:
+            if delete_all:
+                self.namespaces.pop(namespace, None)
+            elif ids:
+                records = self.namespaces.get(namespace, {})
+                for i in ids:
+                    records.pop(i, None)
+            elif filter:
+                records = self.namespaces.get(namespace, {})
+                for i in [i for i, r in records.items()
+                          if all(r["metadata"].get(k) == v for k, v in filter.items())]:
+                    del records[i]
+            self._matrices.pop(namespace, None)
+        return {}
+
+
+class _FakeIndices:
+    def __init__(self, owner: "FakeElasticsearch"):
+        self.owner = owner
+
+    def exists(self, index: str) -> bool:
+        return index in self.owner.indices_data
+
+    def create(self, index: str, body: Optional[Dict] = None, **_):
+        self.owner.indices_data.setdefault(index, {})
+        return {"acknowledged": True, "index": index}
+
+    def refresh(self, index: str, **_):
+        return {}
+
+    def put_settings(self, index: str, settings: Optional[Dict] = None, **_):
+        return {"acknowledged": True}
+
+
+class FakeElasticsearch:
+    """The subset of the Elasticsearch client used by the app, scored by term overlap."""
+
+    def __init__(self, latency_ms: float = FAKE_ELASTIC_MS):
+        self.latency_ms = latency_ms
+        self.indices_data: Dict[str, Dict[str, Dict]] = {}
+        self.indices = _FakeIndices(self)
+        self._lock = threading.Lock()
+
+    def bulk(self, actions: List[Dict], **_) -> Dict:
+        """One _bulk round trip of index (or delete) actions, in helper action form."""
+        fake_latency(self.latency_ms)
+        items = []
+        with self._lock:
+            for action in actions:
+                op_type = action.get("_op_type", "index")
+                docs = self.indices_data.setdefault(action["_index"], {})
+                doc_id = action.get("_id") or str(len(docs))
+                if op_type == "delete":
+                    status = 200 if docs.pop(doc_id, None) is not None else 404
+                else:
+                    docs[doc_id] = action["_source"]
+                    status = 201
+                items.append({op_type: {"_index": action["_index"], "_id": doc_id, "status": status}})
+        return {"errors": any(item[next(iter(item))]["status"] >= 300 for item in items), "items": items}
+
+    def delete_by_query(self, index: str, body: Optional[Dict] = None, **_):
+        with self._lock:
+            deleted = len(self.indices_data.get(index, {}))
+            self.indices_data[index] = {}
+        return {"deleted": deleted}
+
+    @staticmethod
+    def _query_terms(query: Dict) -> set:
+        """Terms of every `match` clause, including those nested in bool queries."""
+        if "match" in query:
+            match = next(iter(query["match"].values()))
+            return set(WORD.findall(str(match["query"] if isinstance(match, dict) else match).lower()))
+        terms = set()
+        for clauses in query.get("bool", {}).values():
+            for clause in clauses if isinstance(clauses, list) else []:
+                terms |= FakeElasticsearch._query_terms(clause)
+        return terms
+
+    def search(self, index: str, body: Dict, _latency: bool = True, **_):
+        if _latency:
+            fake_latency(self.latency_ms)
+        terms = self._query_terms(body["query"])
+        hits = []
+        for doc_id, source in list(self.indices_data.get(index, {}).items()):
+            text = source.get("metadata", {}).get("text") or source.get("text", "")
+            score = len(terms & set(WORD.findall(text.lower())))
+            if score:
+                hits.append({"_id": doc_id, "_score": float(score), "_source": source})
+        hits.sort(key=lambda h: h["_score"], reverse=True)
+        return {"hits": {"hits": hits[:body.get("size", 10)]}}
+
+    def msearch(self, searches: List[Dict], **_):
+        """One round trip for every (header, body) pair."""
+        fake_latency(self.latency_ms)
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            responses.append(self.search(header["index"], body, _latency=False))
+        return {"responses": responses}
+
+
+def fake_streaming_bulk(client: FakeElasticsearch, actions, chunk_size: int = 500,
+                        raise_on_error: bool = True, **_):
+    """elasticsearch.helpers.streaming_bulk over a FakeElasticsearch: (ok, item) per action."""
+    actions = iter(actions)
+    while True:
+        chunk = [action for _, action in zip(range(chunk_size), actions)]
+        if not chunk:
+            return
+        for item in client.bulk(chunk)["items"]:
+            ok = item[next(iter(item))]["status"] < 300
+            if not ok and raise_on_error:
+                raise RuntimeError(f"bulk item failed: {item}")
+            yield ok, item
+
+
+def fake_parallel_bulk(client: FakeElasticsearch, actions, thread_count: int = 4, chunk_size: int = 500, **kwargs):
+    """elasticsearch.helpers.parallel_bulk over a FakeElasticsearch (chunks sent in turn)."""
+    return fake_streaming_bulk(client, actions, chunk_size=chunk_size, **kwargs)
+
+
+class FakeAsyncElasticsearch:
+    """AsyncElasticsearch facade over a FakeElasticsearch (same in-memory data)."""
+
+    def __init__(self, sync_client: FakeElasticsearch):
+        self.sync_client = sync_client
+
+    async def msearch(self, searches: List[Dict], **kwargs):
+        return await asyncio.to_thread(self.sync_client.msearch, searches, **kwargs)
+
+    async def search(self, index: str, body: Dict, **kwargs):
+        return await asyncio.to_thread(self.sync_client.search, index, body, **kwargs)
+
+    async def close(self):
+        pass
+
+
+# -------------------------
+# Neo4j (NEO4J_BACKEND=fake)
+# -------------------------
+# Costs of a local server: one round trip per transaction/auto-commit query,
+# plus a small per-row cost for UNWIND batches.
+FAKE_NEO4J_MS = float(os.getenv("FAKE_NEO4J_MS", "5"))
+FAKE_NEO4J_ROW_US = float(os.getenv("FAKE_NEO4J_ROW_US", "30"))
+
+
+class FakeNeo4jResult:
+    def __init__(self, records: List[Dict]):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def data(self) -> List[Dict]:
+        return list(self.records)
+
+    def consume(self):
+        return None
+
+
+HOPS = re.compile(r"\*1\.\.(\d+)")
+
+
+class FakeGraph:
+    """
+    Keeps what the clause loader writes: clauses by (namespace, clause_id)
+    and (from, type, to) edges between those keys. Full-text searches (a
+    `search` parameter) are scored by term overlap with clause text and
+    category and expanded along outgoing edges, within the `namespace` /
+    `source_doc` parameters when they are set.
+    """
+
+    def __init__(self):
+        self.clauses: Dict[tuple, Dict] = {}
+        self.out_edges: Dict[tuple, set] = {}  # key -> {(type, target key)}
+        self.transactions = 0
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    @property
+    def edges(self) -> set:
+        return {(key, rel, target) for key, out in self.out_edges.items() for rel, target in out}
+
+    def search(self, query: str, params: Dict) -> FakeNeo4jResult:
+        terms = set(params["search"].split(" OR "))
+        max_hops = int(HOPS.search(query).group(1)) if HOPS.search(query) else 0
+
+        def in_scope(key):
+            row = self.clauses.get(key)
+            return row is not None and all(params.get(k) is None or row.get(k) == params[k]
+                                           for k in ("namespace", "source_doc"))
+
+        with self._lock:
+            scored = []
+            for key, row in self.clauses.items():
+                if not in_scope(key):
+                    continue
+                words = set(WORD.findall(f"{row.get('text', '')} {row.get('category', '')}".lower()))
+                if terms & words:
+                    scored.append((len(terms & words) / len(terms), key))
+            scored.sort(reverse=True)
+            records = []
+            for score, key in scored[:params.get("limit", 5)]:
+                seed = self.clauses[key]
+                refs, frontier, seen = [], [key], {key}
+                for hop in range(1, max_hops + 1):
+                    frontier = list(dict.fromkeys(
+                        t for src in frontier for _, t in self.out_edges.get(src, ())
+                        if t not in seen and in_scope(t)
+                    ))
+                    for target in frontier:
+                        seen.add(target)
+                        ref = self.clauses[target]
+                        refs.append({"clause_id": ref["clause_id"], "text": ref["text"], "doc": ref["source_doc"],
+                                     "page": ref["page"], "hops": hop})
+                records.append({"clause_id": seed["clause_id"], "text": seed["text"], "doc": seed["source_doc"],
+                                "page": seed["page"], "score": score, "refs": refs})
+        return FakeNeo4jResult(records)
+
+    def run(self, query: str, params: Dict) -> FakeNeo4jResult:
+        if "search" in params:
+            return self.search(query, params)
+        rows = params.get("rows") or []
+        if rows:
+            time.sleep(len(rows) * FAKE_NEO4J_ROW_US / 1_000_000)
+        with self._lock:
+            self.statements += 1
+            for clause_id in params.get("clause_ids") or []:
+                key = (params["namespace"], clause_id)
+                self.clauses.pop(key, None)
+                self.out_edges.pop(key, None)
+                for out in self.out_edges.values():
+                    out -= {edge for edge in out if edge[1] == key}
+            for row in rows:
+                key = (row["namespace"], row["clause_id"])
+                self.clauses[key] = row
+                # A re-uploaded clause's references replace its old ones
+                self.out_edges[key] = {
+                    (rel, (row["namespace"], target))
+                    for rel, field in (("REFERS_TO", "refers_to"), ("DEPENDS_ON", "depends_on"))
+                    for target in row.get(field) or []
+                }
+        return FakeNeo4jResult([])
+
+
+class FakeNeo4jTransaction:
+    def __init__(self, graph: FakeGraph):
+        self.graph = graph
+
+    def run(self, query: str, parameters: Optional[Dict] = None, **params):
+        return self.graph.run(query, {**(parameters or {}), **params})
+
+
+class FakeNeo4jSession:
+    def __init__(self, graph: FakeGraph, latency_ms: float):
+        self.graph = graph
+        self.latency_ms = latency_ms
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _transaction(self, fn, *args, **kwargs):
+        fake_latency(self.latency_ms)
+        with self.graph._lock:
+            self.graph.transactions += 1
+        return fn(FakeNeo4jTransaction(self.graph), *args, **kwargs)
+
+    execute_write = _transaction
+    execute_read = _transaction
+
+    def run(self, query: str, parameters: Optional[Dict] = None, **params):
+        fake_latency(self.latency_ms)
+        with self.graph._lock:
+            self.graph.transactions += 1
+        return self.graph.run(query, {**(parameters or {}), **params})
+
+    def close(self):
+        pass
+
+
+class FakeNeo4jDriver:
+    """The subset of neo4j.Driver used by the GraphDB modules."""
+
+    def __init__(self, latency_ms: float = FAKE_NEO4J_MS):
+        self.latency_ms = latency_ms
+        self.graph = FakeGraph()
+
+    def session(self, **_):
+        return FakeNeo4jSession(self.graph, self.latency_ms)
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        pass
+
+
+# -------------------------
+# Gemini (GEMINI_BACKEND=fake)
+# -------------------------
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeGeminiBackend:
+    """
+    Offline stand-in for load tests: lognormal latency around a configurable
+    median, optional injected 429s, deterministic fake embeddings.
+    """
+
+    def __init__(self, generate_latency_ms: float = None, embed_latency_ms: float = None,
+                 sigma: float = None, error_rate: float = None, dimension: int = 768):
+        self.generate_latency_ms = generate_latency_ms or float(os.getenv("FAKE_GEMINI_GENERATE_MS", "800"))
+        self.embed_latency_ms = embed_latency_ms or float(os.getenv("FAKE_GEMINI_EMBED_MS", "80"))
+        self.sigma = sigma if sigma is not None else float(os.getenv("FAKE_GEMINI_SIGMA", "0.5"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_GEMINI_429_RATE", "0"))
+        self.dimension = dimension
+        self.calls = 0
+
+    def _sleep(self, median_ms: float):
+        self.calls += 1
+        if random.random() < self.error_rate:
+            time.sleep(0.01)
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+        time.sleep(random.lognormvariate(0, self.sigma) * median_ms / 1000)
+
+    def generate(self, model: str, prompt: str, generation_config: Optional[Dict] = None):
+        self._sleep(self.generate_latency_ms)
+        text = f"Fake answer from {model}."
+        prompt_tokens = max(1, len(prompt) // 4)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 4),
+        )
+
+    def _vector(self, text: str) -> List[float]:
+        rng = random.Random(text)
+        return [rng.uniform(-1, 1) for _ in range(self.dimension)]
+
+    def embed(self, model: str, content, task_type: str):
+        self._sleep(self.embed_latency_ms)
+        if isinstance(content, list):
+            return [self._vector(c) for c in content]
+        return self._vector(content)
@@ -0,0 +1,74 @@
+"""
+Cross-source dedup check for hybrid retrieval, against the offline fakes.
+
+    python -m benchmarks.fusion_check
+
+Ingests a synthetic policy into Pinecone and Elastic, then searches both for
+one clause's text. The Elastic hit must carry the same record id as the
+Pinecone match, and RRF must fuse them into a single hit found by both
+sources. Exits 1 if either does not hold.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from benchmarks.reingest_bench import synthetic_pages
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="fusion-check-")
+    os.environ.update({
+        "GEMINI_BACKEND": "fake",
+        "PINECONE_BACKEND": "fake",
+        "ELASTIC_BACKEND": "fake",
+        "FAKE_GEMINI_EMBED_MS": "0",
+        "FAKE_PINECONE_MS": "0",
+        "FAKE_ELASTIC_MS": "0",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+        "INGEST_JOURNAL_DIR": os.path.join(workdir, "ingest_journal"),
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answer_cache.json"),
+    })
+    from app.services import embedder
+    from app.services.chunker import chunk_text_with_offsets, PAGE_BREAK
+    from app.services.elasticSearch.elasticQuerySearch import _format_hits, _search_body
+    from app.services.hybrid_retrieval import vector_hits, keyword_hits, fuse_hits
+    from app.utils.elastic_client import es
+    from app.utils.pinecone_client import index
+
+    namespace = "fusion"
+    chunks = chunk_text_with_offsets(PAGE_BREAK.join(synthetic_pages(5, 4)), split_pages=True)
+    records = embedder.build_records(chunks, "policy.pdf", {}, namespace)
+    target = records[len(records) // 2]
+    query = target["metadata"]["text"]
+
+    async def search():
+        await embedder.embed_chunks_async(chunks, "policy.pdf", {}, np=namespace)
+        vector = await embedder.get_embedding(query)
+        return index.query(vector=vector, top_k=5, namespace=namespace, include_metadata=True)
+
+    response = asyncio.run(search())
+    vector = vector_hits(response["matches"])
+    keyword = keyword_hits(_format_hits(es.search(index=namespace, body=_search_body(query))["hits"]["hits"]))
+    fused = fuse_hits(vector, keyword)
+
+    failures = []
+    if not keyword or keyword[0]["id"] != target["id"]:
+        failures.append(f"Elastic top hit id {keyword[0]['id'] if keyword else None!r} != record id {target['id']!r}")
+    if vector[0]["id"] != target["id"]:
+        failures.append(f"Pinecone top match id {vector[0]['id']!r} != record id {target['id']!r}")
+    matching = [hit for hit in fused if hit["id"] == target["id"]]
+    if len(matching) != 1 or sorted(matching[0]["sources"]) != ["keyword", "vector"]:
+        failures.append(f"record fused into {[(hit['id'], hit['sources']) for hit in matching]}")
+    ids = [hit["id"] for hit in fused]
+    if len(ids) != len(set(ids)):
+        failures.append(f"duplicate ids after fusion: {ids}")
+
+    print(f"{len(vector)} vector + {len(keyword)} keyword hits fused into {len(fused)}")
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
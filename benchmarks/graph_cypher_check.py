@@ -0,0 +1,176 @@
+"""
+Clause-order check for the Cypher sent by graph search and the Neo4j loader.
+
+    python -m benchmarks.graph_cypher_check
+    python -m benchmarks.graph_cypher_check --real      # uses NEO4J_URI / credentials
+
+The in-memory Neo4j stand-in never parses Cypher, so a statement that the
+server would reject still passes the other benchmarks. Offline, this walks
+each statement's clauses (per CALL {} / FOREACH scope) and checks the
+Cypher 5 order rules the queries rely on: ORDER BY / SKIP / LIMIT only on
+WITH or RETURN and in that order, and a WITH's WHERE only after them.
+Known-bad samples must be flagged, so the check cannot pass vacuously.
+
+With --real it also runs the statements on the configured server: EXPLAIN
+for every query, then an upload, a scoped graph search and a delete of
+prefixed benchmark clauses. Exits 1 on any failure.
+"""
+import argparse
+import os
+import re
+import sys
+
+TOKEN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|[.$:]?\w+|[{}()\[\]]")
+CLAUSES = {
+    "WITH", "RETURN", "MATCH", "UNWIND", "CALL", "YIELD", "MERGE", "SET", "DELETE", "REMOVE",
+    "CREATE", "FOREACH", "UNION", "DROP",
+}
+PROJECTION_PARTS = ["ORDER BY", "SKIP", "LIMIT"]
+WHERE_AFTER = {"WITH", "MATCH", "OPTIONAL MATCH", "YIELD"}
+
+# The pre-fix seed query shape, and friends: each must be reported
+KNOWN_BAD = [
+    "MATCH (n) WITH n, count(*) AS c WHERE c > 1 ORDER BY c DESC LIMIT 3 RETURN n",
+    "MATCH (n) WITH n LIMIT 3 ORDER BY n.x RETURN n",
+    "MATCH (n) RETURN n WHERE n.x > 1",
+    "UNWIND $rows AS row ORDER BY row RETURN row",
+    "MATCH (n) WHERE n.name STARTS WITH 'a' WITH n WHERE n.x > 1 ORDER BY n.x RETURN n",
+]
+
+
+def clause_order_errors(cypher):
+    """Clause-order violations in `cypher`, as "line N: message" strings."""
+    errors = []
+    scopes = [{"clause": None, "parts": []}]  # one per open ( { [ level
+    words = []
+    for match in TOKEN.finditer(cypher):
+        token = match.group()
+        line = cypher.count("\n", 0, match.start()) + 1
+        if token in "({[":
+            scopes.append({"clause": None, "parts": []})
+            words = []
+            continue
+        if token in ")}]":
+            if len(scopes) > 1:
+                scopes.pop()
+            words = []
+            continue
+        if token[0] in "'\"`.$:":
+            words = []
+            continue
+
+        word = token.upper()
+        scope = scopes[-1]
+        previous = words[-1] if words else None
+        words.append(word)
+        if word == "WITH" and previous in ("STARTS", "ENDS"):
+            continue  # string operator, not a clause
+        if word == "MATCH" and previous == "OPTIONAL":
+            scope.update(clause="OPTIONAL MATCH", parts=[])
+        elif word == "DELETE" and previous == "DETACH":
+            scope.update(clause="DETACH DELETE", parts=[])
+        elif word in CLAUSES:
+            scope.update(clause=word, parts=[])
+        elif word == "WHERE" and scope["clause"] is not None:
+            if scope["clause"] not in WHERE_AFTER:
+                errors.append(f"line {line}: WHERE cannot follow {scope['clause']}")
+            elif "WHERE" in scope["parts"]:
+                errors.append(f"line {line}: second WHERE on one {scope['clause']}")
+            scope["parts"].append("WHERE")
+        elif (word in ("SKIP", "LIMIT") or (word == "BY" and previous == "ORDER")) and scope["clause"] is not None:
+            part = "ORDER BY" if word == "BY" else word
+            if scope["clause"] not in ("WITH", "RETURN"):
+                errors.append(f"line {line}: {part} cannot follow {scope['clause']}")
+            elif "WHERE" in scope["parts"]:
+                errors.append(f"line {line}: {part} after WHERE; project again with WITH first")
+            elif any(PROJECTION_PARTS.index(seen) >= PROJECTION_PARTS.index(part)
+                     for seen in scope["parts"] if seen in PROJECTION_PARTS):
+                errors.append(f"line {line}: {part} out of order (ORDER BY, SKIP, LIMIT)")
+            scope["parts"].append(part)
+    return errors
+
+
+def statements():
+    """(name, cypher, EXPLAIN parameters) for every statement the app sends."""
+    from app.services.GraphDB import graphDbUpsertion as loader
+    from app.services.GraphDB.graphQuerySearch import search_cypher
+
+    search_params = {"search": "maternity", "namespace": None, "source_doc": None, "limit": 5}
+    named = [(f"search_cypher({hops})", search_cypher(hops), search_params) for hops in (0, 1, 2)]
+    named.append(("UPSERT_CLAUSES_CYPHER", loader.UPSERT_CLAUSES_CYPHER, {"rows": []}))
+    named.append(("DELETE_CLAUSES_CYPHER", loader.DELETE_CLAUSES_CYPHER, {"clause_ids": [], "namespace": ""}))
+    named.extend((f"SCHEMA_STATEMENTS[{i}]", statement, None)
+                 for i, statement in enumerate(loader.SCHEMA_STATEMENTS))
+    return named
+
+
+def run_real(named, clauses=20):
+    """EXPLAIN each query, then upload, search and delete prefixed clauses."""
+    from benchmarks.neo4j_ingest_bench import synthetic_clauses
+    from app.services.GraphDB import graphDbUpsertion as loader
+    from app.services.GraphDB.graphQuerySearch import get_driver, search_graph
+
+    failures = []
+    with get_driver().session() as session:
+        for name, cypher, params in named:
+            if params is None:
+                continue  # schema commands cannot be EXPLAINed; ensure_schema runs them below
+            try:
+                session.run("EXPLAIN " + cypher, **params).consume()
+            except Exception as e:
+                failures.append(f"{name}: {e}")
+
+    namespace = "cypher-check"
+    prefix = "cypher-check-"
+    batch = synthetic_clauses(clauses, prefix)
+    for clause in batch:
+        clause["namespace"] = namespace
+    try:
+        loader.upload_clauses_to_neo4j(batch)
+        with get_driver().session() as session:
+            session.run("CALL db.awaitIndexes(60)").consume()
+        for hops in (0, 2):
+            hits = search_graph("synthetic clause", namespace=namespace, hops=hops)
+            if not hits:
+                failures.append(f"search_graph(hops={hops}) found none of the {clauses} uploaded clauses")
+            elif any(not hit["id"].startswith(prefix) for hit in hits):
+                failures.append(f"search_graph(hops={hops}) left namespace {namespace!r}")
+        other = search_graph("synthetic clause", namespace=namespace + "-other")
+        if any(hit["id"].startswith(prefix) for hit in other):
+            failures.append("search_graph returned clauses from another namespace")
+    except Exception as e:
+        failures.append(f"round trip: {e}")
+    finally:
+        loader.delete_clauses_from_neo4j([clause["clause_id"] for clause in batch], namespace)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="also run the statements on the configured Neo4j server")
+    args = parser.parse_args()
+
+    if not args.real:
+        os.environ["NEO4J_BACKEND"] = "fake"
+
+    failures = []
+    for sample in KNOWN_BAD:
+        if not clause_order_errors(sample):
+            failures.append(f"checker missed a known-bad sample: {sample}")
+
+    named = statements()
+    for name, cypher, _ in named:
+        errors = clause_order_errors(cypher)
+        failures.extend(f"{name} {error}" for error in errors)
+        print(f"{'❌' if errors else '✅'} {name}", file=sys.stderr)
+
+    if args.real:
+        failures.extend(run_real(named))
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
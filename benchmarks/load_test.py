@@ -0,0 +1,302 @@
+"""
+Offline load test: replay or synthesize /run payloads against the FastAPI app
+with local stand-ins for Gemini, Pinecone, Elasticsearch and document URLs.
+
+    python -m benchmarks.load_test --requests 40 --concurrency 8 --output load.json
+    python -m benchmarks.load_test --replay api_logs.log --concurrency 16
+
+Nothing leaves the machine: GEMINI_BACKEND, PINECONE_BACKEND and
+ELASTIC_BACKEND are set to "fake", document URLs are rewritten to a local
+HTTP server serving synthetic policy documents, and every file the app writes
+(namespace map, local index, answer cache, logs) goes to a scratch directory.
+The fakes stand in for the clients only: keyword extraction still runs the
+KeyBERT model (KEYBERT_MODEL), so its cost shows up in the stage timings.
+
+Prints one JSON object: throughput, end-to-end and per-stage p50/p95/p99,
+status counts, Gemini gateway counters and peak RSS, tagged with the commit,
+so runs can be diffed across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ADMIN_TOKEN = "load-test-token"
+
+TOPICS = [
+    "maternity expenses", "pre-existing diseases", "cataract surgery", "organ donor expenses",
+    "ambulance charges", "room rent", "ICU charges", "AYUSH treatment", "day care procedures",
+    "domiciliary hospitalization", "health check-up", "no claim discount", "grace period",
+    "cumulative bonus", "dental treatment", "cosmetic surgery", "infertility treatment",
+]
+QUESTION_TEMPLATES = [
+    "What is the waiting period for {topic}?",
+    "Does the policy cover {topic}, and under what conditions?",
+    "Is there a sub-limit on {topic}?",
+    "How are claims for {topic} settled?",
+]
+
+
+# -------------------------
+# Synthetic documents and payloads
+# -------------------------
+def synthetic_document(doc_id: int, clauses: int) -> str:
+    """Deterministic policy text with numbered clauses the clause grouper recognises."""
+    rng = random.Random(doc_id)
+    parts = [f"Synthetic Health Policy {doc_id}\nPolicy wording and schedule of benefits."]
+    for n in range(1, clauses + 1):
+        topic = TOPICS[(n + doc_id) % len(TOPICS)]
+        months = rng.choice([12, 24, 36, 48])
+        limit = rng.choice([10, 20, 25, 50])
+        parts.append(
+            f"{n}) {topic.title()} (Code -C{n:03d})\n"
+            f"Expenses related to {topic} are covered after a waiting period of {months} months "
+            f"of continuous coverage. The liability for {topic} is limited to {limit}% of the sum insured. "
+            f"Claims for {topic} are settled on a reimbursement or cashless basis at network hospitals."
+        )
+    return "\n".join(parts)
+
+
+def synthetic_payloads(n_requests: int, n_documents: int, n_questions: int, seed: int) -> list:
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(n_requests):
+        questions = [
+            rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(TOPICS))
+            for _ in range(n_questions)
+        ]
+        payloads.append({"documents": f"doc://{rng.randrange(n_documents)}", "questions": questions})
+    return payloads
+
+
+LOG_REQUEST = re.compile(r"Request: (\{.*\}) \| Response:")
+
+
+def _as_payload(candidate):
+    if isinstance(candidate, str):
+        try:
+            candidate = json.loads(candidate)
+        except ValueError:
+            return None
+    if isinstance(candidate, dict) and isinstance(candidate.get("questions"), list) and candidate.get("documents"):
+        return {"documents": candidate["documents"], "questions": candidate["questions"]}
+    return None
+
+
+def load_replay(path: str) -> list:
+    """
+    /run payloads from a JSON list, JSON lines (payloads or the JSON request
+    log's `request_body`), or the older plain-text api_logs.log format.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+        candidates = data if isinstance(data, list) else [data]
+    except ValueError:
+        candidates = []
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+                candidates.append(record.get("request_body", record) if isinstance(record, dict) else record)
+            except ValueError:
+                candidates.extend(LOG_REQUEST.findall(line))
+    return [p for p in map(_as_payload, candidates) if p]
+
+
+# -------------------------
+# Local document server
+# -------------------------
+def start_document_server(clauses: int, latency_ms: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.match(r"^/docs/(\d+)\.txt$", self.path.split("?")[0])
+            if not match:
+                self.send_error(404)
+                return
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            body = synthetic_document(int(match.group(1)), clauses).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def localize_documents(payloads: list, port: int) -> list:
+    """Point every distinct document URL at its own synthetic document."""
+    ids = {}
+    localized = []
+    for p in payloads:
+        doc_id = ids.setdefault(p["documents"], len(ids))
+        localized.append({**p, "documents": f"http://127.0.0.1:{port}/docs/{doc_id}.txt"})
+    return localized
+
+
+# -------------------------
+# Load generation
+# -------------------------
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.5) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def run_load(app, payloads: list, concurrency: int, timeout: float) -> dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+    headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test",
+                                 timeout=timeout) as client:
+        async def one(payload):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/hackrx/run", json=payload, headers=headers)
+                    status = str(response.status_code)
+                except Exception as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(p) for p in payloads])
+        wall = time.perf_counter() - start
+
+    return {
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(payloads) / wall, 3) if wall else None,
+        "questions_per_s": round(sum(len(p["questions"]) for p in payloads) / wall, 3) if wall else None,
+        "status": statuses,
+        "latency": percentiles(latencies),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def configure_environment(args, workdir: str):
+    """Must run before the app is imported: modules read their settings at import."""
+    os.environ.update({
+        "GEMINI_BACKEND": "fake",
+        "PINECONE_BACKEND": "fake",
+        "ELASTIC_BACKEND": "fake",
+        "HACKRX_SECRET_TOKEN": ADMIN_TOKEN,
+        "FAKE_GEMINI_GENERATE_MS": str(args.generate_ms),
+        "FAKE_GEMINI_EMBED_MS": str(args.embed_ms),
+        "FAKE_GEMINI_SIGMA": str(args.sigma),
+        "FAKE_GEMINI_429_RATE": str(args.error_rate),
+        "FAKE_PINECONE_MS": str(args.pinecone_ms),
+        "FAKE_ELASTIC_MS": str(args.elastic_ms),
+        "FAKE_LATENCY_SIGMA": str(args.sigma),
+        "NAMESPACE_COUNTER_PATH": os.path.join(workdir, "dumper.txt"),
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "LOG_FILE": os.path.join(workdir, "api_logs.log"),
+    })
+    # Relative paths (ufiles.json, local_index/, answer_cache.json) land in the scratch dir
+    os.chdir(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", help="JSON/JSONL payloads or an api_logs.log to replay")
+    parser.add_argument("--requests", type=int, default=40, help="synthetic requests (ignored with --replay)")
+    parser.add_argument("--documents", type=int, default=4, help="distinct synthetic documents")
+    parser.add_argument("--questions", type=int, default=5, help="questions per synthetic request")
+    parser.add_argument("--clauses", type=int, default=40, help="clauses per synthetic document")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per request (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generate-ms", type=float, default=800.0, help="median fake Gemini generate latency")
+    parser.add_argument("--embed-ms", type=float, default=80.0, help="median fake Gemini embed latency")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal spread of fake latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake Gemini calls that 429")
+    parser.add_argument("--pinecone-ms", type=float, default=40.0)
+    parser.add_argument("--elastic-ms", type=float, default=30.0)
+    parser.add_argument("--document-ms", type=float, default=50.0, help="document server latency")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    payloads = load_replay(args.replay) if args.replay else synthetic_payloads(
+        args.requests, args.documents, args.questions, args.seed)
+    if not payloads:
+        sys.exit("No /run payloads to send.")
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="hackrx-load-"))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, REPO_ROOT)
+    configure_environment(args, workdir)
+
+    from app.main import app
+    from app.utils.metrics import metrics_snapshot
+    from app.utils.executor import executor_stats
+    from app.services.gemini_gateway import get_gateway
+
+    server = start_document_server(args.clauses, args.document_ms)
+    payloads = localize_documents(payloads, server.server_address[1])
+    try:
+        result = asyncio.run(run_load(app, payloads, args.concurrency, args.timeout))
+    finally:
+        server.shutdown()
+
+    snapshot = metrics_snapshot()
+    report = {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "workdir")},
+        "requests": len(payloads),
+        **result,
+        "stages": snapshot.get("stage_seconds", {}),
+        "counters": {name: values for name, values in snapshot.items() if name != "stage_seconds"},
+        "gemini_gateway": get_gateway().stats(),
+        "executor": executor_stats(),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "workdir": workdir,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Neo4j clause ingestion throughput at different UNWIND batch sizes.
+
+    python -m benchmarks.neo4j_ingest_bench --clauses 5000 --batch-sizes 1,100,500
+    python -m benchmarks.neo4j_ingest_bench --real      # uses NEO4J_URI / credentials
+
+By default runs against the in-memory stand-in (NEO4J_BACKEND=fake), which
+charges FAKE_NEO4J_MS per transaction and FAKE_NEO4J_ROW_US per row, like a
+local server. Batch size 1 reproduces the old one-transaction-per-clause
+loader. With --real, benchmark clauses are prefixed and removed afterwards.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+
+def synthetic_clauses(n: int, prefix: str, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    categories = ["Coverage Start", "Maternity", "Exclusion", "Emergency", "Daycare", "Mental Health"]
+    clauses = []
+    for i in range(n):
+        earlier = [f"{prefix}{j}" for j in rng.sample(range(i), min(i, rng.randint(0, 2)))] if i else []
+        clauses.append({
+            "clause_id": f"{prefix}{i}",
+            "text": f"Synthetic clause {i}. Refer to {', '.join(earlier) or 'the schedule'}.",
+            "source_doc": f"Synthetic{i % 3}.pdf",
+            "metadata": {
+                "page": i // 10 + 1,
+                "category": rng.choice(categories),
+                "refers_to": earlier,
+                "depends_on": earlier[:1],
+            },
+        })
+    return clauses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clauses", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,100,500")
+    parser.add_argument("--real", action="store_true", help="run against the configured Neo4j server")
+    args = parser.parse_args()
+
+    if not args.real:
+        os.environ["NEO4J_BACKEND"] = "fake"
+    from app.services.GraphDB import graphDbUpsertion as loader
+    from app.services.GraphDB.graphQuerySearch import get_driver, close_driver
+
+    results = []
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        prefix = f"bench-{batch_size}-"
+        clauses = synthetic_clauses(args.clauses, prefix)
+        if not args.real:
+            close_driver()  # each batch size starts from an empty fake graph
+
+        start = time.perf_counter()
+        loader.upload_clauses_to_neo4j(clauses, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        result = {
+            "batch_size": batch_size,
+            "clauses": len(clauses),
+            "seconds": round(elapsed, 3),
+            "clauses_per_s": round(len(clauses) / elapsed, 1),
+        }
+        if args.real:
+            with get_driver().session() as session:
+                session.run("MATCH (c:Clause) WHERE c.clause_id STARTS WITH $prefix DETACH DELETE c",
+                            prefix=prefix).consume()
+        else:
+            graph = get_driver().graph
+            result.update(transactions=graph.transactions, clauses_stored=len(graph.clauses),
+                          edges=len(graph.edges))
+        results.append(result)
+        print(f"batch_size={batch_size:>5}: {result['clauses_per_s']:>10} clauses/s", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Parser and chunker microbenchmarks on the synthetic corpus.
+
+    python -m benchmarks.parser_bench --sizes 1,10,100
+    python -m benchmarks.parser_bench --sizes 1,10,100 --save-baseline
+    python -m benchmarks.parser_bench --sizes 1,10,100 --threshold 0.2   # exit 1 on regression
+
+For every extractor (PDF, DOCX, XLSX, PPTX without OCR, CSV, nested ZIP) and
+every text stage (format_structured_content, chunk_page_content, chunk_text,
+chunk_text_with_offsets) at every size, reports the median time, pages/sec,
+MB/sec and peak Python heap (tracemalloc; native allocations made by
+PyMuPDF, lxml or pandas are not included).
+
+Results are compared with the baseline file; a case whose throughput drops,
+or whose peak memory grows, by more than --threshold fails the run, and so
+does a missing baseline file. Cases the baseline does not cover are listed.
+Baselines are machine-specific: record them on the machine that compares
+(the committed benchmarks/baselines/parsers.json is the reference machine's).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic_corpus import GENERATORS, LINES_PER_PAGE, policy_lines
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "parsers.json")
+# Below this, memory differences are noise
+MEMORY_SLACK_MB = 1.0
+
+
+def load_cases():
+    """(name, format or None for text stages, callable) for every benchmarked function."""
+    from app.services import document_loader
+    from app.services.parser import excel
+    from app.services.chunker import chunk_text, chunk_text_with_offsets
+    from app.services.processor import EnhancedDocumentProcessor
+
+    processor = EnhancedDocumentProcessor()
+    return [
+        ("extract_text_from_pdf", "pdf", document_loader.extract_text_from_pdf),
+        ("extract_text_from_docx", "docx", document_loader.extract_text_from_docx),
+        ("extract_text_from_excel_bytes", "xlsx", excel.extract_text_from_excel_bytes),
+        ("extract_text_from_pptx", "pptx", lambda data: excel.extract_text_from_pptx_with_ocr(data, ocr=False)),
+        ("extract_text_from_csv_bytes", "csv", excel.extract_text_from_csv_bytes),
+        ("extract_text_from_nested_zip", "zip", excel.extract_text_from_nested_zip),
+        ("format_structured_content", None, document_loader.format_structured_content),
+        ("chunk_page_content", None, lambda text: processor.chunk_page_content(text, 1000, 50)),
+        ("chunk_text", None, chunk_text),
+        ("chunk_text_with_offsets", None, chunk_text_with_offsets),
+    ]
+
+
+def synthetic_text(pages: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join("\n".join(policy_lines(rng, LINES_PER_PAGE)) for _ in range(pages))
+
+
+def measure(fn, arg, repeat: int) -> dict:
+    fn(arg)  # warm-up: imports, regex compilation, model loading
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(timings), "peak_mb": peak / (1024 * 1024)}
+
+
+def run(sizes: list, repeat: int, seed: int, only: set) -> list:
+    results = []
+    for name, fmt, fn in load_cases():
+        if only and name not in only:
+            continue
+        for pages in sizes:
+            arg = GENERATORS[fmt](pages, seed) if fmt else synthetic_text(pages, seed)
+            size_mb = (len(arg) if isinstance(arg, bytes) else len(arg.encode("utf-8"))) / (1024 * 1024)
+            m = measure(fn, arg, repeat)
+            results.append({
+                "case": f"{name}:{pages}",
+                "pages": pages,
+                "input_mb": round(size_mb, 3),
+                "median_ms": round(m["median_s"] * 1000, 3),
+                "pages_per_s": round(pages / m["median_s"], 2) if m["median_s"] else None,
+                "mb_per_s": round(size_mb / m["median_s"], 3) if m["median_s"] else None,
+                "peak_mb": round(m["peak_mb"], 3),
+            })
+            print(f"{name:>32} {pages:>5}p  {results[-1]['median_ms']:>10.2f} ms  "
+                  f"{results[-1]['pages_per_s']:>10} pages/s  {results[-1]['peak_mb']:>8.2f} MB peak",
+                  file=sys.stderr)
+    return results
+
+
+def compare(results: list, baseline: dict, threshold: float) -> tuple:
+    """(regressions, cases missing from the baseline)."""
+    regressions, unmatched = [], []
+    for r in results:
+        base = baseline.get(r["case"])
+        if not base:
+            unmatched.append(r["case"])
+            continue
+        if base.get("pages_per_s") and r["pages_per_s"] < base["pages_per_s"] * (1 - threshold):
+            regressions.append(f"{r['case']}: {r['pages_per_s']} pages/s vs baseline {base['pages_per_s']}")
+        if r["peak_mb"] > base.get("peak_mb", 0) * (1 + threshold) + MEMORY_SLACK_MB:
+            regressions.append(f"{r['case']}: {r['peak_mb']} MB peak vs baseline {base['peak_mb']}")
+    return regressions, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,100", help="comma-separated page counts (1-1000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default="", help="comma-separated case names")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if any(not 1 <= s <= 1000 for s in sizes):
+        sys.exit("Sizes must be between 1 and 1000 pages.")
+    only = {n for n in args.only.split(",") if n}
+    results = run(sizes, args.repeat, args.seed, only)
+
+    report = {"results": results}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({r["case"]: {"pages_per_s": r["pages_per_s"], "peak_mb": r["peak_mb"]} for r in results},
+                      f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"], report["not_in_baseline"] = compare(results, json.load(f), args.threshold)
+    else:
+        # Nothing to compare against must not look like a clean run
+        print(json.dumps(report, indent=2))
+        sys.exit(f"❌ No baseline at {args.baseline}; record one with --save-baseline.")
+
+    print(json.dumps(report, indent=2))
+    if report.get("not_in_baseline"):
+        print(f"⚠️ {len(report['not_in_baseline'])} case(s) not in the baseline, not compared: "
+              + ", ".join(report["not_in_baseline"]), file=sys.stderr)
+    if report.get("regressions"):
+        print("❌ Regressions:\n  " + "\n  ".join(report["regressions"]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-question cost of queryExtractor: full pipeline one query at a time
+(the old extract_info) against the trimmed pipeline, serial and batched.
+
+    python -m benchmarks.query_extractor_bench --questions 20,200,2000
+    python -m benchmarks.query_extractor_bench --questions 2000 --pool
+
+Batched results are checked against the full pipeline, so a disabled
+component that changes the output shows up as mismatches.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.load_test import QUESTION_TEMPLATES, TOPICS
+
+PERSONAL = [
+    "", "My wife is 34 years old. ", "46M, knee surgery in Pune, policy is 3 months old. ",
+    "My father had a heart transplant 2 months ago in Mumbai. ", "Daughter's maternity delivery in Delhi. ",
+]
+
+
+def synthetic_questions(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        rng.choice(PERSONAL) + rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(TOPICS))
+        for _ in range(n)
+    ]
+
+
+def per_question_ms(fn, questions: list) -> float:
+    start = time.perf_counter()
+    fn(questions)
+    return (time.perf_counter() - start) * 1000 / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default="20,200", help="comma-separated batch sizes")
+    parser.add_argument("--pool", action="store_true", help="also measure the worker-process pool")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import spacy
+    from app.services.GraphDB import queryExtractor
+
+    full_nlp = spacy.load(queryExtractor.SPACY_MODEL)
+    full = lambda qs: [queryExtractor._extract_from_doc(q, full_nlp(q)) for q in qs]
+    trimmed_one_by_one = lambda qs: [queryExtractor.extract_info(q) for q in qs]
+    batched = lambda qs: queryExtractor.extract_info_batch(qs, use_pool=False)
+    pooled = lambda qs: queryExtractor.extract_info_batch(qs, use_pool=True)
+
+    # Warm-up: model loading, and the pool's workers loading theirs
+    warm = synthetic_questions(8, args.seed)
+    trimmed_one_by_one(warm)
+    if args.pool:
+        pooled(warm * 4)
+
+    results = []
+    for n in map(int, args.questions.split(",")):
+        questions = synthetic_questions(n, args.seed)
+        expected = full(questions)
+        result = {
+            "questions": n,
+            "full_one_by_one_ms": round(per_question_ms(full, questions), 3),
+            "trimmed_one_by_one_ms": round(per_question_ms(trimmed_one_by_one, questions), 3),
+            "trimmed_batched_ms": round(per_question_ms(batched, questions), 3),
+            "mismatches": sum(a != b for a, b in zip(expected, batched(questions))),
+        }
+        if args.pool:
+            result["trimmed_pooled_ms"] = round(per_question_ms(pooled, questions), 3)
+        results.append(result)
+        print(f"{n:>6} questions: {result['full_one_by_one_ms']:>8} -> {result['trimmed_batched_ms']:>8} ms/question",
+              file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Writes needed to re-ingest an amended document, against the offline fakes.
+
+    python -m benchmarks.reingest_bench --pages 300
+    python -m benchmarks.reingest_bench --pages 300 --clauses-per-page 6
+
+Ingests a synthetic policy, then re-ingests it after (a) rewording one
+clause in the middle and (b) inserting a page at the front, counting clauses
+embedded, Pinecone upserts / metadata updates / deletes and Elastic writes.
+Each amendment touches a single page, so every count must stay within that
+page's clauses whatever --pages is; exits 1 if any does not.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+
+def synthetic_pages(pages: int, clauses_per_page: int) -> list:
+    return [
+        "\n".join(
+            f"{p * clauses_per_page + c + 1}) Benefit {p}.{c} (Code -C{p:03d}{c})\n"
+            f"Expenses for item {p}.{c} are covered up to Rs {1000 + p * 10 + c} per policy year."
+            for c in range(clauses_per_page)
+        )
+        for p in range(pages)
+    ]
+
+
+def instrument(embedder, counts: Counter):
+    """Count writes at the embedder's own references to the backends."""
+    index, get_embeddings = embedder.index, embedder.get_embeddings
+    elastic_upsert, elastic_delete = embedder.ElasticUpsert, embedder.delete_elastic_chunks
+
+    class CountingIndex:
+        def upsert(self, vectors, namespace=""):
+            counts["pinecone_upserted"] += len(vectors)
+            return index.upsert(vectors, namespace=namespace)
+
+        def update(self, id, set_metadata=None, namespace=""):
+            counts["pinecone_updated"] += 1
+            return index.update(id=id, set_metadata=set_metadata, namespace=namespace)
+
+        def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+            counts["pinecone_deleted"] += len(ids or [])
+            return index.delete(ids=ids, delete_all=delete_all, namespace=namespace, **kwargs)
+
+    async def counting_embeddings(texts):
+        counts["embedded"] += len(texts)
+        return await get_embeddings(texts)
+
+    def counting_upsert(records, index_name):
+        counts["elastic_indexed"] += len(records)
+        return elastic_upsert(records, index_name=index_name)
+
+    def counting_delete(ids, index_name):
+        counts["elastic_deleted"] += len(ids)
+        return elastic_delete(ids, index_name=index_name)
+
+    embedder.index = CountingIndex()
+    embedder.get_embeddings = counting_embeddings
+    embedder.ElasticUpsert = counting_upsert
+    embedder.delete_elastic_chunks = counting_delete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--clauses-per-page", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="reingest-bench-")
+    os.environ.update({
+        "GEMINI_BACKEND": "fake",
+        "PINECONE_BACKEND": "fake",
+        "ELASTIC_BACKEND": "fake",
+        "FAKE_GEMINI_EMBED_MS": "1",
+        "FAKE_PINECONE_MS": "0.01",
+        "FAKE_ELASTIC_MS": "0.01",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+        "INGEST_JOURNAL_DIR": os.path.join(workdir, "ingest_journal"),
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answer_cache.json"),
+    })
+    from app.services import embedder
+    from app.services.chunker import chunk_text_with_offsets, PAGE_BREAK
+    from app.services.ingest_journal import IngestJournal
+
+    counts = Counter()
+    instrument(embedder, counts)
+    pages = synthetic_pages(args.pages, args.clauses_per_page)
+
+    async def ingest(doc_pages, reembed):
+        chunks = chunk_text_with_offsets(PAGE_BREAK.join(doc_pages), split_pages=True)  # as hackrx does
+        journal = IngestJournal.open(chunks[0]["doc_hash"], scope="bench")
+        counts.clear()
+        if reembed:
+            changes = await embedder.reembed_changed_chunks(chunks=chunks, np="bench", journal=journal)
+        else:
+            await embedder.embed_chunks(chunks=chunks, np="bench", journal=journal)
+            changes = {}
+        journal.discard()
+        return {**changes, **counts}
+
+    edited = list(pages)
+    middle = args.pages // 2
+    edited[middle] = edited[middle].replace("are covered up to", "are covered, after 30 days, up to", 1)
+    inserted = ["Endorsement 1) Amendment (Code -E001)\nThe waiting period for cataract is 12 months."] + edited
+
+    async def run_scenarios():
+        # One event loop throughout: the executor's limits belong to the loop that created them
+        return {
+            "initial": await ingest(pages, reembed=False),
+            "one_clause_edit": await ingest(edited, reembed=True),
+            "page_inserted": await ingest(inserted, reembed=True),
+        }
+
+    results = asyncio.run(run_scenarios())
+    print(json.dumps(results, indent=2))
+
+    # One page's clauses (plus the chunk preamble) is the most an amendment may cost
+    limit = 2 * (args.clauses_per_page + 1)
+    failures = [
+        f"{scenario}: {key}={value} > {limit}"
+        for scenario in ("one_clause_edit", "page_inserted")
+        for key, value in results[scenario].items()
+        if key not in ("unchanged",) and value > limit
+    ]
+    for failure in failures:
+        print(f"❌ Write count grows with the document: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Deterministic synthetic documents for parser and chunker benchmarks.
+
+    python -m benchmarks.synthetic_corpus --out corpus/ --sizes 1,10,100
+
+Every generator takes a page count and a seed and returns the file bytes.
+The text mimics policy wordings: numbered clauses, lettered sub-items,
+waiting-period sections and plan comparison rows, so the structure
+detection in document_loader is exercised, not just raw extraction.
+"""
+import argparse
+import io
+import os
+import random
+import zipfile
+
+LINES_PER_PAGE = 40
+ROWS_PER_PAGE = 50  # spreadsheet / CSV rows that stand in for one page
+SLIDE_LINES = 8
+
+TOPICS = [
+    "maternity expenses", "pre-existing diseases", "cataract surgery", "organ donor expenses",
+    "ambulance charges", "room rent", "ICU charges", "AYUSH treatment", "day care procedures",
+    "domiciliary hospitalization", "health check-up", "no claim discount", "grace period",
+]
+
+
+def policy_lines(rng: random.Random, n: int, start_clause: int = 1) -> list[str]:
+    """`n` lines of clause-structured policy text."""
+    lines = []
+    clause = start_clause
+    while len(lines) < n:
+        topic = rng.choice(TOPICS)
+        kind = rng.random()
+        if kind < 0.2:
+            lines.append(f"{clause}) {topic.title()} (Code -C{clause:03d})")
+            clause += 1
+        elif kind < 0.3:
+            lines.append(f"Waiting period for {topic}")
+            for letter in "abc":
+                lines.append(f"{letter}. {rng.choice([12, 24, 36])} months for {rng.choice(TOPICS)}")
+        elif kind < 0.4:
+            lines.append(
+                f"Plan A INR {rng.randrange(1, 50) * 1000:,}   Plan B INR {rng.randrange(1, 50) * 1000:,}"
+                f"   Plan C INR {rng.randrange(1, 50) * 1000:,}"
+            )
+        else:
+            lines.append(
+                f"Expenses for {topic} are payable up to {rng.choice([10, 20, 25, 50])}% of the sum insured "
+                f"subject to a waiting period of {rng.choice([12, 24, 36, 48])} months."
+            )
+    return lines[:n]
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page()
+        y = 50
+        for line in policy_lines(rng, LINES_PER_PAGE, start_clause=page_no * 10 + 1):
+            page.insert_text((40, y), line[:95], fontsize=9)
+            y += 18
+        page.insert_text((280, page.rect.height - 20), f"Page {page_no + 1}", fontsize=8)
+    data = doc.tobytes(garbage=0, deflate=True)
+    doc.close()
+    return data
+
+
+def make_docx(pages: int, seed: int = 0) -> bytes:
+    from docx import Document
+
+    rng = random.Random(seed)
+    doc = Document()
+    for page_no in range(pages):
+        for line in policy_lines(rng, LINES_PER_PAGE, start_clause=page_no * 10 + 1):
+            doc.add_paragraph(line)
+        if page_no % 5 == 0:
+            table = doc.add_table(rows=4, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"{rng.choice(TOPICS)} {r}.{c}" if r else f"Plan {'ABC'[c]}"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _rows(pages: int, seed: int) -> list[list]:
+    rng = random.Random(seed)
+    return [
+        [f"C{i:05d}", rng.choice(TOPICS), rng.choice([12, 24, 36]), rng.randrange(1, 100) * 1000]
+        for i in range(pages * ROWS_PER_PAGE)
+    ]
+
+
+ROW_HEADER = ["clause_id", "benefit", "waiting_months", "limit_inr"]
+
+
+def make_xlsx(pages: int, seed: int = 0) -> bytes:
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    pd.DataFrame(_rows(pages, seed), columns=ROW_HEADER).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def make_csv(pages: int, seed: int = 0) -> bytes:
+    lines = [",".join(ROW_HEADER)] + [",".join(map(str, row)) for row in _rows(pages, seed)]
+    return "\n".join(lines).encode("utf-8")
+
+
+def make_pptx(pages: int, seed: int = 0) -> bytes:
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # blank
+    for slide_no in range(pages):
+        slide = prs.slides.add_slide(layout)
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        box.text_frame.text = "\n".join(policy_lines(rng, SLIDE_LINES, start_clause=slide_no * 2 + 1))
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def _zip(entries: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries.items():
+            # Fixed timestamps keep the archive bytes deterministic
+            zf.writestr(zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0)), data)
+    return buffer.getvalue()
+
+
+def make_nested_zip(pages: int, seed: int = 0, depth: int = 3) -> bytes:
+    """Text and CSV members spread over `depth` levels of nested archives."""
+    rng = random.Random(seed)
+    per_level = max(1, pages // depth)
+    inner = b""
+    for level in reversed(range(depth)):
+        entries = {
+            f"level{level}/page{i}.txt": "\n".join(policy_lines(rng, LINES_PER_PAGE)).encode("utf-8")
+            for i in range(per_level)
+        }
+        entries[f"level{level}/table.csv"] = make_csv(1, seed + level)
+        if inner:
+            entries[f"level{level}/nested.zip"] = inner
+        inner = _zip(entries)
+    return inner
+
+
+GENERATORS = {
+    "pdf": make_pdf,
+    "docx": make_docx,
+    "xlsx": make_xlsx,
+    "pptx": make_pptx,
+    "csv": make_csv,
+    "zip": make_nested_zip,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--sizes", default="1,10,100", help="comma-separated page counts (1-1000)")
+    parser.add_argument("--formats", default=",".join(GENERATORS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for fmt in args.formats.split(","):
+        for pages in map(int, args.sizes.split(",")):
+            path = os.path.join(args.out, f"synthetic_{pages}p.{fmt}")
+            with open(path, "wb") as f:
+                f.write(GENERATORS[fmt](pages, args.seed))
+            print(f"{path}: {os.path.getsize(path) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()